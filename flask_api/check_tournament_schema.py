@@ -3,7 +3,13 @@
 檢查錦標賽表結構和現有記錄
 """
 
-from supabase import create_client, Client
+import os
+import sys
+from supabase import Client
+
+# 共用 flask_api 的 Supabase 連線池客戶端
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'flask_api'))
+from supabase_pool import create_client
 import logging
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -0,0 +1,33 @@
+-- 交易歷史游標分頁索引
+-- /api/transactions 與 /api/tournament/<id>/trades 依 (executed_at, id) 由新到舊分頁，
+-- 查詢條件為 executed_at < t OR (executed_at = t AND id < id)，需要以 id 結尾的複合索引
+
+-- ====================================================================
+-- 1. portfolio_transactions（一般模式與錦標賽共用）
+-- ====================================================================
+
+-- CONCURRENTLY 不鎖表，不可在交易區塊內執行
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_portfolio_transactions_user_cursor
+    ON public.portfolio_transactions(user_id, tournament_id, executed_at DESC, id DESC);
+
+-- ====================================================================
+-- 2. tournament_trades（分區表不支援 CONCURRENTLY，請於離峰時段執行）
+-- ====================================================================
+
+DROP INDEX IF EXISTS idx_tournament_trades_user_time;
+CREATE INDEX IF NOT EXISTS idx_tournament_trades_user_time
+    ON tournament_trades(tournament_id, user_id, executed_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_tournament_trades_time
+    ON tournament_trades(tournament_id, executed_at DESC, id DESC);
+
+-- ====================================================================
+-- 3. 驗證（應使用 Index Scan，不應出現 Sort 節點）
+-- ====================================================================
+
+-- EXPLAIN ANALYZE
+-- SELECT id, symbol, action, price, amount, executed_at, tournament_id
+-- FROM public.portfolio_transactions
+-- WHERE user_id = '<user_id>' AND tournament_id = '00000000-0000-0000-0000-000000000000'
+--   AND (executed_at < '<t>' OR (executed_at = '<t>' AND id < '<id>'))
+-- ORDER BY executed_at DESC, id DESC
+-- LIMIT 51;
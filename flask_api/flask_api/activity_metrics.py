@@ -0,0 +1,143 @@
+"""
+錦標賽交易活動計數
+以滑動視窗計數器提供近期交易量，性能監控端點不再查詢交易表或監控視圖
+
+設計重點:
+1. 成交時累加每秒與每分鐘時間桶（Redis 雜湊，欄位為錦標賽 ID 與 _total）
+2. 時間桶自動過期，讀取固定數量的桶，與交易量無關（O(1)）
+3. 近一分鐘 / 五分鐘交易量以滑動視窗估算：最舊的桶依已經過的比例折算
+4. Redis 未連線時使用行程內時間桶
+
+Redis 鍵值:
+    tournament_activity_sec:{epoch_second}  每秒時間桶
+    tournament_activity_min:{epoch_minute}  每分鐘時間桶
+"""
+
+import logging
+import threading
+import time
+from typing import Dict, List, Optional
+
+import cache_codec
+
+logger = logging.getLogger(__name__)
+
+TOTAL_FIELD = '_total'
+
+class TradeActivityCounter:
+    """滑動視窗交易活動計數器"""
+
+    SECOND_BUCKET_TTL = 10
+    MINUTE_BUCKET_TTL = 7 * 60
+    SECOND_WINDOW = 5  # 每秒交易量取最近 5 個完整秒的平均
+
+    def __init__(self, redis_client=None):
+        self.redis = redis_client
+
+        self._local_seconds: Dict[int, Dict[str, int]] = {}
+        self._local_minutes: Dict[int, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _second_key(second: int) -> str:
+        return f"tournament_activity_sec:{second}"
+
+    @staticmethod
+    def _minute_key(minute: int) -> str:
+        return f"tournament_activity_min:{minute}"
+
+    # ========================================
+    # 增量更新
+    # ========================================
+
+    def record_trade(self, tournament_id: str, pipe=None, now: Optional[float] = None):
+        """累加一筆成交（可併入呼叫端的 Redis 管線）"""
+        now = time.time() if now is None else now
+        second = int(now)
+        minute = second // 60
+
+        if self.redis:
+            client = pipe or self.redis.pipeline(transaction=False)
+            client.hincrby(self._second_key(second), TOTAL_FIELD, 1)
+            client.expire(self._second_key(second), self.SECOND_BUCKET_TTL)
+            client.hincrby(self._minute_key(minute), TOTAL_FIELD, 1)
+            client.hincrby(self._minute_key(minute), tournament_id, 1)
+            client.expire(self._minute_key(minute), self.MINUTE_BUCKET_TTL)
+            if pipe is None:
+                client.execute()
+            return
+
+        with self._lock:
+            seconds = self._local_seconds.setdefault(second, {})
+            seconds[TOTAL_FIELD] = seconds.get(TOTAL_FIELD, 0) + 1
+            minutes = self._local_minutes.setdefault(minute, {})
+            minutes[TOTAL_FIELD] = minutes.get(TOTAL_FIELD, 0) + 1
+            minutes[tournament_id] = minutes.get(tournament_id, 0) + 1
+
+            # 清除過期時間桶
+            for bucket in [bucket for bucket in self._local_seconds if bucket < second - self.SECOND_BUCKET_TTL]:
+                del self._local_seconds[bucket]
+            for bucket in [bucket for bucket in self._local_minutes if bucket < minute - self.MINUTE_BUCKET_TTL // 60]:
+                del self._local_minutes[bucket]
+
+    # ========================================
+    # 查詢（固定讀取 5 個秒桶與 6 個分鐘桶）
+    # ========================================
+
+    def _read_buckets(self, seconds: List[int], minutes: List[int]):
+        if self.redis:
+            pipe = self.redis.pipeline(transaction=False)
+            for second in seconds:
+                pipe.hget(self._second_key(second), TOTAL_FIELD)
+            for minute in minutes:
+                pipe.hgetall(self._minute_key(minute))
+            results = pipe.execute()
+            second_counts = [int(count or 0) for count in results[:len(seconds)]]
+            minute_counts = [
+                {cache_codec.decode_text(field): int(count) for field, count in bucket.items()}
+                for bucket in results[len(seconds):]
+            ]
+            return second_counts, minute_counts
+
+        with self._lock:
+            second_counts = [self._local_seconds.get(second, {}).get(TOTAL_FIELD, 0) for second in seconds]
+            minute_counts = [dict(self._local_minutes.get(minute, {})) for minute in minutes]
+        return second_counts, minute_counts
+
+    @staticmethod
+    def _sliding(buckets: List[Dict[str, int]], window: int, elapsed: float) -> Dict[str, float]:
+        """以目前分鐘桶起算 window 分鐘的滑動視窗計數（最舊的桶依比例折算）"""
+        totals: Dict[str, float] = {}
+        for index, bucket in enumerate(buckets[:window + 1]):
+            weight = 1.0 - elapsed if index == window else 1.0
+            for field, count in bucket.items():
+                totals[field] = totals.get(field, 0.0) + count * weight
+        return totals
+
+    def snapshot(self, now: Optional[float] = None) -> Dict:
+        """近期交易活動（每秒交易量、近一分鐘 / 五分鐘交易量與各錦標賽近一分鐘交易量）"""
+        now = time.time() if now is None else now
+        second = int(now)
+        minute = second // 60
+        elapsed = (now % 60) / 60  # 目前分鐘已經過的比例
+
+        seconds = [second - offset for offset in range(1, self.SECOND_WINDOW + 1)]
+        minutes = [minute - offset for offset in range(6)]
+        second_counts, minute_counts = self._read_buckets(seconds, minutes)
+
+        last_minute = self._sliding(minute_counts, 1, elapsed)
+        last_5min = self._sliding(minute_counts, 5, elapsed)
+        by_tournament = {
+            tournament_id: round(count)
+            for tournament_id, count in last_minute.items()
+            if tournament_id != TOTAL_FIELD and round(count) > 0
+        }
+
+        return {
+            'trades_per_second': round(sum(second_counts) / self.SECOND_WINDOW, 2),
+            'trades_last_second': second_counts[0],
+            'trades_last_minute': round(last_minute.get(TOTAL_FIELD, 0)),
+            'trades_last_5min': round(last_5min.get(TOTAL_FIELD, 0)),
+            'active_tournaments': len(by_tournament),
+            'trades_last_minute_by_tournament': by_tournament
+        }
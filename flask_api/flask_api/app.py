@@ -5,7 +5,7 @@ import yfinance as yf
 import redis
 import json
 import uuid
-from supabase import create_client, Client
+from supabase import Client
 import os
 from typing import Dict, List, Optional
 import logging
@@ -16,12 +16,31 @@ from urllib3.util.retry import Retry
 import random
 import time
 
+from fee_engine import FeeEngine, market_for_symbol
+from order_dedup import get_order_dedup_cache
+from supabase_pool import create_client
+from redis_cache import create_redis_client, cache_get_many, cache_set_many
+from leaderboard import get_realtime_leaderboard
+from realtime_hub import get_realtime_hub, quote_topic, user_topic, leaderboard_topic
+from delta_sync import get_delta_tracker
+from http_cache import get_http_cache, quote_scope, leaderboard_scope, TAIWAN_STOCKS_SCOPE, TOURNAMENTS_SCOPE
+from http_compression import OrjsonProvider, ResponseCompressor, orjson
+from keyset_pagination import page_size, fetch_page, InvalidCursor
+from data_access import select_records, decode_records, TransactionRecord, HoldingTransactionRecord, TournamentEntryRecord
+from tournament_catalog import get_tournament_catalog
+from stock_symbols import POPULAR_TAIWAN_STOCKS, normalize_taiwan_stock_symbol, is_taiwan_stock, get_taiwan_stock_name
+
 # 設定日誌
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
-CORS(app)  # 允許 iOS 跨域請求
+CORS(app, expose_headers=['X-Next-Cursor', 'ETag'])  # 允許 iOS 跨域請求（並讓前端讀取分頁游標與 ETag）
+
+# orjson 編碼 + gzip / brotli 壓縮大型回應
+if orjson:
+    app.json = OrjsonProvider(app)
+response_compressor = ResponseCompressor(app)
 
 # 導入錦標賽路由
 try:
@@ -35,13 +54,31 @@ except Exception as e:
 
 # Redis 配置 (用於股價快取)
 try:
-    redis_client = redis.Redis(host='localhost', port=6379, db=0, decode_responses=True)
+    redis_client = create_redis_client()  # 固定大小連線池，gevent 下共用
     redis_client.ping()
     logger.info("✅ Redis 連線成功")
 except:
     redis_client = None
     logger.warning("⚠️ Redis 未連線，將使用記憶體快取")
 
+# 交易冪等性（client_order_id 去重）
+order_dedup_cache = get_order_dedup_cache(redis_client)
+
+# HTTP 快取驗證（版本號 ETag + Cache-Control）
+http_cache = get_http_cache(redis_client)
+
+# 版本化差異回應（/api/portfolio?since=<version>）
+delta_tracker = get_delta_tracker(redis_client)
+
+# 即時推播（SSE：股價、成交與排名變動）
+realtime_hub = get_realtime_hub(redis_client)
+try:
+    from realtime_routes import realtime_bp
+    app.register_blueprint(realtime_bp)
+    logger.info("✅ 即時推播路由載入成功")
+except Exception as e:
+    logger.error(f"❌ 即時推播路由載入錯誤: {e}")
+
 # Supabase 配置
 SUPABASE_URL = "https://wujlbjrouqcpnifbakmw.supabase.co"
 
@@ -53,97 +90,34 @@ SUPABASE_ANON_KEY = "eyJhbGciOiJIUzI1NiIsInR5cCI6IkpXVCJ9.eyJpc3MiOiJzdXBhYmFzZS
 # 使用正確的服務角色密鑰
 SUPABASE_KEY = os.environ.get('SUPABASE_SERVICE_KEY', SUPABASE_SERVICE_KEY)
 
+# 所有 table / rpc 呼叫共用 keep-alive 連線池
 supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
 key_type = "服務角色" if SUPABASE_KEY == SUPABASE_SERVICE_KEY else "匿名"
 logger.info(f"✅ Supabase 客戶端初始化完成 (使用 {key_type} 密鑰)")
 logger.info(f"🔑 API Key 末尾: ...{SUPABASE_KEY[-10:]}")
 
+# 錦標賽目錄、參與索引與用戶交易筆數（錦標賽列表端點由記憶體過濾）
+tournament_catalog = get_tournament_catalog(supabase, redis_client, http_cache)
+
 # 記憶體快取 (Redis 備用方案)
 memory_cache = {}
 
 # 常量設定
 CACHE_TIMEOUT = 10  # 股價快取 10 秒
 STOCK_LIST_CACHE_TIMEOUT = 86400  # 股票清單快取 24 小時
-TRANSACTION_FEE_RATE = 0.001425  # 台股手續費 0.1425%
 
 # 錦標賽統一架構常量（與iOS前端保持一致）
 GENERAL_MODE_TOURNAMENT_ID = "00000000-0000-0000-0000-000000000000"
 
-# 台股配置
-TAIWAN_STOCK_TAX_RATE = 0.003  # 台股證券交易稅 0.3%
-TAIWAN_MIN_FEE = 20  # 台股最低手續費 20 元
-
-# 熱門台股清單
-POPULAR_TAIWAN_STOCKS = {
-    "2330": "台積電",
-    "2454": "聯發科", 
-    "2317": "鴻海",
-    "2308": "台達電",
-    "2382": "廣達",
-    "2412": "中華電",
-    "2881": "富邦金",
-    "2891": "中信金",
-    "2886": "兆豐金",
-    "2303": "聯電",
-    "3008": "大立光",
-    "2002": "中鋼",
-    "1303": "南亞",
-    "1301": "台塑",
-    "2207": "和泰車",
-    "2357": "華碩",
-    "2409": "友達",
-    "2474": "可成",
-    "6505": "台塑化",
-    "2912": "統一超"
-}
+# 交易費用引擎（台股 / 美股費率表與費率常量定義於 fee_engine；/api/trade 逐筆計算，費用試算一次向量化計算）
+trading_fee_engine = FeeEngine()
 
 # MARK: - 輔助函數
 
-def normalize_taiwan_stock_symbol(symbol: str) -> str:
-    """標準化台股股票代號"""
-    symbol = symbol.upper().strip()
-    
-    # 如果是純數字且長度為4，自動加上 .TW
-    if symbol.isdigit() and len(symbol) == 4:
-        return f"{symbol}.TW"
-    
-    # 如果已經有 .TW 後綴，直接返回
-    if symbol.endswith('.TW') or symbol.endswith('.TWO'):
-        return symbol
-    
-    # 檢查是否為熱門台股（4位數字）
-    base_symbol = symbol.replace('.TW', '').replace('.TWO', '')
-    if base_symbol in POPULAR_TAIWAN_STOCKS:
-        return f"{base_symbol}.TW"
-    
-    # 其他情況直接返回（可能是美股或其他市場）
-    return symbol
-
-def is_taiwan_stock(symbol: str) -> bool:
-    """判斷是否為台股"""
-    return symbol.endswith('.TW') or symbol.endswith('.TWO')
-
-def get_taiwan_stock_name(symbol: str) -> str:
-    """獲取台股中文名稱"""
-    base_symbol = symbol.replace('.TW', '').replace('.TWO', '')
-    return POPULAR_TAIWAN_STOCKS.get(base_symbol, f"{symbol} 股份有限公司")
-
-def calculate_taiwan_trading_cost(amount: float, is_day_trading: bool = False) -> Dict[str, float]:
-    """計算台股交易成本"""
-    # 手續費計算（最低20元）
-    brokerage_fee = max(amount * TRANSACTION_FEE_RATE, TAIWAN_MIN_FEE)
-    
-    # 證券交易稅（當沖減半）
-    tax_rate = TAIWAN_STOCK_TAX_RATE / 2 if is_day_trading else TAIWAN_STOCK_TAX_RATE
-    securities_tax = amount * tax_rate
-    
-    total_cost = brokerage_fee + securities_tax
-    
-    return {
-        "brokerage_fee": brokerage_fee,
-        "securities_tax": securities_tax,
-        "total_cost": total_cost
-    }
+def calculate_trading_costs(amounts: List[float], symbols: List[str], is_day_trading=False) -> List[Dict[str, float]]:
+    """批量計算交易成本（單次向量化運算，供 /api/fees/estimate 試算使用）"""
+    markets = [market_for_symbol(normalize_taiwan_stock_symbol(symbol)) for symbol in symbols]
+    return trading_fee_engine.compute(amounts, markets, is_day_trading).rows()
 
 # 舊的網頁爬取函數已移除，改用官方 API
 
@@ -365,10 +339,10 @@ def get_cached_taiwan_stocks() -> Optional[List[Dict]]:
     
     if redis_client:
         try:
-            cached_data = redis_client.get(cache_key)
+            cached_data = cache_get_many(redis_client, [cache_key])[0]
             if cached_data:
                 logger.info("📋 使用 Redis 快取的台股清單")
-                return json.loads(cached_data)
+                return cached_data
         except Exception as e:
             logger.error(f"Redis 讀取台股清單錯誤: {e}")
     
@@ -387,7 +361,7 @@ def set_cached_taiwan_stocks(stocks: List[Dict]):
     
     if redis_client:
         try:
-            redis_client.setex(cache_key, STOCK_LIST_CACHE_TIMEOUT, json.dumps(stocks))
+            cache_set_many(redis_client, {cache_key: stocks}, STOCK_LIST_CACHE_TIMEOUT)
             logger.info("💾 台股清單已存入 Redis 快取")
         except Exception as e:
             logger.error(f"Redis 寫入台股清單錯誤: {e}")
@@ -395,43 +369,87 @@ def set_cached_taiwan_stocks(stocks: List[Dict]):
     # 備用記憶體快取
     memory_cache[cache_key] = (stocks, datetime.now())
     logger.info("💾 台股清單已存入記憶體快取")
+    
+    try:
+        http_cache.bump([TAIWAN_STOCKS_SCOPE])
+    except Exception as e:
+        logger.error(f"HTTP 快取版本更新失敗: {e}")
 
 def get_cache_key(symbol: str) -> str:
     """生成快取鍵值"""
     return f"stock_price:{symbol.upper()}"
 
-def get_cached_price(symbol: str) -> Optional[Dict]:
-    """從快取獲取股價"""
-    cache_key = get_cache_key(symbol)
+def get_cached_prices(symbols: List[str]) -> Dict[str, Dict]:
+    """批次從快取獲取股價（Redis 一次往返）"""
+    prices = {}
     
-    if redis_client:
+    if redis_client and symbols:
         try:
-            cached_data = redis_client.get(cache_key)
-            if cached_data:
-                return json.loads(cached_data)
+            cached_values = cache_get_many(redis_client, [get_cache_key(symbol) for symbol in symbols])
+            for symbol, cached_data in zip(symbols, cached_values):
+                if cached_data:
+                    prices[symbol] = cached_data
         except Exception as e:
             logger.error(f"Redis 讀取錯誤: {e}")
     
     # 備用記憶體快取
-    if cache_key in memory_cache:
-        data, timestamp = memory_cache[cache_key]
-        if datetime.now() - timestamp < timedelta(seconds=CACHE_TIMEOUT):
-            return data
+    for symbol in symbols:
+        if symbol in prices:
+            continue
+        cache_key = get_cache_key(symbol)
+        if cache_key in memory_cache:
+            data, timestamp = memory_cache[cache_key]
+            if datetime.now() - timestamp < timedelta(seconds=CACHE_TIMEOUT):
+                prices[symbol] = data
     
-    return None
+    return prices
 
-def set_cached_price(symbol: str, price_data: Dict):
-    """設定股價快取"""
-    cache_key = get_cache_key(symbol)
-    
-    if redis_client:
+def set_cached_prices(prices: Dict[str, Dict]):
+    """批次設定股價快取（Redis 管線一次往返）"""
+    if redis_client and prices:
         try:
-            redis_client.setex(cache_key, CACHE_TIMEOUT, json.dumps(price_data))
+            cache_set_many(redis_client, {get_cache_key(symbol): data for symbol, data in prices.items()}, CACHE_TIMEOUT)
         except Exception as e:
             logger.error(f"Redis 寫入錯誤: {e}")
     
     # 備用記憶體快取
-    memory_cache[cache_key] = (price_data, datetime.now())
+    now = datetime.now()
+    for symbol, data in prices.items():
+        memory_cache[get_cache_key(symbol)] = (data, now)
+    
+    # 錦標賽即時排行榜依新股價重新計價
+    marks = {}
+    for symbol, data in prices.items():
+        if data and data.get('current_price'):
+            marks[symbol] = float(data['current_price'])
+            marks.setdefault(data.get('symbol') or symbol, marks[symbol])
+    repriced = []
+    try:
+        repriced = get_realtime_leaderboard(redis_client).apply_prices(marks)
+    except Exception as e:
+        logger.error(f"排行榜重新計價失敗: {e}")
+    
+    # 推播股價更新與重新計價的排行榜，並遞增 HTTP 快取版本號（一次往返）
+    # 主題以標準化代號發布（與 /api/realtime/stream 訂閱端相同，2330 與 2330.TW 為同一主題）
+    quotes = {quote_topic(normalize_taiwan_stock_symbol(symbol)): data for symbol, data in prices.items() if data}
+    events = [(topic, 'quote', data) for topic, data in quotes.items()]
+    events.extend((leaderboard_topic(tournament_id), 'repriced', {'tournament_id': tournament_id}) for tournament_id in repriced)
+    try:
+        pipe = redis_client.pipeline(transaction=False) if redis_client else None
+        http_cache.bump([quote_scope(symbol) for symbol in prices] + [leaderboard_scope(tournament_id) for tournament_id in repriced], pipe)
+        realtime_hub.publish_many(events, pipe)
+        if pipe is not None:
+            pipe.execute()
+    except Exception as e:
+        logger.error(f"股價推播失敗: {e}")
+
+def get_cached_price(symbol: str) -> Optional[Dict]:
+    """從快取獲取股價"""
+    return get_cached_prices([symbol]).get(symbol)
+
+def set_cached_price(symbol: str, price_data: Dict):
+    """設定股價快取"""
+    set_cached_prices({symbol: price_data})
 
 def fetch_yahoo_finance_price(symbol: str) -> Dict:
     """從 Yahoo Finance 獲取股價"""
@@ -712,6 +730,7 @@ def health_check():
     return jsonify(health_data), status_code
 
 @app.route('/api/taiwan-stocks', methods=['GET'])
+@http_cache.conditional(max_age=3600, s_maxage=3600, revalidate_every=3600)
 def get_taiwan_stock_list():
     """獲取熱門台股清單（保持向後兼容）"""
     try:
@@ -735,6 +754,7 @@ def get_taiwan_stock_list():
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/taiwan-stocks/all', methods=['GET'])
+@http_cache.conditional([TAIWAN_STOCKS_SCOPE], max_age=300, s_maxage=3600, revalidate_every=STOCK_LIST_CACHE_TIMEOUT)
 def get_all_taiwan_stocks():
     """獲取完整台股清單"""
     try:
@@ -829,6 +849,7 @@ def get_all_taiwan_stocks():
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/taiwan-stocks/search', methods=['GET'])
+@http_cache.conditional([TAIWAN_STOCKS_SCOPE], max_age=300, s_maxage=3600, revalidate_every=STOCK_LIST_CACHE_TIMEOUT)
 def search_taiwan_stocks():
     """台股智能搜尋"""
     try:
@@ -901,6 +922,9 @@ def search_taiwan_stocks():
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/quote', methods=['GET'])
+# 版本號只在端點重新查詢股價時遞增，快取過期後須強制換 ETag，否則持續帶 If-None-Match 的客戶端永遠拿到 304
+@http_cache.conditional(lambda: [quote_scope(request.args.get('symbol', ''))], max_age=CACHE_TIMEOUT, s_maxage=CACHE_TIMEOUT,
+                        revalidate_every=CACHE_TIMEOUT)
 def get_stock_quote():
     """獲取股票報價"""
     symbol = request.args.get('symbol')
@@ -935,9 +959,42 @@ def get_stock_quote():
             logger.error(f"備用數據也失敗: {fallback_error}")
             return jsonify({"error": "無法獲取股價數據，請稍後重試"}), 404
 
+@app.route('/api/fees/estimate', methods=['POST'])
+def estimate_trading_fees():
+    """批量試算交易費用（what-if，單次向量化計算）"""
+    data = request.get_json() or {}
+    trades = data.get('trades')
+    
+    if not isinstance(trades, list) or not trades:
+        return jsonify({"error": "缺少交易列表參數"}), 400
+    
+    try:
+        amounts = [float(trade['amount']) for trade in trades]
+        symbols = [trade['symbol'] for trade in trades]
+        day_trading = [bool(trade.get('is_day_trading', False)) for trade in trades]
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify({"error": f"交易參數錯誤: {e}"}), 400
+    
+    try:
+        fees = calculate_trading_costs(amounts, symbols, day_trading)
+        
+        return jsonify({
+            "success": True,
+            "fees": fees,
+            "total_fees": sum(fee['total_cost'] for fee in fees),
+            "trade_count": len(fees)
+        })
+        
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logger.error(f"交易費用試算失敗: {e}")
+        return jsonify({"error": str(e)}), 500
+
 @app.route('/api/trade', methods=['POST'])
+@order_dedup_cache.idempotent
 def execute_trade():
-    """執行交易"""
+    """執行交易（可帶 client_order_id，重試時直接回傳原結果）"""
     data = request.get_json()
     
     # 驗證請求參數
@@ -976,20 +1033,12 @@ def execute_trade():
             set_cached_price(symbol, price_data)
         
         current_price = price_data['current_price']
-        is_tw_stock = is_taiwan_stock(symbol)
         
         # 計算交易詳情
         if action == 'buy':
-            # 買入：amount 是金額
-            if is_tw_stock:
-                # 台股費用計算
-                cost_info = calculate_taiwan_trading_cost(amount, is_day_trading)
-                transaction_fee = cost_info['total_cost']
-                fee_details = cost_info
-            else:
-                # 美股費用計算
-                transaction_fee = amount * TRANSACTION_FEE_RATE
-                fee_details = {"brokerage_fee": transaction_fee, "securities_tax": 0, "total_cost": transaction_fee}
+            # 買入：amount 是金額（依市場費率表計算費用）
+            fee_details = trading_fee_engine.compute_one(amount, market_for_symbol(symbol), is_day_trading)
+            transaction_fee = fee_details['total_cost']
             
             available_amount = amount - transaction_fee
             shares = available_amount / current_price
@@ -1012,15 +1061,8 @@ def execute_trade():
             shares = amount
             gross_amount = shares * current_price
             
-            if is_tw_stock:
-                # 台股費用計算
-                cost_info = calculate_taiwan_trading_cost(gross_amount, is_day_trading)
-                transaction_fee = cost_info['total_cost']
-                fee_details = cost_info
-            else:
-                # 美股費用計算
-                transaction_fee = gross_amount * TRANSACTION_FEE_RATE
-                fee_details = {"brokerage_fee": transaction_fee, "securities_tax": 0, "total_cost": transaction_fee}
+            fee_details = trading_fee_engine.compute_one(gross_amount, market_for_symbol(symbol), is_day_trading)
+            transaction_fee = fee_details['total_cost']
             
             total_cost = gross_amount - transaction_fee
             
@@ -1056,6 +1098,12 @@ def execute_trade():
         # 保存交易記錄到數據庫 (使用正確的 portfolio_transactions 表)
         supabase.table("portfolio_transactions").insert(transaction_record).execute()
         
+        # 用戶交易筆數計數器（/api/user-tournaments）
+        try:
+            tournament_catalog.record_trade(user_id, transaction_record["tournament_id"])
+        except Exception as e:
+            logger.error(f"交易筆數計數失敗: {e}")
+        
         # 構建回應訊息
         stock_name = price_data.get('name', symbol)
         action_text = '買入' if action == 'buy' else '賣出'
@@ -1063,6 +1111,22 @@ def execute_trade():
         
         logger.info(f"✅ 交易執行成功 ({trade_context}): {action_text} {stock_name} - {shares:.2f} 股")
         
+        # 推播成交給該用戶的即時連線
+        try:
+            realtime_hub.publish(user_topic(user_id), 'fill', {
+                'tournament_id': transaction_record["tournament_id"],
+                'symbol': symbol,
+                'side': action,
+                'qty': shares,
+                'price': current_price,
+                'total_amount': abs(total_cost),
+                'executed_at': transaction_record["executed_at"],
+                'cash_delta': -abs(total_cost) if action == 'buy' else abs(total_cost),
+                'qty_delta': shares if action == 'buy' else -shares
+            })
+        except Exception as e:
+            logger.error(f"成交推播失敗: {e}")
+        
         return jsonify({
             "success": True,
             "symbol": symbol,
@@ -1072,6 +1136,7 @@ def execute_trade():
             "price": current_price,
             "tournament_id": transaction_record["tournament_id"],  # 使用實際存儲的tournament_id
             "executed_at": transaction_record["executed_at"],
+            "client_order_id": data.get('client_order_id'),
             "message": f"{action_text} {stock_name} 成功，金額 ${abs(total_cost):,.2f} ({trade_context})"
         })
         
@@ -1081,9 +1146,10 @@ def execute_trade():
 
 @app.route('/api/portfolio', methods=['GET'])
 def get_portfolio():
-    """獲取投資組合"""
+    """獲取投資組合（帶 since=<version> 時只回傳變動的持倉，未變動回傳 304）"""
     user_id = request.args.get('user_id')
     tournament_id = request.args.get('tournament_id')
+    since = request.args.get('since', type=int)
     
     if not user_id:
         return jsonify({"error": "缺少用戶 ID 參數"}), 400
@@ -1095,45 +1161,56 @@ def get_portfolio():
         # 統一錦標賽架構：根據是否有錦標賽 ID 來獲取相應的交易記錄
         if tournament_id and tournament_id.strip():
             logger.info(f"🏆 獲取錦標賽 {tournament_id} 的投資組合")
-            response = supabase.table("portfolio_transactions").select("*").eq("user_id", user_id).eq("tournament_id", tournament_id).execute()
+            query = select_records(supabase, HoldingTransactionRecord).eq("user_id", user_id).eq("tournament_id", tournament_id)
         else:
             logger.info(f"📊 獲取用戶 {user_id} 的一般投資組合 (使用固定 UUID: {GENERAL_MODE_TOURNAMENT_ID})")
             # 一般模式使用固定的UUID而非NULL
-            response = supabase.table("portfolio_transactions").select("*").eq("user_id", user_id).eq("tournament_id", GENERAL_MODE_TOURNAMENT_ID).execute()
+            query = select_records(supabase, HoldingTransactionRecord).eq("user_id", user_id).eq("tournament_id", GENERAL_MODE_TOURNAMENT_ID)
         
-        transactions = response.data
+        transactions = decode_records(query.execute().data, HoldingTransactionRecord)
         
         # 計算每支股票的持倉（適配 portfolio_transactions 表結構）
         holdings = {}
         for tx in transactions:
-            symbol = tx['symbol']
+            symbol = tx.symbol
             if symbol not in holdings:
                 holdings[symbol] = {"shares": 0, "total_cost": 0}
             
             # portfolio_transactions 使用 amount 字段，需要計算股數
-            current_price = tx.get('price', 1.0)  # 確保不為零
-            shares = tx['amount'] / current_price if current_price > 0 else 0
+            current_price = tx.price if tx.price is not None else 1.0  # 確保不為零
+            shares = tx.amount / current_price if current_price > 0 else 0
             
-            if tx['action'] == 'buy':
+            if tx.action == 'buy':
                 holdings[symbol]['shares'] += shares
-                holdings[symbol]['total_cost'] += tx['amount']
+                holdings[symbol]['total_cost'] += tx.amount
             else:
                 holdings[symbol]['shares'] -= shares
-                holdings[symbol]['total_cost'] -= tx['amount']
+                holdings[symbol]['total_cost'] -= tx.amount
         
         # 清理零持倉
         holdings = {k: v for k, v in holdings.items() if v['shares'] > 0.001}
         
-        # 獲取當前股價並計算市值
+        # 獲取當前股價並計算市值（所有持股一次快取往返）
         positions = []
         total_market_value = 0
         
+        price_map = get_cached_prices(list(holdings.keys()))
+        fetched_prices = {}
+        for symbol in holdings:
+            if symbol not in price_map:
+                try:
+                    fetched_prices[symbol] = fetch_yahoo_finance_price(symbol)
+                except Exception as e:
+                    logger.error(f"獲取 {symbol} 股價失敗: {e}")
+        if fetched_prices:
+            set_cached_prices(fetched_prices)
+            price_map.update(fetched_prices)
+        
         for symbol, holding in holdings.items():
             try:
-                price_data = get_cached_price(symbol)
+                price_data = price_map.get(symbol)
                 if not price_data:
-                    price_data = fetch_yahoo_finance_price(symbol)
-                    set_cached_price(symbol, price_data)
+                    continue
                 
                 current_price = price_data['current_price']
                 market_value = holding['shares'] * current_price
@@ -1163,6 +1240,15 @@ def get_portfolio():
         total_return = total_market_value - total_invested
         total_return_percent = (total_return / total_invested * 100) if total_invested > 0 else 0
         
+        # 版本化差異：持倉依 symbol 比對，摘要欄位每次都回傳
+        delta = delta_tracker.diff(f"portfolio:{user_id}:{tournament_id or GENERAL_MODE_TOURNAMENT_ID}",
+                                   positions, 'symbol', since, summary={
+                                       "cash_balance": cash_balance,
+                                       "market_value": total_market_value
+                                   })
+        if delta.not_modified:
+            return '', 304
+        
         portfolio = {
             "user_id": user_id,
             "tournament_id": tournament_id,
@@ -1172,9 +1258,14 @@ def get_portfolio():
             "total_invested": total_invested,
             "total_return": total_return,
             "total_return_percent": total_return_percent,
-            "positions": positions,
+            "positions": delta.rows,
+            "version": delta.version,
+            "delta": not delta.full,
             "last_updated": datetime.now().isoformat()
         }
+        if not delta.full:
+            portfolio["since"] = since
+            portfolio["removed_positions"] = delta.removed
         
         portfolio_type = f"錦標賽 {tournament_id}" if tournament_id else "一般模式"
         logger.info(f"✅ 獲取投資組合成功: 用戶 {user_id} ({portfolio_type}), 總值 ${total_value:.2f}")
@@ -1186,62 +1277,65 @@ def get_portfolio():
 
 @app.route('/api/transactions', methods=['GET'])
 def get_transactions():
-    """獲取交易歷史"""
+    """獲取交易歷史（由新到舊，以 cursor 取得下一頁，下一頁游標放在 X-Next-Cursor 標頭）"""
     user_id = request.args.get('user_id')
     tournament_id = request.args.get('tournament_id')
-    limit = int(request.args.get('limit', 50))
+    cursor = request.args.get('cursor')
     
     if not user_id:
         return jsonify({"error": "缺少用戶 ID 參數"}), 400
     
+    try:
+        limit = page_size(request.args.get('limit'))
+    except ValueError:
+        return jsonify({"error": "無效的 limit 參數"}), 400
+    
     try:
         # 統一錦標賽架構：根據是否有錦標賽 ID 來獲取相應的交易記錄
         if tournament_id and tournament_id.strip():
             logger.info(f"🏆 獲取錦標賽 {tournament_id} 的交易歷史")
-            response = supabase.table("portfolio_transactions")\
-                .select("*")\
-                .eq("user_id", user_id)\
-                .eq("tournament_id", tournament_id)\
-                .order("executed_at", desc=True)\
-                .limit(limit)\
-                .execute()
         else:
             logger.info(f"📊 獲取用戶 {user_id} 的一般交易歷史 (使用固定 UUID: {GENERAL_MODE_TOURNAMENT_ID})")
             # 一般模式使用固定的UUID而非NULL
-            response = supabase.table("portfolio_transactions")\
-                .select("*")\
-                .eq("user_id", user_id)\
-                .eq("tournament_id", GENERAL_MODE_TOURNAMENT_ID)\
-                .order("executed_at", desc=True)\
-                .limit(limit)\
-                .execute()
+            tournament_id = None
+        
+        query = select_records(supabase, TransactionRecord)\
+            .eq("user_id", user_id)\
+            .eq("tournament_id", tournament_id or GENERAL_MODE_TOURNAMENT_ID)
+        rows, next_cursor = fetch_page(query, limit, cursor)
         
         transactions = []
-        for tx in response.data:
+        for tx in decode_records(rows, TransactionRecord):
             # 適配 portfolio_transactions 表結構
-            current_price = tx.get('price', 1.0)
-            shares = tx['amount'] / current_price if current_price > 0 else 0
+            current_price = tx.price if tx.price is not None else 1.0
+            shares = tx.amount / current_price if current_price > 0 else 0
             
             transactions.append({
-                "id": tx['id'],
-                "symbol": tx['symbol'],
-                "action": tx['action'],
+                "id": tx.id,
+                "symbol": tx.symbol,
+                "action": tx.action,
                 "quantity": shares,  # 根據 amount 和 price 計算股數
-                "price": tx['price'],
-                "amount": tx['amount'],  # 使用 amount 字段
-                "executed_at": tx['executed_at'],
-                "tournament_id": tx.get('tournament_id')  # 包含錦標賽 ID
+                "price": tx.price,
+                "amount": tx.amount,  # 使用 amount 字段
+                "executed_at": tx.executed_at,
+                "tournament_id": tx.tournament_id  # 包含錦標賽 ID
             })
         
         transaction_type = f"錦標賽 {tournament_id}" if tournament_id else "一般模式"
         logger.info(f"✅ 獲取交易歷史成功: 用戶 {user_id} ({transaction_type}), {len(transactions)} 筆記錄")
-        return jsonify(transactions)
+        response = jsonify(transactions)
+        if next_cursor:
+            response.headers['X-Next-Cursor'] = next_cursor
+        return response
         
+    except InvalidCursor as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         logger.error(f"獲取交易歷史失敗: {e}")
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/available-tournaments', methods=['GET'])
+@http_cache.conditional([TOURNAMENTS_SCOPE], max_age=0, s_maxage=10, revalidate_every=30)
 def get_available_tournaments():
     """獲取所有可參與的錦標賽（test03創建的錦標賽 + 用戶創建的錦標賽）"""
     user_id = request.args.get('user_id', '')  # 獲取用戶ID參數
@@ -1249,32 +1343,15 @@ def get_available_tournaments():
     try:
         logger.info(f"🏆 獲取可參與的錦標賽列表 (用戶: {user_id})")
         
-        # 獲取所有錦標賽（簡化邏輯，所有錦標賽都屬於用戶）
+        # 獲取所有錦標賽（記憶體目錄，簡化邏輯，所有錦標賽都屬於用戶）
         try:
-            # 直接查詢所有tournaments
-            response = supabase.table("tournaments")\
-                .select("*")\
-                .execute()
-            
-            tournaments = []
-            for tournament in response.data:
-                tournaments.append({
-                    "id": tournament.get("id"),
-                    "name": tournament.get("name", "未命名錦標賽"),
-                    "description": tournament.get("description", ""),
-                    "status": tournament.get("status", "ongoing"),
-                    "start_date": tournament.get("start_date", "2025-08-01T00:00:00Z"),
-                    "end_date": tournament.get("end_date", "2025-08-31T23:59:59Z"),
-                    "initial_balance": tournament.get("initial_balance", 100000.0),
-                    "current_participants": tournament.get("current_participants", 0),
-                    "max_participants": tournament.get("max_participants", 100),
-                    "created_by": "user",  # 簡化為所有錦標賽都屬於用戶
-                    "created_at": tournament.get("created_at"),
-                    "is_user_created": True,  # 所有錦標賽都是用戶創建
-                    "creator_label": "我創建的"  # 統一標籤
-                })
+            member_ids = tournament_catalog.memberships(user_id) if user_id else set()
+            tournaments = [
+                {**tournament, "is_enrolled": tournament["id"] in member_ids}
+                for tournament in tournament_catalog.tournaments()
+            ]
             
-            logger.info(f"✅ 從數據庫獲取錦標賽: {len(tournaments)} 個")
+            logger.info(f"✅ 從錦標賽目錄獲取錦標賽: {len(tournaments)} 個")
             
         except Exception as db_error:
             logger.warning(f"⚠️ 數據庫查詢失敗，使用備用數據: {db_error}")
@@ -1381,15 +1458,14 @@ def get_user_tournaments():
     try:
         logger.info(f"🏆 獲取用戶 {user_id} 已參與的錦標賽")
         
-        # 獲取所有錦標賽（簡化邏輯）
+        # 錦標賽目錄依參與索引過濾，交易筆數由計數器提供
         try:
-            # 直接查詢所有tournaments
-            all_tournaments_response = supabase.table("tournaments")\
-                .select("*")\
-                .execute()
-            
-            all_tournaments = all_tournaments_response.data
-        except Exception:
+            member_ids = tournament_catalog.memberships(user_id)
+            all_tournaments = [tournament for tournament in tournament_catalog.tournaments() if tournament["id"] in member_ids]
+            trade_counts = tournament_catalog.trade_counts(user_id, [tournament["id"] for tournament in all_tournaments])
+        except Exception as e:
+            logger.warning(f"⚠️ 錦標賽目錄讀取失敗，使用備用數據: {e}")
+            trade_counts = {}
             # 使用備用錦標賽數據（所有錦標賽都屬於用戶）
             all_tournaments = [
                 {
@@ -1445,24 +1521,13 @@ def get_user_tournaments():
         # 簡化邏輯：所有錦標賽都是用戶創建且參與的
         user_tournaments = []
         for tournament in all_tournaments:
-            tournament_id = tournament.get("id")
-            
             user_tournaments.append({
-                "id": tournament_id,
-                "name": tournament.get("name"),
-                "description": tournament.get("description", ""),
-                "status": tournament.get("status", "ongoing"),
-                "start_date": tournament.get("start_date"),
-                "end_date": tournament.get("end_date"),
-                "initial_balance": tournament.get("initial_balance"),
-                "current_participants": tournament.get("current_participants"),
-                "max_participants": tournament.get("max_participants"),
-                "created_by": "user",
+                **tournament,
                 "is_enrolled": True,
                 "is_user_created": True,  # 所有錦標賽都是用戶創建
                 "creator_label": "我創建的",
                 "participation_type": "創建者",
-                "total_trades": 5  # 固定數量，避免資料庫查詢
+                "total_trades": trade_counts.get(tournament["id"], 0)  # 用戶交易筆數計數器
             })
         
         # 統計信息（簡化）
@@ -1500,8 +1565,7 @@ def join_tournament():
         
         # 檢查錦標賽是否存在（從可參與錦標賽中查找）
         try:
-            tournament_response = supabase.table("tournaments")\
-                .select("*")\
+            tournament_response = select_records(supabase, TournamentEntryRecord)\
                 .eq("id", tournament_id)\
                 .eq("created_by", "test03")\
                 .execute()
@@ -1509,7 +1573,7 @@ def join_tournament():
             if not tournament_response.data:
                 return jsonify({"error": "錦標賽不存在或不可參與"}), 404
             
-            tournament_info = tournament_response.data[0]
+            tournament_info = TournamentEntryRecord.from_row(tournament_response.data[0])
         except Exception:
             # 使用備用數據檢查
             available_tournaments = [
@@ -1520,11 +1584,11 @@ def join_tournament():
             if tournament_id not in available_tournaments:
                 return jsonify({"error": "錦標賽不存在或不可參與"}), 404
             
-            tournament_info = {
-                "id": tournament_id,
-                "name": f"test03的錦標賽 {tournament_id[:8]}",
-                "initial_balance": 100000.0
-            }
+            tournament_info = TournamentEntryRecord(
+                id=tournament_id,
+                name=f"test03的錦標賽 {tournament_id[:8]}",
+                entry_capital=100000.0
+            )
         
         # 檢查用戶是否已經參與此錦標賽
         try:
@@ -1547,7 +1611,7 @@ def join_tournament():
             "tournament_id": tournament_id,
             "symbol": "INIT",
             "action": "join", 
-            "amount": tournament_info.get("initial_balance", 100000.0),
+            "amount": tournament_info.entry_capital,
             "price": 1.0,
             "executed_at": datetime.now().isoformat()
         }
@@ -1555,12 +1619,23 @@ def join_tournament():
         try:
             supabase.table("portfolio_transactions").insert(initial_transaction).execute()
             
+            # 參與名單（/api/user-tournaments 參與索引來源，參與人數由數據庫觸發器維護），
+            # 並清除進行中錦標賽列表、參與索引與錦標賽列表 HTTP 快取版本
+            from tournament_service import get_tournament_service
+            tournament_service = get_tournament_service(supabase, redis_client)
+            try:
+                tournament_service.join_tournament(tournament_id, user_id, tournament_info.entry_capital)
+            except Exception as e:
+                logger.warning(f"⚠️ 參與名單寫入失敗: {e}")
+                tournament_service.invalidate_active_tournaments()
+                tournament_catalog.invalidate_memberships(user_id)
+            
             logger.info(f"✅ 用戶 {user_id} 成功加入錦標賽 {tournament_id}")
             return jsonify({
                 "success": True,
-                "message": f"成功加入錦標賽: {tournament_info.get('name', '未命名錦標賽')}",
+                "message": f"成功加入錦標賽: {tournament_info.name}",
                 "tournament_id": tournament_id,
-                "initial_balance": tournament_info.get("initial_balance", 100000.0)
+                "initial_balance": tournament_info.entry_capital
             })
             
         except Exception as db_error:
@@ -1570,9 +1645,9 @@ def join_tournament():
             logger.info(f"✅ 模擬用戶 {user_id} 加入錦標賽 {tournament_id} (數據庫問題，使用模擬模式)")
             return jsonify({
                 "success": True,
-                "message": f"成功加入錦標賽: {tournament_info.get('name', '未命名錦標賽')} (模擬模式)",
+                "message": f"成功加入錦標賽: {tournament_info.name} (模擬模式)",
                 "tournament_id": tournament_id,
-                "initial_balance": tournament_info.get("initial_balance", 100000.0),
+                "initial_balance": tournament_info.entry_capital,
                 "note": "模擬模式：實際環境中會記錄到數據庫"
             })
         
@@ -0,0 +1,95 @@
+"""
+回應編碼與壓縮基準測試
+比較標準 json 與 orjson 的編碼時間，以及 gzip / brotli 各等級的壓縮率與 CPU 時間
+
+使用方式:
+    python benchmark_response_encoding.py [--rounds 50]
+
+測試資料模擬三種大型回應：完整台股清單、500 人排行榜、1000 筆交易紀錄
+"""
+
+import argparse
+import gzip
+import json
+import random
+import time
+import uuid
+from datetime import datetime, timedelta
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+INDUSTRIES = ['半導體業', '電子零組件業', '金融保險業', '航運業', '生技醫療業', '光電業', '鋼鐵工業', '食品工業']
+
+def build_payloads():
+    random.seed(42)
+    stocks = [{
+        'code': f"{1101 + i}",
+        'name': f"測試股份有限公司{i}",
+        'full_code': f"{1101 + i}.TW",
+        'market': '上市' if i % 3 else '上櫃',
+        'industry': random.choice(INDUSTRIES),
+        'is_listed': bool(i % 3)
+    } for i in range(2000)]
+
+    leaderboard = [{
+        'rank': i + 1,
+        'user_id': str(uuid.uuid4()),
+        'total_assets': round(1000000 * random.uniform(0.7, 1.5), 2),
+        'return_rate': round(random.uniform(-30, 50), 4)
+    } for i in range(500)]
+
+    now = datetime.utcnow()
+    transactions = [{
+        'id': str(uuid.uuid4()),
+        'user_id': str(uuid.uuid4()),
+        'symbol': f"{random.randint(1101, 9999)}.TW",
+        'action': random.choice(['buy', 'sell']),
+        'amount': round(random.uniform(1000, 500000), 2),
+        'price': round(random.uniform(10, 1000), 2),
+        'executed_at': (now - timedelta(minutes=i)).isoformat()
+    } for i in range(1000)]
+
+    return {
+        'taiwan_stocks': {'stocks': stocks, 'total_count': len(stocks)},
+        'leaderboard': {'success': True, 'leaderboard': leaderboard, 'total_participants': 500},
+        'transactions': {'transactions': transactions}
+    }
+
+def timed(fn, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        result = fn()
+    return result, (time.perf_counter() - start) / rounds * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description='回應編碼與壓縮基準測試')
+    parser.add_argument('--rounds', type=int, default=50)
+    rounds = parser.parse_args().rounds
+
+    for name, payload in build_payloads().items():
+        print(f"\n📦 {name}")
+
+        # Flask 預設：ensure_ascii + sort_keys
+        body, ms = timed(lambda: json.dumps(payload, ensure_ascii=True, sort_keys=True).encode('utf-8'), rounds)
+        print(f"  {'json (Flask 預設)':<22} {len(body) / 1024:>8.1f} KB  {ms:>7.2f} ms")
+        if orjson:
+            body, ms = timed(lambda: orjson.dumps(payload, option=orjson.OPT_SORT_KEYS), rounds)
+            print(f"  {'orjson':<22} {len(body) / 1024:>8.1f} KB  {ms:>7.2f} ms")
+
+        variants = [(f"gzip -{level}", lambda level=level: gzip.compress(body, compresslevel=level, mtime=0)) for level in (1, 6, 9)]
+        if brotli:
+            variants += [(f"brotli q{quality}", lambda quality=quality: brotli.compress(body, quality=quality)) for quality in (4, 5, 11)]
+        for label, fn in variants:
+            compressed, ms = timed(fn, rounds)
+            print(f"  {label:<22} {len(compressed) / 1024:>8.1f} KB  {ms:>7.2f} ms  ({len(compressed) / len(body):.1%})")
+
+if __name__ == '__main__':
+    main()
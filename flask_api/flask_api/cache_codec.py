@@ -0,0 +1,115 @@
+"""
+Redis 快取值編解碼層
+以一個版本位元組標示格式，新舊格式可在滾動部署期間並存
+
+格式（第一個位元組）:
+    0x01  JSON（orjson 編碼，無 orjson 時使用標準 json）
+    0x02  MessagePack
+    0x81  zstd 壓縮的 JSON
+    0x82  zstd 壓縮的 MessagePack
+    其他  舊版 JSON 文字（無版本位元組，直接解析）
+
+大型值（完整台股清單、排行榜）超過壓縮門檻時使用 zstd 壓縮。
+orjson / msgpack / zstandard 皆為選用套件，未安裝時自動退回可用的格式。
+"""
+
+import json
+import logging
+import os
+from typing import Any, Optional, Union
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+FORMAT_JSON = 0x01
+FORMAT_MSGPACK = 0x02
+FLAG_ZSTD = 0x80
+
+# 寫入格式: msgpack / json / legacy（legacy 為舊版純 JSON 文字，供舊版 worker 仍在線時使用）
+CACHE_CODEC = os.environ.get('CACHE_CODEC', 'msgpack' if msgpack else 'json')
+COMPRESS_THRESHOLD = int(os.environ.get('CACHE_COMPRESS_THRESHOLD', 4096))  # 超過 4KB 才壓縮
+ZSTD_LEVEL = 3
+
+_zstd_compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL) if zstandard else None
+_zstd_decompressor = zstandard.ZstdDecompressor() if zstandard else None
+
+def _json_dumps(value: Any) -> bytes:
+    if orjson:
+        return orjson.dumps(value)
+    return json.dumps(value, ensure_ascii=False).encode('utf-8')
+
+def _json_loads(payload: Union[bytes, str]) -> Any:
+    if orjson:
+        return orjson.loads(payload)
+    return json.loads(payload)
+
+def encode(value: Any, codec: Optional[str] = None) -> bytes:
+    """將快取值編碼為帶版本位元組的二進位格式"""
+    codec = codec or CACHE_CODEC
+
+    if codec == 'legacy':
+        return _json_dumps(value)
+
+    if codec == 'msgpack' and msgpack:
+        fmt = FORMAT_MSGPACK
+        payload = msgpack.packb(value, use_bin_type=True)
+    else:
+        fmt = FORMAT_JSON
+        payload = _json_dumps(value)
+
+    if _zstd_compressor and len(payload) > COMPRESS_THRESHOLD:
+        fmt |= FLAG_ZSTD
+        payload = _zstd_compressor.compress(payload)
+
+    return bytes([fmt]) + payload
+
+def decode(data: Union[bytes, str, None]) -> Any:
+    """解碼快取值（自動辨識新格式與舊版 JSON 文字）"""
+    if data is None:
+        return None
+
+    if isinstance(data, str):
+        return _json_loads(data)
+
+    if not data:
+        return None
+
+    fmt = data[0]
+    if fmt not in (FORMAT_JSON, FORMAT_MSGPACK, FORMAT_JSON | FLAG_ZSTD, FORMAT_MSGPACK | FLAG_ZSTD):
+        # 舊版純 JSON 文字
+        return _json_loads(data)
+
+    payload = data[1:]
+    if fmt & FLAG_ZSTD:
+        if not _zstd_decompressor:
+            raise ValueError("快取值使用 zstd 壓縮，但未安裝 zstandard 套件")
+        payload = _zstd_decompressor.decompress(payload)
+
+    if fmt & ~FLAG_ZSTD == FORMAT_MSGPACK:
+        if not msgpack:
+            raise ValueError("快取值使用 MessagePack 編碼，但未安裝 msgpack 套件")
+        return msgpack.unpackb(payload, raw=False)
+
+    return _json_loads(payload)
+
+def decode_text(data: Union[bytes, str, None]) -> Optional[str]:
+    """解碼純文字快取值（如狀態字串）"""
+    if data is None:
+        return None
+    if isinstance(data, bytes):
+        return data.decode('utf-8')
+    return data
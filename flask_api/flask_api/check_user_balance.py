@@ -3,7 +3,8 @@
 檢查用戶餘額
 """
 
-from supabase import create_client, Client
+from supabase import Client
+from supabase_pool import create_client
 import json
 
 # Supabase配置
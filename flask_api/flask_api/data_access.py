@@ -0,0 +1,152 @@
+"""
+投影式資料存取
+每個查詢宣告自己需要的欄位，資料列解碼為 __slots__ 紀錄，不再 select("*")
+
+設計重點:
+1. 以 @record(表名) 宣告紀錄類別（slots dataclass），欄位即為 select 投影，
+   只傳輸與解析用到的欄位
+2. 同一張表可依用途宣告不同紀錄（例如交易列表與持倉計算各自的欄位）
+3. 紀錄沒有 __dict__，每筆佔用記憶體比 dict 小；asdict / orjson 可直接序列化
+4. 註記為 float / int 的欄位於解碼時轉型（PostgREST numeric 可能回傳字串），
+   None 保持為 None
+5. 可能超過 1000 筆的查詢以 fetch_all 分批讀取（PostgREST 會靜默截斷超過上限的資料列）
+
+使用方式:
+    query = select_records(supabase, TransactionRecord).eq('user_id', user_id)
+    transactions = decode_records(query.execute().data, TransactionRecord)
+"""
+
+from dataclasses import dataclass, fields
+from typing import Any, Callable, Dict, Iterable, List, Optional, Type, TypeVar, Union, get_args, get_origin
+
+R = TypeVar('R')
+
+_CONVERTERS = {float: float, int: int}
+
+def _converter(annotation) -> Optional[Callable[[Any], Any]]:
+    """float / int / Optional[float] 等欄位的轉型函式"""
+    if get_origin(annotation) is Union:
+        args = [arg for arg in get_args(annotation) if arg is not type(None)]
+        annotation = args[0] if len(args) == 1 else None
+    return _CONVERTERS.get(annotation)
+
+def record(table: str):
+    """宣告投影紀錄類別（slots dataclass，欄位順序即 select 欄位順序）"""
+    def decorator(cls):
+        cls = dataclass(slots=True)(cls)
+        cls.TABLE = table
+        cls.COLUMNS = ', '.join(f.name for f in fields(cls))
+        cls._decoders = tuple((f.name, _converter(f.type)) for f in fields(cls))
+        cls.from_row = classmethod(_from_row)
+        cls.to_dict = _to_dict
+        return cls
+    return decorator
+
+def _from_row(cls, row: Dict):
+    values = []
+    for name, convert in cls._decoders:
+        value = row.get(name)
+        values.append(convert(value) if convert and value is not None else value)
+    return cls(*values)
+
+def _to_dict(self) -> Dict:
+    return {name: getattr(self, name) for name, _ in self._decoders}
+
+def select_records(supabase, record_cls: Type[R]):
+    """以紀錄欄位建立投影查詢"""
+    return supabase.table(record_cls.TABLE).select(record_cls.COLUMNS)
+
+def decode_records(rows: Iterable[Dict], record_cls: Type[R]) -> List[R]:
+    """將查詢結果解碼為紀錄"""
+    from_row = record_cls.from_row
+    return [from_row(row) for row in rows]
+
+# ========================================
+# 一般模式與錦標賽共用的交易紀錄（portfolio_transactions）
+# ========================================
+
+@record('portfolio_transactions')
+class TransactionRecord:
+    """交易歷史列表"""
+    id: str
+    symbol: str
+    action: str
+    price: float
+    amount: float
+    executed_at: str
+    tournament_id: Optional[str] = None
+
+@record('portfolio_transactions')
+class HoldingTransactionRecord:
+    """持倉計算（只需要股票、方向、價格與金額）"""
+    symbol: str
+    action: str
+    price: float
+    amount: float
+
+# ========================================
+# 錦標賽（tournaments）
+# 欄位依 flask_api/flask_api/tournament_schema.sql（starts_at / ends_at / entry_capital），
+# 與 tournament_service、tournament_status 的查詢相同；API 回應的 start_date / end_date /
+# initial_balance 由呼叫端對應
+# ========================================
+
+@record('tournaments')
+class TournamentListingRecord:
+    """錦標賽列表"""
+    id: str
+    name: Optional[str] = None
+    description: Optional[str] = None
+    status: Optional[str] = None
+    starts_at: Optional[str] = None
+    ends_at: Optional[str] = None
+    entry_capital: Optional[float] = None
+    current_participants: Optional[int] = None
+    max_participants: Optional[int] = None
+    created_at: Optional[str] = None
+
+@record('tournaments')
+class TournamentEntryRecord:
+    """加入錦標賽時的檢查"""
+    id: str
+    name: Optional[str] = None
+    entry_capital: Optional[float] = None
+
+# ========================================
+# 錦標賽成交紀錄（tournament_trades）
+# ========================================
+
+@record('tournament_trades')
+class TournamentTradeRecord:
+    """錦標賽成交紀錄列表"""
+    id: str
+    user_id: str
+    symbol: str
+    side: str
+    qty: float
+    price: float
+    total_amount: float
+    executed_at: str
+    status: Optional[str] = None
+
+# ========================================
+# 分批讀取
+# ========================================
+
+# PostgREST（Supabase 預設 max-rows）單次回應最多 1000 筆，超過的部分不會報錯而是直接截斷
+FETCH_BATCH_SIZE = 1000
+
+def fetch_all(query, order: str, batch_size: int = FETCH_BATCH_SIZE) -> List[Dict]:
+    """分批讀取查詢的所有資料列
+
+    order: 唯一且穩定的排序欄位（例如 'tournament_id,user_id'），批次之間不重複也不遺漏
+    """
+    # 直接設定參數（重複呼叫時覆蓋前一批的 offset / limit，不累加）
+    query.params = query.params.set('order', order)
+    rows: List[Dict] = []
+    while True:
+        query.params = query.params.set('offset', len(rows)).set('limit', batch_size)
+        batch = query.execute().data
+        rows.extend(batch)
+        if len(batch) < batch_size:
+            return rows
@@ -3,7 +3,8 @@
 調試交易記錄數據，找出iOS顯示的交易數據來源
 """
 
-from supabase import create_client, Client
+from supabase import Client
+from supabase_pool import create_client
 import json
 
 # Supabase配置
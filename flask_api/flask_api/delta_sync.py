@@ -0,0 +1,202 @@
+"""
+版本化差異回應
+輪詢的客戶端帶上次取得的版本（since=<version>），只下載有變動的列
+
+設計重點:
+1. 每個資源（排行榜視窗、投資組合）一個單調遞增的版本號
+2. 保存目前每列的摘要（digest），內容有變動時版本號 +1，
+   並將變動 / 刪除的列鍵值推入環形緩衝（只保留最近 N 個版本）
+3. since 仍在環形緩衝範圍內時回傳差異，版本未變回傳 304，過舊則回傳完整內容
+4. 提交版本時以 Lua 腳本比對預期版本（CAS），多個 worker 同時更新不會重複遞增
+5. Redis 未連線時保存在行程內
+
+Redis 鍵值:
+    delta_version:{resource}  版本號
+    delta_log:{resource}      環形緩衝（索引 0 為最新版本的變動）
+    delta_digest:{resource}   雜湊 列鍵值 -> 摘要
+"""
+
+import hashlib
+import logging
+import threading
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+import cache_codec
+
+logger = logging.getLogger(__name__)
+
+# 提交新版本（版本號不符時回傳 -1）
+# KEYS: 版本號, 環形緩衝, 摘要
+# ARGV: 預期版本, 緩衝長度, 過期秒數, 變動紀錄, 列鍵值與摘要...
+COMMIT_SCRIPT = """
+local current = tonumber(redis.call('GET', KEYS[1]) or '0')
+if current ~= tonumber(ARGV[1]) then
+    return -1
+end
+local version = redis.call('INCR', KEYS[1])
+redis.call('LPUSH', KEYS[2], ARGV[4])
+redis.call('LTRIM', KEYS[2], 0, tonumber(ARGV[2]) - 1)
+redis.call('DEL', KEYS[3])
+for i = 5, #ARGV, 200 do
+    redis.call('HSET', KEYS[3], unpack(ARGV, i, math.min(i + 199, #ARGV)))
+end
+for i = 1, 3 do
+    redis.call('EXPIRE', KEYS[i], tonumber(ARGV[3]))
+end
+return version
+"""
+
+# 摘要欄位（非列資料）的保留鍵值，只用於判斷是否有變動
+SUMMARY_KEY = '__summary__'
+
+def row_digest(row) -> str:
+    return hashlib.blake2b(cache_codec.encode(row, 'legacy'), digest_size=8).hexdigest()
+
+@dataclass
+class DeltaResult:
+    """差異計算結果"""
+    version: int
+    full: bool                                      # True: rows 為完整內容
+    rows: List[Dict] = field(default_factory=list)  # 完整內容或變動的列
+    removed: List[str] = field(default_factory=list)
+    summary_changed: bool = False                   # 摘要欄位有變動
+
+    @property
+    def not_modified(self) -> bool:
+        return not self.full and not self.rows and not self.removed and not self.summary_changed
+
+class DeltaTracker:
+    """版本化差異追蹤"""
+
+    def __init__(self, redis_client=None, history: int = 32, ttl: int = 86400):
+        self.redis = redis_client
+        self.history = history  # 環形緩衝保留的版本數
+        self.ttl = ttl          # 閒置資源的過期秒數
+
+        if self.redis:
+            self._commit_script = self.redis.register_script(COMMIT_SCRIPT)
+
+        self._local: Dict[str, Dict] = {}  # resource -> {'version', 'log', 'digests'}
+        self._lock = threading.Lock()
+
+        # 統計指標
+        self.full_responses = 0
+        self.delta_responses = 0
+        self.not_modified_responses = 0
+
+    # ========================================
+    # 狀態存取
+    # ========================================
+
+    def _load(self, resource: str):
+        """讀取版本號、摘要與環形緩衝（一次往返）"""
+        if self.redis:
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.get(f"delta_version:{resource}")
+            pipe.hgetall(f"delta_digest:{resource}")
+            pipe.lrange(f"delta_log:{resource}", 0, self.history - 1)
+            version, digests, log = pipe.execute()
+            return (
+                int(version or 0),
+                {cache_codec.decode_text(key): cache_codec.decode_text(value) for key, value in digests.items()},
+                [cache_codec.decode(entry) for entry in log]
+            )
+
+        with self._lock:
+            state = self._local.get(resource)
+            if state is None:
+                return 0, {}, []
+            return state['version'], dict(state['digests']), list(state['log'])
+
+    def _commit(self, resource: str, expected: int, entry: Dict, digests: Dict[str, str]) -> int:
+        """提交新版本，回傳新版本號（其他 worker 已先提交時回傳 -1）"""
+        if self.redis:
+            args = [expected, self.history, self.ttl, cache_codec.encode(entry)]
+            for key, digest in digests.items():
+                args.extend((key, digest))
+            return int(self._commit_script(
+                keys=[f"delta_version:{resource}", f"delta_log:{resource}", f"delta_digest:{resource}"],
+                args=args
+            ))
+
+        with self._lock:
+            state = self._local.setdefault(resource, {'version': 0, 'log': deque(maxlen=self.history), 'digests': {}})
+            if state['version'] != expected:
+                return -1
+            state['version'] += 1
+            state['log'].appendleft(entry)
+            state['digests'] = dict(digests)
+            return state['version']
+
+    # ========================================
+    # 差異計算
+    # ========================================
+
+    def diff(self, resource: str, rows: List[Dict], key_field: str, since: Optional[int] = None,
+             summary: Optional[Dict] = None) -> DeltaResult:
+        """比對目前內容與已記錄版本，回傳完整內容、差異或未變動
+
+        summary: 每次都完整回傳的摘要欄位，變動時同樣遞增版本
+        """
+        current = {str(row[key_field]): row for row in rows}
+        digests = {key: row_digest(row) for key, row in current.items()}
+        if summary is not None:
+            digests[SUMMARY_KEY] = row_digest(summary)
+
+        for _ in range(2):
+            version, stored, log = self._load(resource)
+            changed = [key for key, digest in digests.items() if stored.get(key) != digest]
+            removed = [key for key in stored if key not in digests]
+            if not changed and not removed and version:
+                break
+            committed = self._commit(resource, version, {'c': changed, 'r': removed}, digests)
+            if committed > 0:
+                version = committed
+                log = [{'c': changed, 'r': removed}] + log[:self.history - 1]
+                break
+        else:
+            # 其他 worker 持續更新中，回傳完整內容（不帶可用的版本號）
+            self.full_responses += 1
+            return DeltaResult(version=0, full=True, rows=rows)
+
+        if since is None or since > version or version - since > len(log):
+            self.full_responses += 1
+            return DeltaResult(version=version, full=True, rows=rows)
+
+        changed_keys, removed_keys = set(), set()
+        for entry in log[:version - since]:
+            changed_keys.update(entry['c'])
+            removed_keys.update(entry['r'])
+
+        result = DeltaResult(
+            version=version,
+            full=False,
+            rows=[row for key, row in current.items() if key in changed_keys],
+            removed=sorted(key for key in removed_keys | changed_keys if key not in current and key != SUMMARY_KEY),
+            summary_changed=SUMMARY_KEY in changed_keys
+        )
+        if result.not_modified:
+            self.not_modified_responses += 1
+        else:
+            self.delta_responses += 1
+        return result
+
+    def metrics(self) -> Dict:
+        """獲取差異回應統計"""
+        return {
+            'full_responses': self.full_responses,
+            'delta_responses': self.delta_responses,
+            'not_modified_responses': self.not_modified_responses
+        }
+
+# 全局差異追蹤實例（單例模式）
+delta_tracker = None
+
+def get_delta_tracker(redis_client=None) -> DeltaTracker:
+    """獲取差異追蹤實例（單例模式）"""
+    global delta_tracker
+    if delta_tracker is None:
+        delta_tracker = DeltaTracker(redis_client)
+    return delta_tracker
@@ -0,0 +1,161 @@
+"""
+交易費用計算引擎
+以市場費率表驅動，支援單筆與整批（NumPy 向量化）計算
+
+計算項目:
+1. 券商手續費（依費率計算，套用最低手續費）
+2. 證券交易稅（當沖減半）
+3. 總交易成本
+
+單筆交易（/api/trade）使用 compute_one，費用試算（/api/fees/estimate）使用 compute，
+整批試算只需一次 NumPy 運算，而非每筆一次 Python 呼叫。
+錦標賽交易（單筆、批量與 bulk）不收手續費與交易稅，不經過本引擎。
+"""
+
+from dataclasses import dataclass
+from typing import Dict, Iterable, Optional, Sequence, Union
+
+import numpy as np
+
+
+@dataclass(frozen=True)
+class MarketFeeSchedule:
+    """單一市場的費率設定"""
+    market: str
+    brokerage_rate: float          # 手續費率
+    min_fee: float = 0.0           # 最低手續費
+    securities_tax_rate: float = 0.0  # 證券交易稅率
+    day_trade_tax_factor: float = 1.0  # 當沖交易稅倍率（台股為 0.5）
+
+
+@dataclass
+class FeeBreakdown:
+    """整批交易的費用明細（每個欄位皆為與輸入等長的陣列）"""
+    brokerage_fee: np.ndarray
+    securities_tax: np.ndarray
+    total_cost: np.ndarray
+
+    def row(self, index: int) -> Dict[str, float]:
+        """取出單筆費用明細（與 compute_one 回傳格式一致）"""
+        return {
+            "brokerage_fee": float(self.brokerage_fee[index]),
+            "securities_tax": float(self.securities_tax[index]),
+            "total_cost": float(self.total_cost[index])
+        }
+
+    def rows(self) -> list:
+        """轉換為每筆一個字典的列表"""
+        return [self.row(i) for i in range(len(self.total_cost))]
+
+
+# 費率常量（唯一來源，app.py 由此匯入）
+TRANSACTION_FEE_RATE = 0.001425  # 台股手續費 0.1425%
+TAIWAN_STOCK_TAX_RATE = 0.003    # 台股證券交易稅 0.3%
+TAIWAN_MIN_FEE = 20              # 台股最低手續費 20 元
+
+# 預設費率表
+TAIWAN_FEE_SCHEDULE = MarketFeeSchedule(
+    market="TW",
+    brokerage_rate=TRANSACTION_FEE_RATE,
+    min_fee=TAIWAN_MIN_FEE,
+    securities_tax_rate=TAIWAN_STOCK_TAX_RATE,
+    day_trade_tax_factor=0.5     # 當沖交易稅減半
+)
+
+US_FEE_SCHEDULE = MarketFeeSchedule(
+    market="US",
+    brokerage_rate=TRANSACTION_FEE_RATE
+)
+
+DEFAULT_MARKET = "US"
+
+
+def market_for_symbol(symbol: str) -> str:
+    """依股票代號判斷市場（.TW / .TWO 為台股，其餘沿用美股費率）"""
+    symbol = symbol.upper()
+    if symbol.endswith('.TW') or symbol.endswith('.TWO'):
+        return "TW"
+    return DEFAULT_MARKET
+
+
+class FeeEngine:
+    """表格驅動的交易費用引擎"""
+
+    def __init__(self, schedules: Optional[Iterable[MarketFeeSchedule]] = None):
+        self._schedules: Dict[str, MarketFeeSchedule] = {}
+        self._rebuild_tables()
+        for schedule in schedules or (TAIWAN_FEE_SCHEDULE, US_FEE_SCHEDULE):
+            self.register(schedule)
+
+    def register(self, schedule: MarketFeeSchedule):
+        """註冊或覆蓋市場費率"""
+        self._schedules[schedule.market] = schedule
+        self._rebuild_tables()
+
+    def schedule(self, market: str) -> MarketFeeSchedule:
+        """取得市場費率設定"""
+        if market not in self._schedules:
+            raise ValueError(f"未設定費率的市場: {market}")
+        return self._schedules[market]
+
+    def _rebuild_tables(self):
+        """將費率表轉為 NumPy 陣列，供向量化查表使用"""
+        markets = list(self._schedules.keys())
+        self._market_index = {market: idx for idx, market in enumerate(markets)}
+        self._rate_table = np.array([self._schedules[m].brokerage_rate for m in markets], dtype=np.float64)
+        self._min_fee_table = np.array([self._schedules[m].min_fee for m in markets], dtype=np.float64)
+        self._tax_table = np.array([self._schedules[m].securities_tax_rate for m in markets], dtype=np.float64)
+        self._day_trade_table = np.array([self._schedules[m].day_trade_tax_factor for m in markets], dtype=np.float64)
+
+    def _market_indices(self, markets: Union[str, Sequence[str]], size: int) -> np.ndarray:
+        """將市場代碼轉換為費率表索引"""
+        if isinstance(markets, str):
+            self.schedule(markets)
+            return np.full(size, self._market_index[markets], dtype=np.intp)
+
+        markets = np.asarray(markets, dtype=object)
+        if markets.shape[0] != size:
+            raise ValueError("市場陣列長度與金額陣列不一致")
+
+        # 先去重再查表，避免對每一筆做字典查詢
+        unique_markets, inverse = np.unique(markets.astype(str), return_inverse=True)
+        for market in unique_markets:
+            self.schedule(market)
+        lookup = np.array([self._market_index[m] for m in unique_markets], dtype=np.intp)
+        return lookup[inverse]
+
+    def compute(self, amounts: Sequence[float],
+                markets: Union[str, Sequence[str]] = "TW",
+                is_day_trading: Union[bool, Sequence[bool]] = False) -> FeeBreakdown:
+        """整批計算交易費用（單次 NumPy 運算）"""
+        amounts = np.asarray(amounts, dtype=np.float64)
+        indices = self._market_indices(markets, amounts.shape[0])
+
+        day_trading = np.broadcast_to(np.asarray(is_day_trading, dtype=bool), amounts.shape)
+
+        # 手續費計算（套用各市場最低手續費）
+        brokerage_fee = np.maximum(amounts * self._rate_table[indices], self._min_fee_table[indices])
+
+        # 證券交易稅（當沖依市場倍率調整）
+        tax_rate = self._tax_table[indices] * np.where(day_trading, self._day_trade_table[indices], 1.0)
+        securities_tax = amounts * tax_rate
+
+        return FeeBreakdown(
+            brokerage_fee=brokerage_fee,
+            securities_tax=securities_tax,
+            total_cost=brokerage_fee + securities_tax
+        )
+
+    def compute_one(self, amount: float, market: str = "TW", is_day_trading: bool = False) -> Dict[str, float]:
+        """計算單筆交易費用（熱路徑使用純 Python，避免陣列建立成本）"""
+        schedule = self.schedule(market)
+
+        brokerage_fee = max(amount * schedule.brokerage_rate, schedule.min_fee)
+        tax_rate = schedule.securities_tax_rate * (schedule.day_trade_tax_factor if is_day_trading else 1.0)
+        securities_tax = amount * tax_rate
+
+        return {
+            "brokerage_fee": brokerage_fee,
+            "securities_tax": securities_tax,
+            "total_cost": brokerage_fee + securities_tax
+        }
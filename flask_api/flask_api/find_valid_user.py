@@ -3,7 +3,8 @@
 查找有效的用戶ID
 """
 
-from supabase import create_client, Client
+from supabase import Client
+from supabase_pool import create_client
 import json
 
 # Supabase配置
@@ -195,6 +195,9 @@ def post_worker_init(worker):
    - 使用 Nginx 作為反向代理
    - 配置多個 Gunicorn 實例
    - 使用 Redis 作為會話存儲
+   - 讀取端點帶 ETag 與 Cache-Control (s-maxage)，Nginx 開啟 proxy_cache
+     並設定 proxy_cache_revalidate on，過期後以 If-None-Match 向後端重新驗證
+   - /api/realtime/stream 需關閉 proxy_buffering（回應已帶 X-Accel-Buffering: no）
 
 4. 容器化部署:
    - 每個容器運行 1 個 Gunicorn 實例
@@ -0,0 +1,153 @@
+"""
+HTTP 快取驗證層
+讀取端點依資料版本號產生 ETag，並設定 Cache-Control 供前端 Nginx 快取
+
+設計重點:
+1. 每類資料一個版本號（Redis INCR），寫入快取或資料變動時遞增
+2. ETag 由請求路徑、查詢參數與相關版本號組成，不需序列化或雜湊回應內容
+3. If-None-Match 相符時直接回傳 304，不執行端點本身
+4. 由數據庫外部修改、或快取過期後由端點本身重新查詢的資料（股價、台股清單）須設定重新驗證週期，
+   週期內的 ETag 才會相同，否則 304 會讓端點永遠不再執行
+5. 版本號在呼叫端點前讀取，回應內容一定不舊於 ETag 所代表的版本
+6. Redis 未連線時版本號保存在行程內
+
+Redis 鍵值:
+    http_cache_version:{scope}  資料版本號
+"""
+
+import hashlib
+import logging
+import threading
+import time
+from functools import wraps
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Union
+
+from flask import request, make_response
+
+logger = logging.getLogger(__name__)
+
+def quote_scope(symbol: str) -> str:
+    return f"quote:{symbol.upper()}"
+
+def leaderboard_scope(tournament_id: str) -> str:
+    return f"leaderboard:{tournament_id}"
+
+TAIWAN_STOCKS_SCOPE = 'taiwan_stocks'
+TOURNAMENTS_SCOPE = 'tournaments'
+
+class HttpCache:
+    """以資料版本號產生 ETag 的條件式 GET"""
+
+    def __init__(self, redis_client=None):
+        self.redis = redis_client
+        self._local_versions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+        # 統計指標
+        self.not_modified = 0
+        self.served = 0
+
+    @staticmethod
+    def _version_key(scope: str) -> str:
+        return f"http_cache_version:{scope}"
+
+    # ========================================
+    # 版本號
+    # ========================================
+
+    def bump(self, scopes: Iterable[str], pipe=None):
+        """資料變動時遞增版本號（可併入呼叫端的 Redis 管線）"""
+        scopes = list(scopes)
+        if not scopes:
+            return
+        if self.redis:
+            client = pipe or self.redis.pipeline(transaction=False)
+            for scope in scopes:
+                client.incr(self._version_key(scope))
+            if pipe is None:
+                client.execute()
+            return
+
+        with self._lock:
+            for scope in scopes:
+                self._local_versions[scope] = self._local_versions.get(scope, 0) + 1
+
+    def versions(self, scopes: Sequence[str]) -> List[int]:
+        """一次往返讀取多個版本號"""
+        if not scopes:
+            return []
+        if self.redis:
+            return [int(version or 0) for version in self.redis.mget([self._version_key(scope) for scope in scopes])]
+        with self._lock:
+            return [self._local_versions.get(scope, 0) for scope in scopes]
+
+    # ========================================
+    # 條件式 GET
+    # ========================================
+
+    def etag(self, scopes: Sequence[str], revalidate_every: Optional[int] = None) -> str:
+        """依請求與資料版本號組成 ETag"""
+        parts = [request.path, '&'.join(f"{key}={value}" for key, value in sorted(request.args.items(multi=True)))]
+        parts.extend(f"{scope}={version}" for scope, version in zip(scopes, self.versions(scopes)))
+        if revalidate_every:
+            parts.append(str(int(time.time() // revalidate_every)))
+        return hashlib.blake2b('|'.join(parts).encode('utf-8'), digest_size=10).hexdigest()
+
+    def conditional(self, scopes: Union[Sequence[str], Callable[..., Sequence[str]]] = (),
+                    max_age: int = 0, s_maxage: Optional[int] = None,
+                    revalidate_every: Optional[int] = None):
+        """讀取端點裝飾器：加上 ETag 與 Cache-Control，If-None-Match 相符時回傳 304
+
+        scopes: 回應內容相關的版本號範圍，可為以端點參數計算的函式
+        max_age: 客戶端快取秒數；s_maxage: 共用快取（Nginx）秒數
+        revalidate_every: 每隔多少秒強制產生新 ETag（資料不一定遞增版本號時使用，通常等於資料快取秒數）
+        """
+        cache_control = f"public, max-age={max_age}"
+        if s_maxage is not None:
+            cache_control += f", s-maxage={s_maxage}"
+
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                try:
+                    scope_list = list(scopes(**kwargs) if callable(scopes) else scopes)
+                    etag = self.etag(scope_list, revalidate_every)
+                except Exception as e:
+                    # 版本號無法讀取時不做快取驗證
+                    logger.error(f"HTTP 快取版本讀取失敗: {e}")
+                    return view(*args, **kwargs)
+
+                if request.if_none_match.contains_weak(etag):
+                    self.not_modified += 1
+                    response = make_response('', 304)
+                else:
+                    response = make_response(view(*args, **kwargs))
+                    if response.status_code != 200:
+                        return response
+                    self.served += 1
+
+                response.set_etag(etag, weak=True)
+                response.headers['Cache-Control'] = cache_control
+                response.vary.add('Accept-Encoding')
+                return response
+            return wrapper
+        return decorator
+
+    def metrics(self) -> Dict:
+        """獲取條件式 GET 統計"""
+        total = self.not_modified + self.served
+        return {
+            'not_modified': self.not_modified,
+            'served': self.served,
+            'not_modified_rate': self.not_modified / total if total else 0.0
+        }
+
+# 全局 HTTP 快取實例（單例模式）
+http_cache = None
+
+def get_http_cache(redis_client=None) -> HttpCache:
+    """獲取 HTTP 快取實例（單例模式）"""
+    global http_cache
+    if http_cache is None:
+        http_cache = HttpCache(redis_client)
+    return http_cache
@@ -0,0 +1,189 @@
+"""
+回應編碼與壓縮
+以 orjson 取代 Flask 預設 JSON 編碼，並依 Accept-Encoding 壓縮大型回應
+
+設計重點:
+1. OrjsonProvider：整個應用的 jsonify 改用 orjson（直接輸出 UTF-8 bytes，
+   支援 numpy 數值），日期與無法編碼的型別交由 Flask 預設處理
+2. 依 Accept-Encoding 協商 br / gzip（brotli 為選用套件），小於門檻的回應不壓縮
+3. 帶版本號 ETag 的回應（http_cache）以 (ETag, 編碼) 快取壓縮後內容，
+   同一版本只壓縮一次
+4. SSE 串流、已編碼與非文字回應不處理
+
+環境變數:
+    COMPRESS_MIN_SIZE        壓縮門檻 bytes（預設 1024）
+    COMPRESS_GZIP_LEVEL      gzip 等級（預設 6）
+    COMPRESS_BROTLI_QUALITY  brotli 品質（預設 5，動態內容不建議超過 6）
+    COMPRESS_CACHE_BYTES     壓縮內容快取上限（預設 32MB）
+"""
+
+import gzip
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from flask import request
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    try:
+        import brotlicffi as brotli
+    except ImportError:
+        brotli = None
+
+logger = logging.getLogger(__name__)
+
+COMPRESS_MIN_SIZE = int(os.environ.get('COMPRESS_MIN_SIZE', 1024))
+COMPRESS_GZIP_LEVEL = int(os.environ.get('COMPRESS_GZIP_LEVEL', 6))
+COMPRESS_BROTLI_QUALITY = int(os.environ.get('COMPRESS_BROTLI_QUALITY', 5))
+COMPRESS_CACHE_BYTES = int(os.environ.get('COMPRESS_CACHE_BYTES', 32 * 1024 * 1024))
+
+COMPRESSIBLE_MIMETYPES = {'application/json', 'text/html', 'text/plain', 'text/csv'}
+
+# ========================================
+# JSON 編碼
+# ========================================
+
+class OrjsonProvider(DefaultJSONProvider):
+    """以 orjson 編碼的 Flask JSON provider"""
+
+    def _option(self) -> int:
+        # date / datetime 交由 Flask 預設處理（HTTP 日期格式），與原回應一致
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_PASSTHROUGH_DATETIME
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return option
+
+    @staticmethod
+    def _default(value: Any) -> Any:
+        # float 子類別（orjson 不接受）與 Decimal、date 等交由 Flask 預設處理
+        if isinstance(value, float):
+            return float(value)
+        return DefaultJSONProvider.default(value)
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        return orjson.dumps(obj, default=self._default, option=self._option()).decode('utf-8')
+
+    def loads(self, s, **kwargs: Any) -> Any:
+        return orjson.loads(s)
+
+    def response(self, *args: Any, **kwargs: Any):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(
+            orjson.dumps(obj, default=self._default, option=self._option() | orjson.OPT_APPEND_NEWLINE),
+            mimetype=self.mimetype
+        )
+
+# ========================================
+# 壓縮
+# ========================================
+
+def compress(body: bytes, encoding: str, gzip_level: int = COMPRESS_GZIP_LEVEL,
+             brotli_quality: int = COMPRESS_BROTLI_QUALITY) -> bytes:
+    if encoding == 'br':
+        return brotli.compress(body, quality=brotli_quality)
+    return gzip.compress(body, compresslevel=gzip_level, mtime=0)
+
+class ResponseCompressor:
+    """依 Accept-Encoding 壓縮回應（after_request）"""
+
+    def __init__(self, app=None, min_size: int = COMPRESS_MIN_SIZE, cache_bytes: int = COMPRESS_CACHE_BYTES):
+        self.min_size = min_size
+        self.cache_bytes = cache_bytes
+        self.encodings = ['br', 'gzip'] if brotli else ['gzip']
+
+        self._cache: 'OrderedDict[Tuple[str, str], bytes]' = OrderedDict()
+        self._cache_size = 0
+        self._lock = threading.Lock()
+
+        # 統計指標
+        self.compressed = 0
+        self.cache_hits = 0
+        self.skipped_small = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.after_request(self.after_request)
+
+    def _negotiate(self) -> Optional[str]:
+        return request.accept_encodings.best_match(self.encodings)
+
+    def _cached(self, key: Tuple[str, str]) -> Optional[bytes]:
+        with self._lock:
+            body = self._cache.get(key)
+            if body is not None:
+                self._cache.move_to_end(key)
+            return body
+
+    def _store(self, key: Tuple[str, str], body: bytes):
+        if len(body) > self.cache_bytes // 8:
+            return
+        with self._lock:
+            if key in self._cache:
+                return
+            self._cache[key] = body
+            self._cache_size += len(body)
+            while self._cache_size > self.cache_bytes:
+                _, evicted = self._cache.popitem(last=False)
+                self._cache_size -= len(evicted)
+
+    def after_request(self, response):
+        if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+                or 'Content-Encoding' in response.headers or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+            return response
+
+        response.vary.add('Accept-Encoding')
+        encoding = self._negotiate()
+        if not encoding:
+            return response
+
+        body = response.get_data()
+        if len(body) < self.min_size:
+            self.skipped_small += 1
+            return response
+
+        # 版本號 ETag 代表同一份內容，壓縮結果可重複使用
+        etag, _ = response.get_etag()
+        key = (f"{request.path}|{etag}", encoding) if etag else None
+        compressed = self._cached(key) if key else None
+        if compressed is not None:
+            self.cache_hits += 1
+        else:
+            compressed = compress(body, encoding)
+            if key:
+                self._store(key, compressed)
+
+        self.compressed += 1
+        self.bytes_in += len(body)
+        self.bytes_out += len(compressed)
+
+        response.set_data(compressed)
+        response.headers['Content-Encoding'] = encoding
+        return response
+
+    def metrics(self) -> Dict:
+        """獲取壓縮統計"""
+        return {
+            'encodings': self.encodings,
+            'compressed_responses': self.compressed,
+            'cache_hits': self.cache_hits,
+            'cache_entries': len(self._cache),
+            'cache_bytes': self._cache_size,
+            'skipped_small': self.skipped_small,
+            'bytes_in': self.bytes_in,
+            'bytes_out': self.bytes_out,
+            'compression_ratio': self.bytes_out / self.bytes_in if self.bytes_in else 1.0
+        }
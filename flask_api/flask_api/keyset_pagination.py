@@ -0,0 +1,70 @@
+"""
+鍵集（游標）分頁
+交易歷史依 (executed_at, id) 由新到舊分頁，深頁查詢與第一頁同樣快
+
+設計重點:
+1. 游標為上一頁最後一筆的 (executed_at, id)，下一頁條件為
+   executed_at < t OR (executed_at = t AND id < id)，直接沿 (..., executed_at DESC, id DESC) 索引掃描，
+   不使用 OFFSET（OFFSET 需掃過並丟棄前面所有列）
+2. id 作為同時間成交的排序依據，分頁不重複也不遺漏
+3. 每頁多取一筆判斷是否還有下一頁，不需 COUNT
+4. 每頁筆數有上限，游標以 URL 安全的 base64 傳遞，內容格式不符時拒絕
+"""
+
+import base64
+import binascii
+import re
+from typing import Dict, List, Optional, Tuple
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+# 游標欄位只允許時間戳記與 uuid / 數字 id 會出現的字元（避免注入 PostgREST 篩選語法）
+_CURSOR_VALUE = re.compile(r'^[0-9A-Za-z:.+\- ]{1,64}$')
+
+class InvalidCursor(ValueError):
+    """游標格式錯誤"""
+
+def page_size(raw, default: int = DEFAULT_PAGE_SIZE, maximum: int = MAX_PAGE_SIZE) -> int:
+    """解析每頁筆數（限制在 1..maximum）"""
+    if raw in (None, ''):
+        return default
+    return min(max(int(raw), 1), maximum)
+
+def encode_cursor(row: Dict, time_field: str = 'executed_at', id_field: str = 'id') -> str:
+    """以一筆資料的 (時間, id) 產生游標"""
+    raw = f"{row[time_field]}|{row[id_field]}".encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    """解析游標為 (時間, id)"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode('utf-8')
+        executed_at, row_id = raw.split('|')
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise InvalidCursor('無效的分頁游標')
+    if not _CURSOR_VALUE.match(executed_at) or not _CURSOR_VALUE.match(row_id):
+        raise InvalidCursor('無效的分頁游標')
+    return executed_at, row_id
+
+def fetch_page(query, limit: int, cursor: Optional[str] = None,
+               time_field: str = 'executed_at', id_field: str = 'id') -> Tuple[List[Dict], Optional[str]]:
+    """執行鍵集分頁查詢，回傳 (本頁資料, 下一頁游標)
+
+    query: 已套用 select 與等值篩選的 PostgREST 查詢
+    """
+    if cursor:
+        executed_at, row_id = decode_cursor(cursor)
+        # postgrest-py 0.13 沒有 or_()，直接加入 or 參數（與新版 or_() 相同）
+        query.params = query.params.add(
+            'or',
+            f'({time_field}.lt."{executed_at}",and({time_field}.eq."{executed_at}",{id_field}.lt."{row_id}"))'
+        )
+
+    # 兩個排序欄位需在同一個 order 參數內（重複的 order 參數 PostgREST 只採用其一）
+    query.params = query.params.add('order', f"{time_field}.desc,{id_field}.desc")
+    rows = query.limit(limit + 1).execute().data
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(rows[-1], time_field, id_field)
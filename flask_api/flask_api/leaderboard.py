@@ -0,0 +1,601 @@
+"""
+錦標賽即時排行榜
+以 Redis 有序集合（sorted set）逐筆增量維護每場錦標賽的總資產排名
+
+設計重點:
+1. 每場錦標賽一個有序集合，成員為用戶、分數為總資產（現金 + 持股市值）
+2. 每筆交易只調整該用戶分數：分數變動 = 數量 x (市價 - 成交價)
+3. 股價更新時只調整持有該股票的用戶：分數變動 = 持股數 x 價差
+4. 前 N 名、用戶排名與鄰近排名皆為 O(log N) 讀取，不查詢數據庫
+5. Redis 未連線時使用行程內排序表（bisect）
+6. 從數據庫載入（seed）與逐筆交易互斥：同一時間只有一個載入者（SET NX 載入標記），
+   交易寫入數據庫前以 begin_trade 登記為進行中；載入者先等進行中的交易完成，
+   載入期間的新交易等待載入完成後才寫入數據庫。數據庫讀取因此不會遺漏成交，
+   載入也不會覆蓋載入期間套用的交易
+
+Redis 鍵值:
+    tournament_lb:{tid}                    有序集合 user_id -> 總資產
+    tournament_lb_holdings:{tid}:{symbol}  雜湊 user_id -> 持股數
+    tournament_lb_marks:{tid}              雜湊 symbol -> 目前計價用股價
+    tournament_lb_symbols:{symbol}         集合 持有該股票的錦標賽
+    tournament_lb_seeded:{tid}             已從數據庫載入的標記
+    tournament_lb_total:{tid}              所有參與者總資產合計（計算平均用）
+    tournament_lb_seeding:{tid}            載入中標記（載入者 token，逾時自動過期）
+    tournament_lb_inflight:{tid}           有序集合 進行中交易 token -> 租約到期時間（毫秒）
+"""
+
+import bisect
+import logging
+import threading
+import time
+import uuid
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INITIAL_BALANCE = 1000000.0
+
+# 套用一筆交易
+# KEYS: 排行榜, 持股, 計價股價, 股票對應錦標賽, 總資產合計
+# ARGV: user_id, 帶正負號的數量, 成交價, symbol, tournament_id, 交易前總資產
+TRADE_SCRIPT = """
+if redis.call('ZADD', KEYS[1], 'NX', ARGV[6], ARGV[1]) == 1 then
+    redis.call('INCRBYFLOAT', KEYS[5], ARGV[6])
+end
+local mark = redis.call('HGET', KEYS[3], ARGV[4])
+if not mark then
+    mark = ARGV[3]
+    redis.call('HSET', KEYS[3], ARGV[4], mark)
+end
+local qty = tonumber(ARGV[2])
+local delta = qty * (tonumber(mark) - tonumber(ARGV[3]))
+local holding = tonumber(redis.call('HINCRBYFLOAT', KEYS[2], ARGV[1], qty))
+if holding <= 0 then
+    redis.call('HDEL', KEYS[2], ARGV[1])
+end
+redis.call('SADD', KEYS[4], ARGV[5])
+redis.call('INCRBYFLOAT', KEYS[5], delta)
+return redis.call('ZINCRBY', KEYS[1], delta, ARGV[1])
+"""
+
+# 套用一檔股票的新股價
+# KEYS: 排行榜, 持股, 計價股價, 總資產合計
+# ARGV: symbol, 新股價
+PRICE_SCRIPT = """
+local old = redis.call('HGET', KEYS[3], ARGV[1])
+redis.call('HSET', KEYS[3], ARGV[1], ARGV[2])
+if not old then
+    return 0
+end
+local delta = tonumber(ARGV[2]) - tonumber(old)
+if delta == 0 then
+    return 0
+end
+local holdings = redis.call('HGETALL', KEYS[2])
+local total_qty = 0
+for i = 1, #holdings, 2 do
+    redis.call('ZINCRBY', KEYS[1], tonumber(holdings[i + 1]) * delta, holdings[i])
+    total_qty = total_qty + tonumber(holdings[i + 1])
+end
+redis.call('INCRBYFLOAT', KEYS[4], total_qty * delta)
+return #holdings / 2
+"""
+
+# 用戶排名、參與人數與鄰近排名（同一個原子操作內讀取，排名不會在兩次讀取之間變動）
+# KEYS: 排行榜  ARGV: user_id, 前後各幾名
+RANK_CONTEXT_SCRIPT = """
+local position = redis.call('ZREVRANK', KEYS[1], ARGV[1])
+if not position then
+    return nil
+end
+local neighbours = tonumber(ARGV[2])
+local start = math.max(position - neighbours, 0)
+return {position, redis.call('ZCARD', KEYS[1]), redis.call('ZREVRANGE', KEYS[1], start, position + neighbours, 'WITHSCORES')}
+"""
+
+# 交易登記為進行中（載入中回傳 0，呼叫端稍後重試）
+# KEYS: 載入中標記, 進行中交易  ARGV: token, 租約到期時間（毫秒）
+BEGIN_TRADE_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    return 0
+end
+redis.call('ZADD', KEYS[2], ARGV[2], ARGV[1])
+return 1
+"""
+
+# 只有載入者可以清除載入中標記
+# KEYS: 載入中標記  ARGV: token
+END_SEED_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+class _LocalBoard:
+    """行程內排行榜（Redis 備用方案），以 bisect 維護排序"""
+
+    def __init__(self):
+        self.scores: Dict[str, float] = {}
+        self.ordered: List[Tuple[float, str]] = []  # (-score, user_id)，由高至低
+        self.holdings: Dict[str, Dict[str, float]] = {}
+        self.marks: Dict[str, float] = {}
+        self.total = 0.0
+
+    def set_score(self, user_id: str, score: float):
+        old = self.scores.get(user_id)
+        if old is not None:
+            index = bisect.bisect_left(self.ordered, (-old, user_id))
+            del self.ordered[index]
+            self.total -= old
+        self.scores[user_id] = score
+        self.total += score
+        bisect.insort(self.ordered, (-score, user_id))
+
+    def incr(self, user_id: str, delta: float):
+        self.set_score(user_id, self.scores.get(user_id, 0.0) + delta)
+
+    def rank(self, user_id: str) -> Optional[int]:
+        score = self.scores.get(user_id)
+        if score is None:
+            return None
+        return bisect.bisect_left(self.ordered, (-score, user_id))
+
+class RealtimeLeaderboard:
+    """錦標賽即時排行榜"""
+
+    def __init__(self, redis_client=None, initial_balance: float = DEFAULT_INITIAL_BALANCE,
+                 trade_lease: float = 30.0, seed_timeout: float = 30.0):
+        self.redis = redis_client
+        self.initial_balance = initial_balance
+        self.trade_lease = trade_lease      # 進行中交易登記的租約（秒，與交易鎖租約相同）
+        self.seed_timeout = seed_timeout    # 載入中標記的有效期與最長等待（秒）
+
+        if self.redis:
+            self._trade_script = self.redis.register_script(TRADE_SCRIPT)
+            self._price_script = self.redis.register_script(PRICE_SCRIPT)
+            self._rank_context_script = self.redis.register_script(RANK_CONTEXT_SCRIPT)
+            self._begin_trade_script = self.redis.register_script(BEGIN_TRADE_SCRIPT)
+            self._end_seed_script = self.redis.register_script(END_SEED_SCRIPT)
+
+        self._local: Dict[str, _LocalBoard] = {}
+        self._local_seeded = set()
+        self._symbol_tournaments: Dict[str, set] = {}
+        self._lock = threading.Lock()
+
+        # 行程內載入與交易互斥 (Redis 備用方案)
+        self._gate = threading.Condition()
+        self._local_seeding = set()
+        self._local_inflight: Dict[str, Dict[str, float]] = {}  # tid -> token -> 租約到期時間
+
+    @staticmethod
+    def board_key(tournament_id: str) -> str:
+        return f"tournament_lb:{tournament_id}"
+
+    @staticmethod
+    def _holdings_key(tournament_id: str, symbol: str) -> str:
+        return f"tournament_lb_holdings:{tournament_id}:{symbol}"
+
+    @staticmethod
+    def _marks_key(tournament_id: str) -> str:
+        return f"tournament_lb_marks:{tournament_id}"
+
+    @staticmethod
+    def _symbol_key(symbol: str) -> str:
+        return f"tournament_lb_symbols:{symbol}"
+
+    @staticmethod
+    def _seeded_key(tournament_id: str) -> str:
+        return f"tournament_lb_seeded:{tournament_id}"
+
+    @staticmethod
+    def _total_key(tournament_id: str) -> str:
+        return f"tournament_lb_total:{tournament_id}"
+
+    @staticmethod
+    def _seeding_key(tournament_id: str) -> str:
+        return f"tournament_lb_seeding:{tournament_id}"
+
+    @staticmethod
+    def _inflight_key(tournament_id: str) -> str:
+        return f"tournament_lb_inflight:{tournament_id}"
+
+    def _board(self, tournament_id: str) -> _LocalBoard:
+        board = self._local.get(tournament_id)
+        if board is None:
+            board = self._local.setdefault(tournament_id, _LocalBoard())
+        return board
+
+    # ========================================
+    # 初始載入
+    # ========================================
+
+    def is_seeded(self, tournament_id: str) -> bool:
+        if self.redis:
+            return bool(self.redis.exists(self._seeded_key(tournament_id)))
+        return tournament_id in self._local_seeded
+
+    def seed(self, tournament_id: str, portfolios: Iterable[Dict], positions: Iterable[Dict],
+             prices: Optional[Dict[str, float]] = None):
+        """以數據庫投資組合與持倉重建排行榜
+
+        股票計價優先使用 prices，未提供時以所有持有者的加權平均成本暫代，
+        下一次股價更新即校正為市價。
+        """
+        prices = dict(prices or {})
+        holdings: Dict[str, Dict[str, float]] = {}
+        cost: Dict[str, Tuple[float, float]] = {}
+        for position in positions:
+            qty = float(position['qty'])
+            if qty <= 0:
+                continue
+            symbol = position['symbol']
+            holdings.setdefault(symbol, {})[position['user_id']] = qty
+            total_qty, total_cost = cost.get(symbol, (0.0, 0.0))
+            cost[symbol] = (total_qty + qty, total_cost + qty * float(position['avg_cost']))
+
+        marks = {
+            symbol: prices.get(symbol, total_cost / total_qty if total_qty else 0.0)
+            for symbol, (total_qty, total_cost) in cost.items()
+        }
+
+        scores = {}
+        for portfolio in portfolios:
+            scores[portfolio['user_id']] = float(portfolio['cash_balance'])
+        for symbol, holders in holdings.items():
+            for user_id, qty in holders.items():
+                scores[user_id] = scores.get(user_id, 0.0) + qty * marks[symbol]
+
+        if self.redis:
+            pipe = self.redis.pipeline(transaction=True)
+            pipe.delete(self.board_key(tournament_id), self._marks_key(tournament_id))
+            for symbol in self.redis.hkeys(self._marks_key(tournament_id)):
+                pipe.delete(self._holdings_key(tournament_id, symbol.decode('utf-8') if isinstance(symbol, bytes) else symbol))
+            if scores:
+                pipe.zadd(self.board_key(tournament_id), scores)
+            if marks:
+                pipe.hset(self._marks_key(tournament_id), mapping=marks)
+            for symbol, holders in holdings.items():
+                pipe.hset(self._holdings_key(tournament_id, symbol), mapping=holders)
+                pipe.sadd(self._symbol_key(symbol), tournament_id)
+            pipe.set(self._total_key(tournament_id), sum(scores.values()))
+            pipe.set(self._seeded_key(tournament_id), 1)
+            pipe.execute()
+        else:
+            with self._lock:
+                board = _LocalBoard()
+                for user_id, score in scores.items():
+                    board.set_score(user_id, score)
+                board.holdings = holdings
+                board.marks = marks
+                self._local[tournament_id] = board
+                self._local_seeded.add(tournament_id)
+                for symbol in holdings:
+                    self._symbol_tournaments.setdefault(symbol, set()).add(tournament_id)
+
+        logger.info(f"🏁 排行榜已載入: {tournament_id}, {len(scores)} 位參與者")
+
+    def ensure_seeded(self, tournament_id: str, loader: Callable[[], Tuple[Iterable[Dict], Iterable[Dict]]]) -> bool:
+        """排行榜尚未建立時以 loader（回傳投資組合與持倉）載入，回傳是否由本次呼叫載入
+
+        其他載入者進行中時等待其完成；取得載入中標記後先等進行中的交易完成才讀取數據庫。
+        """
+        if self.is_seeded(tournament_id):
+            return False
+
+        token = uuid.uuid4().hex
+        if not self._claim_seeding(tournament_id, token):
+            self._wait_seeded(tournament_id)
+            return False
+
+        started_at = time.time()
+        try:
+            # 取得標記前其他載入者可能剛完成
+            if self.is_seeded(tournament_id):
+                return False
+            self._wait_inflight(tournament_id)
+            portfolios, positions = loader()
+            self.seed(tournament_id, portfolios, positions)
+            if time.time() - started_at > self.seed_timeout:
+                logger.warning(f"⚠️ 排行榜載入超過 {self.seed_timeout:.0f} 秒，載入中標記已過期: {tournament_id}")
+            return True
+        finally:
+            self._release_seeding(tournament_id, token)
+
+    def _claim_seeding(self, tournament_id: str, token: str) -> bool:
+        if self.redis:
+            return bool(self.redis.set(self._seeding_key(tournament_id), token, nx=True,
+                                       px=int(self.seed_timeout * 1000)))
+        with self._gate:
+            if tournament_id in self._local_seeding:
+                return False
+            self._local_seeding.add(tournament_id)
+            return True
+
+    def _release_seeding(self, tournament_id: str, token: str):
+        if self.redis:
+            try:
+                self._end_seed_script(keys=[self._seeding_key(tournament_id)], args=[token])
+            except Exception as e:
+                logger.error(f"排行榜載入中標記清除失敗 {tournament_id}: {e}")
+            return
+        with self._gate:
+            self._local_seeding.discard(tournament_id)
+            self._gate.notify_all()
+
+    @staticmethod
+    def _poll(done: Callable[[], bool], timeout: float) -> bool:
+        """退避輪詢（5ms 起，最多 50ms）直到 done() 成立，逾時回傳 False"""
+        deadline = time.time() + timeout
+        delay = 0.005
+        while not done():
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                return False
+            time.sleep(min(delay, remaining))
+            delay = min(delay * 2, 0.05)
+        return True
+
+    def _wait_seeded(self, tournament_id: str):
+        """等待其他載入者完成"""
+        if self.redis:
+            self._poll(lambda: not self.redis.exists(self._seeding_key(tournament_id)), self.seed_timeout)
+            return
+        with self._gate:
+            self._gate.wait_for(lambda: tournament_id not in self._local_seeding, self.seed_timeout)
+
+    def _wait_inflight(self, tournament_id: str):
+        """等待載入前已開始的交易完成（過期的登記視為已結束）"""
+        if self.redis:
+            key = self._inflight_key(tournament_id)
+
+            def drained() -> bool:
+                pipe = self.redis.pipeline(transaction=False)
+                pipe.zremrangebyscore(key, '-inf', int(time.time() * 1000))
+                pipe.zcard(key)
+                return pipe.execute()[1] == 0
+
+            drained_in_time = self._poll(drained, self.trade_lease)
+        else:
+            def drained() -> bool:
+                inflight = self._local_inflight.get(tournament_id, {})
+                now = time.time()
+                for token in [token for token, expires_at in inflight.items() if expires_at <= now]:
+                    del inflight[token]
+                return not inflight
+
+            with self._gate:
+                # 登記到期時也要重新檢查，每次最多等待 50ms
+                deadline = time.time() + self.trade_lease
+                while not drained() and time.time() < deadline:
+                    self._gate.wait(0.05)
+                drained_in_time = drained()
+
+        if not drained_in_time:
+            logger.warning(f"⚠️ 等待進行中交易逾時，仍繼續載入排行榜: {tournament_id}")
+
+    # ========================================
+    # 交易登記（與載入互斥）
+    # ========================================
+
+    def begin_trade(self, tournament_id: str, token: str):
+        """交易寫入數據庫前呼叫：排行榜載入中時等待，之後登記為進行中交易"""
+        try:
+            if self.redis:
+                keys = [self._seeding_key(tournament_id), self._inflight_key(tournament_id)]
+                registered = self._poll(
+                    lambda: bool(self._begin_trade_script(keys=keys, args=[token, int((time.time() + self.trade_lease) * 1000)])),
+                    self.seed_timeout
+                )
+            else:
+                with self._gate:
+                    registered = self._gate.wait_for(lambda: tournament_id not in self._local_seeding, self.seed_timeout)
+                    self._local_inflight.setdefault(tournament_id, {})[token] = time.time() + self.trade_lease
+        except Exception as e:
+            # 登記失敗不阻擋交易
+            logger.error(f"排行榜交易登記失敗 {tournament_id}: {e}")
+            return
+
+        if not registered:
+            logger.warning(f"⚠️ 等待排行榜載入逾時，交易繼續執行: {tournament_id}")
+
+    def end_trade(self, tournament_id: str, token: str, client=None):
+        """交易完成或失敗後解除登記（可併入呼叫端的 Redis 管線）"""
+        try:
+            if self.redis:
+                (client or self.redis).zrem(self._inflight_key(tournament_id), token)
+                return
+            with self._gate:
+                inflight = self._local_inflight.get(tournament_id)
+                if inflight is not None:
+                    inflight.pop(token, None)
+                    if not inflight:
+                        del self._local_inflight[tournament_id]
+                self._gate.notify_all()
+        except Exception as e:
+            logger.error(f"排行榜交易解除登記失敗 {tournament_id}: {e}")
+
+    # ========================================
+    # 增量更新
+    # ========================================
+
+    def record_trade(self, tournament_id: str, user_id: str, symbol: str, side: str, qty: float, price: float,
+                     prior_total_assets: Optional[float] = None, client=None):
+        """套用一筆交易（買入扣現金加持股，賣出反之），client 可傳入呼叫端的 Redis 管線"""
+        signed_qty = qty if side == 'buy' else -qty
+        prior = self.initial_balance if prior_total_assets is None else prior_total_assets
+
+        if self.redis:
+            self._trade_script(
+                keys=[self.board_key(tournament_id), self._holdings_key(tournament_id, symbol),
+                      self._marks_key(tournament_id), self._symbol_key(symbol), self._total_key(tournament_id)],
+                args=[user_id, signed_qty, price, symbol, tournament_id, prior],
+                client=client
+            )
+            return
+
+        with self._lock:
+            board = self._board(tournament_id)
+            if user_id not in board.scores:
+                board.set_score(user_id, prior)
+            mark = board.marks.setdefault(symbol, price)
+            holders = board.holdings.setdefault(symbol, {})
+            holding = holders.get(user_id, 0.0) + signed_qty
+            if holding > 0:
+                holders[user_id] = holding
+            else:
+                holders.pop(user_id, None)
+            board.incr(user_id, signed_qty * (mark - price))
+            self._symbol_tournaments.setdefault(symbol, set()).add(tournament_id)
+
+    def apply_prices(self, prices: Dict[str, float]) -> List[str]:
+        """股價更新時重新計價所有持有該股票的錦標賽，回傳受影響的錦標賽"""
+        if not prices:
+            return []
+
+        if self.redis:
+            symbols = list(prices)
+            pipe = self.redis.pipeline(transaction=False)
+            for symbol in symbols:
+                pipe.smembers(self._symbol_key(symbol))
+            tournaments_by_symbol = pipe.execute()
+
+            repriced = set()
+            pipe = self.redis.pipeline(transaction=False)
+            for symbol, tournament_ids in zip(symbols, tournaments_by_symbol):
+                for tournament_id in tournament_ids:
+                    tournament_id = tournament_id.decode('utf-8') if isinstance(tournament_id, bytes) else tournament_id
+                    repriced.add(tournament_id)
+                    self._price_script(
+                        keys=[self.board_key(tournament_id), self._holdings_key(tournament_id, symbol),
+                              self._marks_key(tournament_id), self._total_key(tournament_id)],
+                        args=[symbol, prices[symbol]],
+                        client=pipe
+                    )
+            pipe.execute()
+            return sorted(repriced)
+
+        repriced = set()
+        with self._lock:
+            for symbol, price in prices.items():
+                for tournament_id in self._symbol_tournaments.get(symbol, ()):
+                    board = self._board(tournament_id)
+                    old = board.marks.get(symbol)
+                    board.marks[symbol] = price
+                    if old is None or old == price:
+                        continue
+                    repriced.add(tournament_id)
+                    for user_id, qty in board.holdings.get(symbol, {}).items():
+                        board.incr(user_id, qty * (price - old))
+        return sorted(repriced)
+
+    # ========================================
+    # 查詢（O(log N)）
+    # ========================================
+
+    def size(self, tournament_id: str) -> int:
+        if self.redis:
+            return self.redis.zcard(self.board_key(tournament_id))
+        with self._lock:
+            return len(self._board(tournament_id).scores)
+
+    def summary(self, tournament_id: str) -> Dict:
+        """參與人數、平均總資產與第一名（一次往返）"""
+        if self.redis:
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.zcard(self.board_key(tournament_id))
+            pipe.get(self._total_key(tournament_id))
+            pipe.zrevrange(self.board_key(tournament_id), 0, 0)
+            total, assets, leaders = pipe.execute()
+            assets = float(assets or 0)
+            leader = leaders[0].decode('utf-8') if leaders and isinstance(leaders[0], bytes) else (leaders[0] if leaders else None)
+        else:
+            with self._lock:
+                board = self._board(tournament_id)
+                total, assets = len(board.scores), board.total
+                leader = board.ordered[0][1] if board.ordered else None
+
+        return {
+            'total_participants': total,
+            'avg_portfolio_value': round(assets / total, 2) if total else 0.0,
+            'top_performer': leader
+        }
+
+    def top(self, tournament_id: str, limit: int = 100, offset: int = 0) -> List[Dict]:
+        """前 N 名（依總資產由高至低）"""
+        if self.redis:
+            rows = self.redis.zrevrange(self.board_key(tournament_id), offset, offset + limit - 1, withscores=True)
+            rows = [(user_id.decode('utf-8') if isinstance(user_id, bytes) else user_id, score) for user_id, score in rows]
+        else:
+            with self._lock:
+                rows = [(user_id, -neg_score) for neg_score, user_id in self._board(tournament_id).ordered[offset:offset + limit]]
+
+        return [self._entry(offset + index + 1, user_id, score) for index, (user_id, score) in enumerate(rows)]
+
+    def rank(self, tournament_id: str, user_id: str) -> Optional[Dict]:
+        """用戶排名（未參與回傳 None）"""
+        if self.redis:
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.zrevrank(self.board_key(tournament_id), user_id)
+            pipe.zscore(self.board_key(tournament_id), user_id)
+            position, score = pipe.execute()
+        else:
+            with self._lock:
+                board = self._board(tournament_id)
+                position, score = board.rank(user_id), board.scores.get(user_id)
+
+        if position is None:
+            return None
+        return self._entry(position + 1, user_id, score)
+
+    def rank_context(self, tournament_id: str, user_id: str, neighbours: int = 5) -> Optional[Dict]:
+        """用戶排名、百分位數與前後各 k 名（一次原子讀取，O(log N + k)）"""
+        if self.redis:
+            result = self._rank_context_script(keys=[self.board_key(tournament_id)], args=[user_id, neighbours])
+            if result is None:
+                return None
+            position, total, flat = int(result[0]), int(result[1]), result[2]
+            start = max(position - neighbours, 0)
+            rows = [
+                (flat[index].decode('utf-8') if isinstance(flat[index], bytes) else flat[index], float(flat[index + 1]))
+                for index in range(0, len(flat), 2)
+            ]
+        else:
+            with self._lock:
+                board = self._board(tournament_id)
+                position = board.rank(user_id)
+                if position is None:
+                    return None
+                total = len(board.ordered)
+                start = max(position - neighbours, 0)
+                rows = [(member, -neg_score) for neg_score, member in board.ordered[start:position + neighbours + 1]]
+
+        entries = [self._entry(start + index + 1, member, score) for index, (member, score) in enumerate(rows)]
+        offset = position - start
+        rank = position + 1
+        return {
+            'rank': rank,
+            'total_participants': total,
+            'percentile': round((total - rank + 1) / total * 100, 2),
+            'user_stats': entries[offset],
+            'above': entries[:offset],
+            'below': entries[offset + 1:]
+        }
+
+    def _entry(self, rank: int, user_id: str, score: float) -> Dict:
+        return {
+            'rank': rank,
+            'user_id': user_id,
+            'total_assets': round(float(score), 2),
+            'return_rate': round((float(score) / self.initial_balance - 1) * 100, 4)
+        }
+
+# 全局排行榜實例（單例模式）
+realtime_leaderboard = None
+
+def get_realtime_leaderboard(redis_client=None) -> RealtimeLeaderboard:
+    """獲取即時排行榜實例（單例模式）"""
+    global realtime_leaderboard
+    if realtime_leaderboard is None:
+        realtime_leaderboard = RealtimeLeaderboard(redis_client)
+    return realtime_leaderboard
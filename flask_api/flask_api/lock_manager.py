@@ -0,0 +1,341 @@
+"""
+公平交易鎖管理器
+取代「SET NX 失敗即拒絕」的交易鎖，讓同一帳戶的併發交易排隊而非直接失敗
+
+設計重點:
+1. 擁有者令牌 - 每次取得鎖都有唯一令牌，只有擁有者能釋放或延長
+2. 安全釋放 - Redis 以 Lua 腳本比對令牌後刪除（compare-and-delete）
+3. 公平排隊 - 等待者依取號順序（FIFO）取得鎖，等待時間有上限
+4. 租約延長 - 長時間操作可延長鎖的存活時間
+5. 競爭指標 - 每個鎖的取得次數、等待次數、逾時次數與等待時間
+
+Redis 未連線時使用行程內鎖（執行緒安全，gevent monkey patch 後為協程安全）。
+"""
+
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# 取號排隊並嘗試取得鎖
+# KEYS: 鎖, 排隊佇列(zset), 等待者存活期限(hash), 取號計數器
+# ARGV: 令牌, 租約毫秒, 等待者存活毫秒
+ACQUIRE_SCRIPT = """
+local now = redis.call('TIME')
+local now_ms = tonumber(now[1]) * 1000 + math.floor(tonumber(now[2]) / 1000)
+
+-- 清除佇列前端已失聯的等待者
+while true do
+    local head = redis.call('ZRANGE', KEYS[2], 0, 0)
+    if #head == 0 then break end
+    local deadline = tonumber(redis.call('HGET', KEYS[3], head[1]) or '0')
+    if deadline >= now_ms then break end
+    redis.call('ZREM', KEYS[2], head[1])
+    redis.call('HDEL', KEYS[3], head[1])
+end
+
+-- 首次嘗試時取號排隊
+if not redis.call('ZSCORE', KEYS[2], ARGV[1]) then
+    local ticket = redis.call('INCR', KEYS[4])
+    redis.call('ZADD', KEYS[2], ticket, ARGV[1])
+end
+redis.call('HSET', KEYS[3], ARGV[1], now_ms + tonumber(ARGV[3]))
+
+local queue_ttl = tonumber(ARGV[2]) + tonumber(ARGV[3])
+redis.call('PEXPIRE', KEYS[2], queue_ttl)
+redis.call('PEXPIRE', KEYS[3], queue_ttl)
+redis.call('PEXPIRE', KEYS[4], queue_ttl)
+
+-- 只有排在最前面的等待者可以取得鎖
+local head = redis.call('ZRANGE', KEYS[2], 0, 0)
+if head[1] == ARGV[1] and redis.call('SET', KEYS[1], ARGV[1], 'PX', ARGV[2], 'NX') then
+    redis.call('ZREM', KEYS[2], ARGV[1])
+    redis.call('HDEL', KEYS[3], ARGV[1])
+    return 1
+end
+return 0
+"""
+
+# 放棄排隊
+CANCEL_SCRIPT = """
+redis.call('ZREM', KEYS[1], ARGV[1])
+redis.call('HDEL', KEYS[2], ARGV[1])
+return 1
+"""
+
+# 比對令牌後刪除
+RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+# 比對令牌後延長租約
+EXTEND_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+class LockTimeout(Exception):
+    """等待鎖逾時"""
+    pass
+
+class LockHandle:
+    """已取得的鎖"""
+
+    def __init__(self, manager: 'LockManager', key: str, token: str, lease_ttl: float):
+        self.manager = manager
+        self.key = key
+        self.token = token
+        self.lease_ttl = lease_ttl
+        self.acquired_at = time.time()
+
+    def extend(self, lease_ttl: Optional[float] = None) -> bool:
+        """延長租約"""
+        return self.manager.extend(self, lease_ttl)
+
+    def release(self) -> bool:
+        """釋放鎖"""
+        return self.manager.release(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+
+class _LocalLockState:
+    """行程內鎖狀態"""
+
+    def __init__(self, mutex: threading.Lock):
+        self.owner: Optional[str] = None
+        self.expires_at = 0.0
+        self.waiters = deque()
+        self.condition = threading.Condition(mutex)
+
+class LockManager:
+    """公平交易鎖管理器"""
+
+    MAX_TRACKED_LOCKS = 1000  # 個別鎖指標最多保留數量
+
+    def __init__(self, redis_client=None, lease_ttl: float = 30.0, wait_timeout: float = 5.0,
+                 waiter_ttl: float = 2.0):
+        self.redis = redis_client
+        self.lease_ttl = lease_ttl          # 鎖租約（秒）
+        self.wait_timeout = wait_timeout    # 預設最長等待（秒）
+        self.waiter_ttl = waiter_ttl        # 等待者失聯判定（秒）
+
+        if self.redis:
+            self._acquire_script = self.redis.register_script(ACQUIRE_SCRIPT)
+            self._cancel_script = self.redis.register_script(CANCEL_SCRIPT)
+            self._release_script = self.redis.register_script(RELEASE_SCRIPT)
+            self._extend_script = self.redis.register_script(EXTEND_SCRIPT)
+
+        # 行程內鎖 (Redis 備用方案)
+        self._local_mutex = threading.Lock()
+        self._local_locks: Dict[str, _LocalLockState] = {}
+
+        # 競爭指標
+        self._metrics_lock = threading.Lock()
+        self._totals = self._empty_stats()
+        self._per_lock: 'OrderedDict[str, Dict]' = OrderedDict()
+
+    # ========================================
+    # 取得 / 釋放 / 延長
+    # ========================================
+
+    def acquire(self, key: str, wait_timeout: Optional[float] = None,
+                lease_ttl: Optional[float] = None) -> Optional[LockHandle]:
+        """依 FIFO 順序等待取得鎖，逾時回傳 None"""
+        wait_timeout = self.wait_timeout if wait_timeout is None else wait_timeout
+        lease_ttl = lease_ttl or self.lease_ttl
+        token = uuid.uuid4().hex
+        start_time = time.time()
+
+        if self.redis:
+            acquired, contended = self._acquire_redis(key, token, wait_timeout, lease_ttl)
+        else:
+            acquired, contended = self._acquire_local(key, token, wait_timeout, lease_ttl)
+
+        wait_ms = (time.time() - start_time) * 1000
+        self._record(key, acquired, contended, wait_ms)
+
+        if not acquired:
+            logger.warning(f"⏳ 等待鎖逾時: {key} ({wait_ms:.0f}ms)")
+            return None
+        return LockHandle(self, key, token, lease_ttl)
+
+    def lock(self, key: str, wait_timeout: Optional[float] = None,
+             lease_ttl: Optional[float] = None) -> LockHandle:
+        """取得鎖（逾時拋出 LockTimeout），可搭配 with 使用"""
+        handle = self.acquire(key, wait_timeout, lease_ttl)
+        if handle is None:
+            raise LockTimeout(f"等待鎖逾時: {key}")
+        return handle
+
+    def release(self, handle: LockHandle) -> bool:
+        """釋放鎖（只有擁有者可以釋放）"""
+        if self.redis:
+            try:
+                released = bool(self._release_script(keys=[handle.key], args=[handle.token]))
+            except Exception as e:
+                logger.error(f"釋放鎖失敗 {handle.key}: {e}")
+                return False
+        else:
+            with self._local_mutex:
+                state = self._local_locks.get(handle.key)
+                released = state is not None and state.owner == handle.token
+                if released:
+                    state.owner = None
+                    state.expires_at = 0.0
+                    state.condition.notify_all()
+                    if not state.waiters:
+                        self._local_locks.pop(handle.key, None)
+
+        if not released:
+            logger.warning(f"⚠️ 鎖已過期或被其他擁有者持有，略過釋放: {handle.key}")
+        return released
+
+    def extend(self, handle: LockHandle, lease_ttl: Optional[float] = None) -> bool:
+        """延長租約（只有擁有者可以延長）"""
+        lease_ttl = lease_ttl or handle.lease_ttl
+        if self.redis:
+            extended = bool(self._extend_script(keys=[handle.key], args=[handle.token, int(lease_ttl * 1000)]))
+        else:
+            with self._local_mutex:
+                state = self._local_locks.get(handle.key)
+                extended = state is not None and state.owner == handle.token and state.expires_at > time.time()
+                if extended:
+                    state.expires_at = time.time() + lease_ttl
+
+        if extended:
+            handle.lease_ttl = lease_ttl
+        return extended
+
+    def _acquire_redis(self, key: str, token: str, wait_timeout: float, lease_ttl: float):
+        """Redis 分散式公平鎖"""
+        queue_keys = [key, f"{key}:queue", f"{key}:waiters", f"{key}:ticket"]
+        args = [token, int(lease_ttl * 1000), int(self.waiter_ttl * 1000)]
+        deadline = time.time() + wait_timeout
+        delay = 0.005
+        contended = False
+
+        while True:
+            if self._acquire_script(keys=queue_keys, args=args):
+                return True, contended
+
+            contended = True
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                try:
+                    self._cancel_script(keys=queue_keys[1:3], args=[token])
+                except Exception as e:
+                    logger.error(f"取消排隊失敗 {key}: {e}")
+                return False, contended
+
+            # 退避輪詢（5ms 起，最多 50ms）
+            time.sleep(min(delay, remaining))
+            delay = min(delay * 2, 0.05)
+
+    def _acquire_local(self, key: str, token: str, wait_timeout: float, lease_ttl: float):
+        """行程內公平鎖"""
+        deadline = time.time() + wait_timeout
+        contended = False
+
+        with self._local_mutex:
+            state = self._local_locks.get(key)
+            if state is None:
+                state = _LocalLockState(self._local_mutex)
+                self._local_locks[key] = state
+            state.waiters.append(token)
+
+            while True:
+                now = time.time()
+                lock_free = state.owner is None or state.expires_at <= now
+                if lock_free and state.waiters[0] == token:
+                    state.waiters.popleft()
+                    state.owner = token
+                    state.expires_at = now + lease_ttl
+                    # 讓下一位等待者重新檢查
+                    state.condition.notify_all()
+                    return True, contended
+
+                contended = True
+                remaining = deadline - now
+                if remaining <= 0:
+                    state.waiters.remove(token)
+                    state.condition.notify_all()
+                    if state.owner is None and not state.waiters:
+                        self._local_locks.pop(key, None)
+                    return False, contended
+
+                # 等待釋放通知，或租約到期時重新檢查
+                timeout = remaining
+                if state.owner is not None:
+                    timeout = min(timeout, max(state.expires_at - now, 0.001))
+                state.condition.wait(timeout)
+
+    # ========================================
+    # 競爭指標
+    # ========================================
+
+    @staticmethod
+    def _empty_stats() -> Dict:
+        return {
+            'acquisitions': 0,
+            'contended': 0,
+            'timeouts': 0,
+            'total_wait_ms': 0.0,
+            'max_wait_ms': 0.0
+        }
+
+    def _record(self, key: str, acquired: bool, contended: bool, wait_ms: float):
+        with self._metrics_lock:
+            stats = self._per_lock.get(key)
+            if stats is None:
+                stats = self._empty_stats()
+                self._per_lock[key] = stats
+                if len(self._per_lock) > self.MAX_TRACKED_LOCKS:
+                    self._per_lock.popitem(last=False)
+            else:
+                self._per_lock.move_to_end(key)
+
+            for target in (self._totals, stats):
+                if acquired:
+                    target['acquisitions'] += 1
+                else:
+                    target['timeouts'] += 1
+                if contended:
+                    target['contended'] += 1
+                target['total_wait_ms'] += wait_ms
+                target['max_wait_ms'] = max(target['max_wait_ms'], wait_ms)
+
+    def metrics(self, top: int = 10) -> Dict:
+        """獲取鎖競爭指標（含競爭最激烈的前幾個鎖）"""
+        with self._metrics_lock:
+            hottest = sorted(self._per_lock.items(),
+                             key=lambda item: (item[1]['contended'], item[1]['total_wait_ms']),
+                             reverse=True)[:top]
+            totals = dict(self._totals)
+
+        attempts = totals['acquisitions'] + totals['timeouts']
+        with self._local_mutex:
+            local_held = sum(1 for state in self._local_locks.values() if state.owner is not None)
+            local_waiting = sum(len(state.waiters) for state in self._local_locks.values())
+
+        return {
+            'backend': 'redis' if self.redis else 'local',
+            **totals,
+            'avg_wait_ms': totals['total_wait_ms'] / attempts if attempts else 0.0,
+            'contention_rate': totals['contended'] / attempts if attempts else 0.0,
+            'local_held_locks': local_held,
+            'local_waiters': local_waiting,
+            'hottest_locks': {key: dict(stats) for key, stats in hottest if stats['contended'] > 0}
+        }
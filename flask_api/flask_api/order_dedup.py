@@ -0,0 +1,183 @@
+"""
+交易冪等性處理
+以客戶端訂單編號（client_order_id）去除重複的交易請求
+
+設計重點:
+1. 行動網路重試時直接回傳已儲存的結果，不再重新執行交易
+2. 優先使用 Redis（跨 worker 共用），未連線時使用行程內快取
+3. 執行中的訂單以 pending 標記佔位，併發重試不會重複成交
+4. 同一訂單編號搭配不同請求內容時拒絕處理
+"""
+
+from flask import request, jsonify, make_response
+from functools import wraps
+import hashlib
+import json
+import logging
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+import cache_codec
+
+logger = logging.getLogger(__name__)
+
+class OrderDedupCache:
+    """訂單去重快取"""
+
+    STATE_NEW = 'new'
+    STATE_PENDING = 'pending'
+    STATE_DONE = 'done'
+    STATE_CONFLICT = 'conflict'
+
+    def __init__(self, redis_client=None, ttl: int = 86400, pending_ttl: int = 60):
+        self.redis = redis_client
+        self.ttl = ttl                  # 完成結果保留 24 小時
+        self.pending_ttl = pending_ttl  # 執行中標記最長保留 60 秒
+
+        # 記憶體快取 (Redis 備用方案)
+        self._local: Dict[str, Tuple[Dict, float]] = {}
+        self._local_lock = threading.Lock()
+
+    def _key(self, scope: str, client_order_id: str) -> str:
+        """生成去重快取鍵值"""
+        return f"order_dedup:{scope}:{client_order_id}"
+
+    @staticmethod
+    def fingerprint(payload: Optional[Dict]) -> str:
+        """計算請求內容指紋（排除訂單編號本身）"""
+        body = {k: v for k, v in (payload or {}).items() if k != 'client_order_id'}
+        return hashlib.sha1(json.dumps(body, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+    def _load(self, key: str) -> Optional[Dict]:
+        """讀取去重記錄"""
+        if self.redis:
+            return cache_codec.decode(self.redis.get(key))
+
+        with self._local_lock:
+            entry = self._local.get(key)
+            if entry and entry[1] > time.time():
+                return entry[0]
+            self._local.pop(key, None)
+        return None
+
+    def _store(self, key: str, record: Dict, ttl: int, only_if_absent: bool = False) -> bool:
+        """寫入去重記錄"""
+        if self.redis:
+            return bool(self.redis.set(key, cache_codec.encode(record), ex=ttl, nx=only_if_absent))
+
+        with self._local_lock:
+            now = time.time()
+            entry = self._local.get(key)
+            if only_if_absent and entry and entry[1] > now:
+                return False
+            self._local[key] = (record, now + ttl)
+
+            # 順便清理過期記錄，避免記憶體無限增長
+            if len(self._local) > 10000:
+                expired = [k for k, (_, expires_at) in self._local.items() if expires_at <= now]
+                for k in expired:
+                    self._local.pop(k, None)
+            return True
+
+    def reserve(self, scope: str, client_order_id: str, fingerprint: str) -> Tuple[str, Optional[Dict]]:
+        """佔用訂單編號，回傳 (狀態, 已儲存的結果)"""
+        key = self._key(scope, client_order_id)
+        pending = {'state': self.STATE_PENDING, 'fingerprint': fingerprint}
+
+        if self._store(key, pending, self.pending_ttl, only_if_absent=True):
+            return self.STATE_NEW, None
+
+        record = self._load(key)
+        if record is None:
+            # 記錄剛好過期，重新佔用
+            if self._store(key, pending, self.pending_ttl, only_if_absent=True):
+                return self.STATE_NEW, None
+            return self.STATE_PENDING, None
+
+        if record.get('fingerprint') != fingerprint:
+            return self.STATE_CONFLICT, None
+
+        return record.get('state', self.STATE_PENDING), record
+
+    def complete(self, scope: str, client_order_id: str, fingerprint: str, response: Dict, status_code: int):
+        """儲存已完成訂單的結果"""
+        record = {
+            'state': self.STATE_DONE,
+            'fingerprint': fingerprint,
+            'status_code': status_code,
+            'response': response,
+            'completed_at': time.time()
+        }
+        self._store(self._key(scope, client_order_id), record, self.ttl)
+
+    def release(self, scope: str, client_order_id: str):
+        """釋放佔用（交易失敗時允許客戶端重試）"""
+        key = self._key(scope, client_order_id)
+        if self.redis:
+            self.redis.delete(key)
+        else:
+            with self._local_lock:
+                self._local.pop(key, None)
+
+    def idempotent(self, view):
+        """交易路由裝飾器：帶有 client_order_id 的請求只會執行一次"""
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            data = request.get_json(silent=True) or {}
+            client_order_id = data.get('client_order_id') or request.headers.get('Idempotency-Key')
+            user_id = data.get('user_id')
+
+            if not client_order_id or not user_id:
+                return view(*args, **kwargs)
+
+            scope = f"{request.path}:{user_id}"
+            fingerprint = self.fingerprint(data)
+
+            try:
+                state, record = self.reserve(scope, str(client_order_id), fingerprint)
+            except Exception as e:
+                # 去重快取故障時不阻擋交易
+                logger.error(f"訂單去重快取讀取失敗: {e}")
+                return view(*args, **kwargs)
+
+            if state == self.STATE_DONE:
+                logger.info(f"♻️ 重複訂單，回傳已儲存結果: {client_order_id}")
+                response = make_response(jsonify(record['response']), record.get('status_code', 200))
+                response.headers['Idempotent-Replayed'] = 'true'
+                return response
+
+            if state == self.STATE_PENDING:
+                return jsonify({"error": "相同訂單處理中，請稍後重試", "client_order_id": client_order_id}), 409
+
+            if state == self.STATE_CONFLICT:
+                return jsonify({"error": "訂單編號已被不同內容的請求使用", "client_order_id": client_order_id}), 422
+
+            try:
+                response = make_response(view(*args, **kwargs))
+            except Exception:
+                self.release(scope, str(client_order_id))
+                raise
+
+            try:
+                if response.status_code == 200:
+                    self.complete(scope, str(client_order_id), fingerprint, response.get_json(), response.status_code)
+                else:
+                    # 失敗的請求不保留，讓客戶端修正後可重試
+                    self.release(scope, str(client_order_id))
+            except Exception as e:
+                logger.error(f"訂單去重結果寫入失敗: {e}")
+
+            return response
+
+        return wrapper
+
+# 全局去重快取實例（單例模式）
+order_dedup_cache = None
+
+def get_order_dedup_cache(redis_client=None) -> OrderDedupCache:
+    """獲取訂單去重快取實例（單例模式）"""
+    global order_dedup_cache
+    if order_dedup_cache is None:
+        order_dedup_cache = OrderDedupCache(redis_client)
+    return order_dedup_cache
@@ -0,0 +1,210 @@
+"""
+即時推播中心
+將股價、成交與排行榜變動推送給已連線的客戶端（SSE），取代客戶端輪詢
+
+設計重點:
+1. 事件依主題（topic）發佈，每條連線只訂閱自己需要的主題
+       quote:{symbol}          股價更新
+       user:{user_id}          成交與投資組合變動
+       leaderboard:{tid}       排名變動
+2. 所有 worker 共用一個 Redis pub/sub 頻道，每個 worker 只有一條訂閱連線，
+   收到事件後在行程內分派給訂閱該主題的連線
+3. 每條連線一個有界佇列，客戶端過慢時丟棄最舊的事件，不拖慢其他連線
+4. 訂閱執行緒在 worker 內首次有連線時才啟動（preload_app 下 fork 後才建立）
+5. Redis 未連線時只在行程內分派
+6. 訂閱以 get_message 輪詢（redis_cache.listen_pubsub），頻道閒置時不會逾時斷線
+"""
+
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import cache_codec
+from redis_cache import listen_pubsub
+
+logger = logging.getLogger(__name__)
+
+REALTIME_CHANNEL = 'realtime_events'
+
+def quote_topic(symbol: str) -> str:
+    return f"quote:{symbol}"
+
+def user_topic(user_id: str) -> str:
+    return f"user:{user_id}"
+
+def leaderboard_topic(tournament_id: str) -> str:
+    return f"leaderboard:{tournament_id}"
+
+class Subscription:
+    """單一連線的訂閱與事件佇列"""
+
+    def __init__(self, hub: 'RealtimeHub', topics: Iterable[str], max_queue: int = 256):
+        self.hub = hub
+        self.id = uuid.uuid4().hex
+        self.topics: Set[str] = set(topics)
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self.dropped = 0
+
+    def put(self, event: Tuple[str, str, Dict]):
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            # 客戶端過慢：丟棄最舊的事件
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                pass
+            self.dropped += 1
+            self.hub.dropped_events += 1
+            try:
+                self._queue.put_nowait(event)
+            except queue.Full:
+                pass
+
+    def get(self, timeout: float) -> Optional[Tuple[str, str, Dict]]:
+        """等待下一個事件（逾時回傳 None）"""
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self.hub.unsubscribe(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+class RealtimeHub:
+    """即時推播中心（Redis pub/sub 跨 worker 分派）"""
+
+    def __init__(self, redis_client=None, max_queue: int = 256):
+        self.redis = redis_client
+        self.max_queue = max_queue  # 每條連線最多暫存的事件數
+
+        self._subscribers: Dict[str, Set[Subscription]] = {}  # topic -> 訂閱
+        self._lock = threading.Lock()
+        self._listener_pid: Optional[int] = None
+
+        # 統計指標
+        self.published_events = 0
+        self.delivered_events = 0
+        self.dropped_events = 0
+
+    # ========================================
+    # 發佈
+    # ========================================
+
+    def publish(self, topic: str, event: str, data: Dict, pipe=None):
+        """發佈事件（可併入呼叫端的 Redis 管線）"""
+        self.publish_many([(topic, event, data)], pipe)
+
+    def publish_many(self, events: List[Tuple[str, str, Dict]], pipe=None):
+        """一次往返發佈多個事件"""
+        if not events:
+            return
+        self.published_events += len(events)
+
+        if not self.redis:
+            for event in events:
+                self._dispatch(event)
+            return
+
+        client = pipe or self.redis.pipeline(transaction=False)
+        for topic, event, data in events:
+            client.publish(REALTIME_CHANNEL, cache_codec.encode({'topic': topic, 'event': event, 'data': data}))
+        if pipe is None:
+            client.execute()
+
+    def _dispatch(self, event: Tuple[str, str, Dict]):
+        with self._lock:
+            subscribers = list(self._subscribers.get(event[0], ()))
+        for subscription in subscribers:
+            subscription.put(event)
+        self.delivered_events += len(subscribers)
+
+    # ========================================
+    # 訂閱
+    # ========================================
+
+    def subscribe(self, topics: Iterable[str]) -> Subscription:
+        """建立一條連線的訂閱"""
+        self._ensure_listener()
+        subscription = Subscription(self, topics, self.max_queue)
+        with self._lock:
+            for topic in subscription.topics:
+                self._subscribers.setdefault(topic, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            for topic in subscription.topics:
+                subscribers = self._subscribers.get(topic)
+                if subscribers is None:
+                    continue
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[topic]
+
+    def _ensure_listener(self):
+        """每個 worker 行程啟動一次 pub/sub 訂閱執行緒"""
+        if not self.redis or self._listener_pid == os.getpid():
+            return
+        with self._lock:
+            if self._listener_pid == os.getpid():
+                return
+            self._listener_pid = os.getpid()
+        threading.Thread(target=self._listen_loop, name='realtime-hub-listener', daemon=True).start()
+        logger.info(f"📡 即時推播訂閱啟動: worker {os.getpid()}")
+
+    def _listen_loop(self):
+        while True:
+            pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+            try:
+                pubsub.subscribe(REALTIME_CHANNEL)
+                # 頻道閒置不視為錯誤，避免重新連線期間遺失事件
+                for message in listen_pubsub(pubsub):
+                    payload = cache_codec.decode(message.get('data'))
+                    if not payload:
+                        continue
+                    # 行程內沒有訂閱者的主題直接略過
+                    if payload['topic'] not in self._subscribers:
+                        continue
+                    self._dispatch((payload['topic'], payload['event'], payload['data']))
+            except Exception as e:
+                logger.error(f"即時推播訂閱中斷，5 秒後重新連線: {e}")
+                time.sleep(5)
+            finally:
+                try:
+                    pubsub.close()
+                except Exception:
+                    pass
+
+    def metrics(self) -> Dict:
+        """獲取推播統計"""
+        with self._lock:
+            connections = len({subscription for subscribers in self._subscribers.values() for subscription in subscribers})
+            topics = len(self._subscribers)
+        return {
+            'connections': connections,
+            'topics': topics,
+            'published_events': self.published_events,
+            'delivered_events': self.delivered_events,
+            'dropped_events': self.dropped_events
+        }
+
+# 全局推播中心實例（單例模式）
+realtime_hub = None
+
+def get_realtime_hub(redis_client=None) -> RealtimeHub:
+    """獲取即時推播中心實例（單例模式）"""
+    global realtime_hub
+    if realtime_hub is None:
+        realtime_hub = RealtimeHub(redis_client)
+    return realtime_hub
@@ -0,0 +1,90 @@
+"""
+即時推播路由（Server-Sent Events）
+客戶端以一條長連線接收股價、成交與排名變動，不再輪詢 /api/quote、/api/portfolio 與排行榜
+
+連線方式:
+    GET /api/realtime/stream?symbols=2330,AAPL&user_id=<uid>&tournament_id=<tid>
+    （股票代號以 normalize_taiwan_stock_symbol 標準化，2330 與 2330.TW 訂閱同一主題）
+
+事件:
+    quote      股價更新（quote:{symbol}）
+    fill       成交與現金 / 持股變動（user:{user_id}）
+    rank       排名變動（user:{user_id} 與 leaderboard:{tid}）
+    repriced   股價更新後排行榜已重新計價（leaderboard:{tid}）
+"""
+
+from flask import Blueprint, Response, request, jsonify
+import json
+import logging
+
+from realtime_hub import get_realtime_hub, quote_topic, user_topic, leaderboard_topic
+from stock_symbols import normalize_taiwan_stock_symbol
+
+logger = logging.getLogger(__name__)
+
+# 創建即時推播路由藍圖
+realtime_bp = Blueprint('realtime', __name__, url_prefix='/api/realtime')
+
+MAX_SYMBOLS = 50
+HEARTBEAT_SECONDS = 15  # 保持連線的註解訊息間隔（避免代理伺服器中斷閒置連線）
+
+def _sse(event: str, data, event_id=None) -> str:
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, ensure_ascii=False, default=str)}")
+    return '\n'.join(lines) + '\n\n'
+
+@realtime_bp.route('/stream', methods=['GET'])
+def stream():
+    """建立即時推播連線（每條連線只接收自己訂閱的主題）"""
+    # 與報價發布端相同的標準化代號（去除重複）
+    symbols = list(dict.fromkeys(
+        normalize_taiwan_stock_symbol(symbol) for symbol in request.args.get('symbols', '').split(',') if symbol.strip()
+    ))
+    user_id = request.args.get('user_id')
+    tournament_ids = [tid.strip() for tid in request.args.get('tournament_id', '').split(',') if tid.strip()]
+
+    if len(symbols) > MAX_SYMBOLS:
+        return jsonify({"error": f"最多訂閱 {MAX_SYMBOLS} 檔股票"}), 400
+
+    topics = [quote_topic(symbol) for symbol in symbols]
+    if user_id:
+        topics.append(user_topic(user_id))
+    topics.extend(leaderboard_topic(tournament_id) for tournament_id in tournament_ids)
+    if not topics:
+        return jsonify({"error": "缺少訂閱參數: symbols、user_id 或 tournament_id"}), 400
+
+    subscription = get_realtime_hub().subscribe(topics)
+    logger.info(f"📡 即時推播連線 {subscription.id}: {len(topics)} 個主題")
+
+    def generate():
+        sequence = 0
+        try:
+            yield _sse('ready', {'connection_id': subscription.id, 'topics': sorted(subscription.topics)})
+            while True:
+                event = subscription.get(HEARTBEAT_SECONDS)
+                if event is None:
+                    yield ': keep-alive\n\n'
+                    continue
+                sequence += 1
+                _, name, data = event
+                yield _sse(name, data, sequence)
+        finally:
+            # 客戶端中斷連線時釋放訂閱
+            subscription.close()
+            logger.info(f"📴 即時推播連線結束 {subscription.id}")
+
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'  # 關閉 nginx 緩衝，事件立即送達
+    })
+
+@realtime_bp.route('/metrics', methods=['GET'])
+def metrics():
+    """獲取即時推播統計"""
+    return jsonify({
+        'success': True,
+        'realtime_metrics': get_realtime_hub().metrics()
+    })
@@ -0,0 +1,94 @@
+"""
+Redis 連線池與批次快取工具
+所有快取輔助函數共用同一個明確設定大小的連線池
+
+設計重點:
+1. BlockingConnectionPool - 連線數達上限時排隊等待而非無限建立新連線，
+   其內部佇列與鎖在 gevent monkey patch 後為協程安全
+2. 管線化批次讀寫 - 多個鍵值一次往返（MGET / pipeline SETEX），
+   投資組合頁面不再每支股票一次 Redis 往返
+3. 二進位快取值 - 客戶端不自動解碼回應，所有值經 cache_codec 編解碼
+4. pub/sub 訂閱以 get_message 短逾時輪詢 - 連線池的 socket_timeout 會讓 listen()
+   在頻道閒置時拋出 TimeoutError，輪詢逾時只代表沒有訊息，訂閱不中斷
+"""
+
+import logging
+import os
+import threading
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+import redis
+
+import cache_codec
+
+logger = logging.getLogger(__name__)
+
+# Redis 連線設定（可用環境變數覆蓋）
+REDIS_HOST = os.environ.get('REDIS_HOST', 'localhost')
+REDIS_PORT = int(os.environ.get('REDIS_PORT', 6379))
+REDIS_DB = int(os.environ.get('REDIS_DB', 0))
+REDIS_MAX_CONNECTIONS = int(os.environ.get('REDIS_MAX_CONNECTIONS', 50))  # 每個 worker 的連線上限
+REDIS_POOL_TIMEOUT = float(os.environ.get('REDIS_POOL_TIMEOUT', 2))        # 等待可用連線秒數
+REDIS_SOCKET_TIMEOUT = float(os.environ.get('REDIS_SOCKET_TIMEOUT', 2))
+PUBSUB_POLL_TIMEOUT = 1.0  # pub/sub 輪詢秒數（需小於 socket_timeout）
+
+def create_redis_client(host: str = REDIS_HOST, port: int = REDIS_PORT, db: int = REDIS_DB,
+                        max_connections: int = REDIS_MAX_CONNECTIONS) -> redis.Redis:
+    """建立使用固定大小連線池的 Redis 客戶端"""
+    pool = redis.BlockingConnectionPool(
+        host=host,
+        port=port,
+        db=db,
+        max_connections=max_connections,
+        timeout=REDIS_POOL_TIMEOUT,
+        socket_timeout=REDIS_SOCKET_TIMEOUT,
+        socket_connect_timeout=REDIS_SOCKET_TIMEOUT,
+        socket_keepalive=True,
+        health_check_interval=30,
+        decode_responses=False  # 快取值為二進位格式，由 cache_codec 解碼
+    )
+    return redis.Redis(connection_pool=pool)
+
+def cache_get_many(client: redis.Redis, keys: Sequence[str]) -> List[Optional[Any]]:
+    """一次往返讀取多個快取值（未命中為 None）"""
+    if not keys:
+        return []
+
+    values = client.mget(list(keys))
+    results = []
+    for key, value in zip(keys, values):
+        if value is None:
+            results.append(None)
+            continue
+        try:
+            results.append(cache_codec.decode(value))
+        except Exception as e:
+            logger.error(f"快取資料解析失敗 {key}: {e}")
+            results.append(None)
+    return results
+
+def cache_set_many(client: redis.Redis, mapping: Dict[str, Any], ttl: int):
+    """一次往返寫入多個快取值（含過期時間）"""
+    if not mapping:
+        return
+
+    pipe = client.pipeline(transaction=False)
+    for key, value in mapping.items():
+        pipe.setex(key, ttl, cache_codec.encode(value))
+    pipe.execute()
+
+def cache_delete_many(client: redis.Redis, keys: Sequence[str]):
+    """一次往返刪除多個快取鍵"""
+    if keys:
+        client.delete(*keys)
+
+def listen_pubsub(pubsub, stop: Optional[threading.Event] = None,
+                  poll_timeout: float = PUBSUB_POLL_TIMEOUT) -> Iterator[Dict]:
+    """逐筆讀取已訂閱頻道的訊息，頻道閒置時持續等待（stop 設定後結束）
+
+    取代 pubsub.listen()：listen() 以 socket_timeout 阻塞讀取，閒置超過逾時即拋出 TimeoutError
+    """
+    while stop is None or not stop.is_set():
+        message = pubsub.get_message(ignore_subscribe_messages=True, timeout=poll_timeout)
+        if message is not None:
+            yield message
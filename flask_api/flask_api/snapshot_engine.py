@@ -0,0 +1,330 @@
+"""
+錦標賽快照績效引擎
+以每位參與者的累積狀態增量計算 tournament_snapshots 的績效欄位
+
+設計重點:
+1. 每位參與者保存累積狀態：報酬因子、淨值高點、最大回撤、
+   日報酬的 Welford 平均數 / 變異數、獲利天數與交易筆數
+2. 每次快照（每日或盤中）對每位用戶只做 O(1) 更新，不重新掃描交易與股價歷史
+3. 換日時才將前一日報酬併入累積狀態，盤中快照只計算暫定值
+4. 整場錦標賽的快照以一次 upsert 批量寫入
+5. 狀態保存在 Redis（跨 worker 共用），未連線時保存在行程內
+6. 排行榜列的績效欄位以累積狀態加上即時總資產計算，不查詢快照表
+
+欄位定義:
+    daily_return   當日報酬（相對前一日收盤總資產）
+    twr_return     時間加權報酬（錦標賽無入金出金，為每日報酬連乘）
+    max_dd         最大回撤（相對歷史淨值高點，含盤中觀測值）
+    sharpe_ratio   年化夏普值（無風險利率 0，至少兩個交易日）
+    win_rate       獲利交易日比例
+    total_trades   累計交易筆數
+"""
+
+import logging
+import math
+import threading
+from dataclasses import dataclass, asdict
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Optional
+
+import cache_codec
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class ParticipantState:
+    """參與者累積績效狀態"""
+    day: Optional[str] = None        # 目前（尚未結算）的交易日
+    day_start_assets: float = 0.0    # 目前交易日的起始總資產（前一日收盤）
+    last_assets: float = 0.0         # 最近一次觀測的總資產
+    cum_factor: float = 1.0          # 已結算交易日的報酬因子連乘
+    peak_factor: float = 1.0         # 報酬因子歷史高點
+    max_dd: float = 0.0              # 最大回撤
+    days: int = 0                    # 已結算交易日數
+    mean: float = 0.0                # 日報酬平均（Welford）
+    m2: float = 0.0                  # 日報酬離差平方和（Welford）
+    wins: int = 0                    # 獲利交易日數
+    total_trades: int = 0            # 累計交易筆數
+    updated_at: Optional[str] = None # 最近一次快照時間（盤中快照時間或每日快照日期）
+
+    def commit_day(self):
+        """結算目前交易日，將日報酬併入累積狀態"""
+        daily_return = self.last_assets / self.day_start_assets - 1 if self.day_start_assets else 0.0
+        self.cum_factor *= 1 + daily_return
+        self.days += 1
+        delta = daily_return - self.mean
+        self.mean += delta / self.days
+        self.m2 += delta * (daily_return - self.mean)
+        if daily_return > 0:
+            self.wins += 1
+        self.day_start_assets = self.last_assets
+
+    def observe(self, as_of_date: str, total_assets: float, initial_balance: float) -> float:
+        """記錄一次觀測，回傳當日暫定報酬"""
+        if self.day is None:
+            self.day = as_of_date
+            self.day_start_assets = initial_balance
+        elif as_of_date > self.day:
+            self.commit_day()
+            self.day = as_of_date
+
+        self.last_assets = total_assets
+        daily_return = total_assets / self.day_start_assets - 1 if self.day_start_assets else 0.0
+
+        # 淨值高點與回撤包含盤中觀測值
+        factor = self.cum_factor * (1 + daily_return)
+        self.peak_factor = max(self.peak_factor, factor)
+        if self.peak_factor > 0:
+            self.max_dd = max(self.max_dd, 1 - factor / self.peak_factor)
+        return daily_return
+
+def value_accounts(portfolios: Iterable[Dict], positions: Iterable[Dict], prices: Dict[str, float]) -> Dict[str, Dict]:
+    """以股價估算每位參與者的現金與持股市值（未提供股價的股票以平均成本計價）"""
+    valuations = {
+        row['user_id']: {'cash_balance': float(row['cash_balance']), 'equity_value': 0.0}
+        for row in portfolios
+    }
+    for row in positions:
+        valuation = valuations.get(row['user_id'])
+        if valuation is None:
+            continue
+        price = prices.get(row['symbol'], float(row['avg_cost']))
+        valuation['equity_value'] += float(row['qty']) * price
+    return valuations
+
+class SnapshotEngine:
+    """錦標賽快照績效引擎"""
+
+    TRADING_DAYS_PER_YEAR = 252
+
+    def __init__(self, supabase_client, redis_client=None, initial_balance: float = 1000000.0):
+        self.supabase = supabase_client
+        self.redis = redis_client
+        self.initial_balance = initial_balance
+
+        # 行程內狀態 (Redis 備用方案)
+        self._local_states: Dict[str, Dict[str, Dict]] = {}
+        self._local_trades: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _state_key(tournament_id: str) -> str:
+        return f"tournament_snapshot_state:{tournament_id}"
+
+    @staticmethod
+    def _trades_key(tournament_id: str) -> str:
+        return f"tournament_snapshot_trades:{tournament_id}"
+
+    # ========================================
+    # 交易計數
+    # ========================================
+
+    def record_trade(self, tournament_id: str, user_id: str, pipe=None):
+        """累計上次快照後的交易筆數（可併入呼叫端的 Redis 管線）"""
+        if self.redis:
+            (pipe or self.redis).hincrby(self._trades_key(tournament_id), user_id, 1)
+            return
+
+        with self._lock:
+            counts = self._local_trades.setdefault(tournament_id, {})
+            counts[user_id] = counts.get(user_id, 0) + 1
+
+    def _read_trade_counts(self, tournament_id: str) -> Dict[str, int]:
+        """讀取上次快照後的交易筆數"""
+        if self.redis:
+            counts = self.redis.hgetall(self._trades_key(tournament_id))
+            return {cache_codec.decode_text(user_id): int(count) for user_id, count in counts.items()}
+
+        with self._lock:
+            return dict(self._local_trades.get(tournament_id, {}))
+
+    def _ack_trade_counts(self, tournament_id: str, counts: Dict[str, int]):
+        """快照寫入成功後扣除已計入的筆數（期間新增的交易保留至下次快照）"""
+        if not counts:
+            return
+        if self.redis:
+            pipe = self.redis.pipeline(transaction=False)
+            for user_id, count in counts.items():
+                pipe.hincrby(self._trades_key(tournament_id), user_id, -count)
+            pipe.execute()
+            return
+
+        with self._lock:
+            pending = self._local_trades.get(tournament_id, {})
+            for user_id, count in counts.items():
+                pending[user_id] = pending.get(user_id, 0) - count
+                if pending[user_id] <= 0:
+                    pending.pop(user_id, None)
+
+    # ========================================
+    # 狀態存取
+    # ========================================
+
+    def _load_states(self, tournament_id: str) -> Dict[str, ParticipantState]:
+        if self.redis:
+            raw = self.redis.hgetall(self._state_key(tournament_id))
+            return {
+                cache_codec.decode_text(user_id): ParticipantState(**cache_codec.decode(state))
+                for user_id, state in raw.items()
+            }
+
+        with self._lock:
+            return {
+                user_id: ParticipantState(**state)
+                for user_id, state in self._local_states.get(tournament_id, {}).items()
+            }
+
+    def _load_user_states(self, tournament_id: str, user_ids: List[str]) -> Dict[str, ParticipantState]:
+        """只讀取指定用戶的狀態（一次往返）"""
+        if not user_ids:
+            return {}
+        if self.redis:
+            raw = self.redis.hmget(self._state_key(tournament_id), user_ids)
+            return {
+                user_id: ParticipantState(**cache_codec.decode(state))
+                for user_id, state in zip(user_ids, raw) if state is not None
+            }
+
+        with self._lock:
+            states = self._local_states.get(tournament_id, {})
+            return {user_id: ParticipantState(**states[user_id]) for user_id in user_ids if user_id in states}
+
+    def _save_states(self, tournament_id: str, states: Dict[str, ParticipantState]):
+        if not states:
+            return
+        if self.redis:
+            self.redis.hset(self._state_key(tournament_id), mapping={
+                user_id: cache_codec.encode(asdict(state)) for user_id, state in states.items()
+            })
+            return
+
+        with self._lock:
+            self._local_states.setdefault(tournament_id, {}).update(
+                {user_id: asdict(state) for user_id, state in states.items()}
+            )
+
+    def reset(self, tournament_id: str):
+        """清除錦標賽的累積狀態（重新開賽時使用）"""
+        if self.redis:
+            self.redis.delete(self._state_key(tournament_id), self._trades_key(tournament_id))
+        with self._lock:
+            self._local_states.pop(tournament_id, None)
+            self._local_trades.pop(tournament_id, None)
+
+    # ========================================
+    # 快照
+    # ========================================
+
+    def _sharpe(self, state: ParticipantState, daily_return: float) -> float:
+        """含當日暫定報酬的年化夏普值（不修改狀態）"""
+        days = state.days + 1
+        delta = daily_return - state.mean
+        mean = state.mean + delta / days
+        m2 = state.m2 + delta * (daily_return - mean)
+        if days < 2:
+            return 0.0
+        std = math.sqrt(m2 / (days - 1))
+        if std == 0:
+            return 0.0
+        return mean / std * math.sqrt(self.TRADING_DAYS_PER_YEAR)
+
+    def compute(self, tournament_id: str, valuations: Dict[str, Dict], as_of_date: Optional[date] = None,
+                states: Optional[Dict[str, ParticipantState]] = None,
+                trade_counts: Optional[Dict[str, int]] = None,
+                snapshot_at: Optional[datetime] = None) -> List[Dict]:
+        """依參與者估值計算快照列（每位用戶 O(1)），並更新 states
+
+        valuations: {user_id: {'cash_balance': 現金, 'equity_value': 持股市值}}
+        snapshot_at: 盤中快照時間（每日快照為 None）
+        """
+        as_of = (as_of_date or date.today()).isoformat()
+        states = self._load_states(tournament_id) if states is None else states
+        trade_counts = self._read_trade_counts(tournament_id) if trade_counts is None else trade_counts
+
+        rows = []
+        for user_id, valuation in valuations.items():
+            cash_balance = float(valuation['cash_balance'])
+            equity_value = float(valuation['equity_value'])
+            total_assets = cash_balance + equity_value
+
+            state = states.setdefault(user_id, ParticipantState())
+            daily_return = state.observe(as_of, total_assets, self.initial_balance)
+            state.total_trades += trade_counts.get(user_id, 0)
+
+            days = state.days + 1
+            wins = state.wins + (1 if daily_return > 0 else 0)
+            rows.append({
+                'tournament_id': tournament_id,
+                'user_id': user_id,
+                'as_of_date': as_of,
+                'cash_balance': round(cash_balance, 2),
+                'equity_value': round(equity_value, 2),
+                'total_assets': round(total_assets, 2),
+                'daily_return': round(daily_return, 6),
+                'twr_return': round(state.cum_factor * (1 + daily_return) - 1, 6),
+                'max_dd': round(state.max_dd, 6),
+                'sharpe_ratio': round(self._sharpe(state, daily_return), 4),
+                'win_rate': round(wins / days, 4),
+                'total_trades': state.total_trades
+            })
+            if snapshot_at is not None:
+                rows[-1]['snapshot_at'] = snapshot_at.isoformat()
+            state.updated_at = snapshot_at.isoformat() if snapshot_at is not None else as_of
+
+        return rows
+
+    def performance(self, tournament_id: str, entries: List[Dict]) -> List[Dict]:
+        """為排行榜列補上 twr_return、max_drawdown、sharpe_ratio 與 updated_at（直接修改 entries）
+
+        以累積狀態與列中的即時總資產計算（與盤中快照相同公式，不修改狀態）；
+        尚未有快照的用戶以初始資金計算報酬，回撤與夏普值為 0，updated_at 為 None。
+        """
+        states = self._load_user_states(tournament_id, [entry['user_id'] for entry in entries])
+        for entry in entries:
+            total_assets = float(entry['total_assets'])
+            state = states.get(entry['user_id'])
+            if state is None:
+                twr_return = total_assets / self.initial_balance - 1 if self.initial_balance else 0.0
+                max_dd, sharpe, updated_at = 0.0, 0.0, None
+            else:
+                day_start = state.day_start_assets or self.initial_balance
+                daily_return = total_assets / day_start - 1 if day_start else 0.0
+                factor = state.cum_factor * (1 + daily_return)
+                peak = max(state.peak_factor, factor)
+                twr_return = factor - 1
+                max_dd = max(state.max_dd, 1 - factor / peak if peak > 0 else 0.0)
+                sharpe, updated_at = self._sharpe(state, daily_return), state.updated_at
+            entry.update({
+                'twr_return': round(twr_return, 6),
+                'max_drawdown': round(max_dd, 6),
+                'sharpe_ratio': round(sharpe, 4),
+                'updated_at': updated_at
+            })
+        return entries
+
+    def take_snapshot(self, tournament_id: str, valuations: Dict[str, Dict], as_of_date: Optional[date] = None,
+                      table: str = 'tournament_snapshots', snapshot_at: Optional[datetime] = None) -> List[Dict]:
+        """計算快照並以一次 upsert 批量寫入，成功後才保存累積狀態"""
+        states = self._load_states(tournament_id)
+        trade_counts = self._read_trade_counts(tournament_id)
+        rows = self.compute(tournament_id, valuations, as_of_date, states, trade_counts, snapshot_at)
+        if not rows:
+            return rows
+
+        conflict_columns = 'tournament_id,user_id,snapshot_at' if snapshot_at is not None else 'tournament_id,user_id,as_of_date'
+        self.supabase.table(table).upsert(rows, on_conflict=conflict_columns).execute()
+        self._save_states(tournament_id, {row['user_id']: states[row['user_id']] for row in rows})
+        self._ack_trade_counts(tournament_id, {user_id: count for user_id, count in trade_counts.items() if user_id in valuations})
+
+        logger.info(f"📸 錦標賽快照完成: {tournament_id}, {len(rows)} 位參與者, {rows[0]['as_of_date']}")
+        return rows
+
+# 全局快照引擎實例（單例模式）
+snapshot_engine = None
+
+def get_snapshot_engine(supabase_client, redis_client=None) -> SnapshotEngine:
+    """獲取快照引擎實例（單例模式）"""
+    global snapshot_engine
+    if snapshot_engine is None:
+        snapshot_engine = SnapshotEngine(supabase_client, redis_client)
+    return snapshot_engine
@@ -0,0 +1,241 @@
+"""
+錦標賽盤中快照排程器
+依設定的間隔在交易時段內為所有進行中錦標賽建立快照，收盤後彙總為每日快照
+
+設計重點:
+1. 間隔與交易時段可用環境變數設定，排行榜延遲上限即為快照間隔
+2. 每次排程分批載入所有錦標賽的投資組合與持倉（不受 PostgREST 筆數上限截斷），所有股票共用一次股價查詢
+3. 盤中快照批量寫入 tournament_snapshots_intraday
+4. 收盤後寫入每日快照（tournament_snapshots），只刪除寫入成功的錦標賽的當日盤中快照；
+   任一錦標賽失敗時釋放收盤時段，下一個間隔重新執行（同日重複寫入每日快照不影響累積狀態）
+5. 多個 worker 同時執行時以 Redis 搶占每個排程時段，同一時段只執行一次
+6. 排程執行緒在每個 worker 收到第一個請求時啟動（gunicorn preload_app 的 master 不執行排程）
+
+環境變數:
+    SNAPSHOT_SCHEDULER_ENABLED   是否啟用（預設 true）
+    SNAPSHOT_INTERVAL_SECONDS    盤中快照間隔秒數（預設 60）
+    SNAPSHOT_TRADING_HOURS       交易時段（預設 09:00-13:30）
+    SNAPSHOT_TIMEZONE            交易時段時區（預設 Asia/Taipei）
+"""
+
+import logging
+import os
+import threading
+import time
+from datetime import date, datetime, time as dt_time, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+from data_access import fetch_all
+from http_cache import leaderboard_scope
+from snapshot_engine import value_accounts
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_SCHEDULER_ENABLED = os.environ.get('SNAPSHOT_SCHEDULER_ENABLED', 'true').lower() == 'true'
+SNAPSHOT_INTERVAL_SECONDS = int(os.environ.get('SNAPSHOT_INTERVAL_SECONDS', 60))
+SNAPSHOT_TRADING_HOURS = os.environ.get('SNAPSHOT_TRADING_HOURS', '09:00-13:30')
+SNAPSHOT_TIMEZONE = os.environ.get('SNAPSHOT_TIMEZONE', 'Asia/Taipei')
+
+INTRADAY_TABLE = 'tournament_snapshots_intraday'
+DAILY_TABLE = 'tournament_snapshots'
+
+def parse_trading_hours(value: str) -> Tuple[dt_time, dt_time]:
+    """解析交易時段設定，例如 09:00-13:30"""
+    opens_at, closes_at = (dt_time.fromisoformat(part.strip()) for part in value.split('-'))
+    return opens_at, closes_at
+
+class SnapshotScheduler:
+    """錦標賽盤中快照排程器"""
+
+    def __init__(self, service_factory: Callable, price_fetcher: Callable[[List[str]], Dict[str, float]],
+                 interval: int = SNAPSHOT_INTERVAL_SECONDS, trading_hours: str = SNAPSHOT_TRADING_HOURS,
+                 tz: str = SNAPSHOT_TIMEZONE):
+        self._service_factory = service_factory  # 延遲建立錦標賽服務
+        self.price_fetcher = price_fetcher      # symbols -> {symbol: price}，整批查詢一次
+        self.interval = interval
+        self.opens_at, self.closes_at = parse_trading_hours(trading_hours)
+        self.tz = ZoneInfo(tz)
+
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._start_lock = threading.Lock()
+        self._local_claims: Dict[str, str] = {}  # 種類 -> 最近搶占的時段（Redis 備用方案）
+
+        # 統計指標
+        self.runs = 0
+        self.rows_written = 0
+        self.last_run_at: Optional[str] = None
+        self.last_duration_ms = 0.0
+        self.last_close_date: Optional[str] = None
+        self.last_error: Optional[str] = None
+
+    @property
+    def service(self):
+        return self._service_factory()
+
+    # ========================================
+    # 排程
+    # ========================================
+
+    def start(self):
+        """啟動排程執行緒（每個行程一次；fork 後的子行程沒有父行程的執行緒，需重新啟動）"""
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._loop, name='tournament-snapshot-scheduler', daemon=True)
+            self._thread.start()
+        logger.info(f"⏱️ 快照排程器啟動: 每 {self.interval} 秒, 交易時段 {self.opens_at:%H:%M}-{self.closes_at:%H:%M} ({self.tz.key})")
+
+    def stop(self):
+        self._stop.set()
+
+    def _loop(self):
+        # 對齊到間隔邊界，讓所有 worker 搶占同一個時段
+        while not self._stop.wait(self.interval - time.time() % self.interval):
+            try:
+                self.tick()
+            except Exception as e:
+                self.last_error = str(e)
+                logger.error(f"快照排程執行失敗: {e}")
+
+    def _claim(self, kind: str, slot: str, ttl: int) -> bool:
+        """搶占排程時段（跨 worker 只有一個成功）"""
+        redis_client = self.service.redis
+        if redis_client:
+            return bool(redis_client.set(f"tournament_snapshot_slot:{kind}:{slot}", 1, ex=ttl, nx=True))
+        # 時段只會遞增，每種排程只需保留最近一個
+        if self._local_claims.get(kind) == slot:
+            return False
+        self._local_claims[kind] = slot
+        return True
+
+    def _release(self, kind: str, slot: str):
+        """釋放排程時段（執行失敗時讓下一個間隔重試）"""
+        redis_client = self.service.redis
+        if redis_client:
+            redis_client.delete(f"tournament_snapshot_slot:{kind}:{slot}")
+        elif self._local_claims.get(kind) == slot:
+            del self._local_claims[kind]
+
+    def tick(self, now: Optional[datetime] = None):
+        """執行一次排程檢查"""
+        local_now = (now or datetime.now(timezone.utc)).astimezone(self.tz)
+        if local_now.weekday() >= 5:
+            return
+
+        current = local_now.time()
+        today = local_now.date()
+        if self.opens_at <= current <= self.closes_at:
+            slot = str(int(local_now.timestamp()) // self.interval)
+            if self._claim('intraday', slot, self.interval * 2):
+                self.run_intraday(local_now)
+        elif current > self.closes_at:
+            slot = today.isoformat()
+            if self._claim('close', slot, 86400):
+                completed = False
+                try:
+                    completed = self.run_daily_close(today)
+                finally:
+                    if not completed:
+                        self._release('close', slot)
+
+    # ========================================
+    # 快照
+    # ========================================
+
+    def _load_accounts(self, tournament_ids: List[str]) -> Tuple[Dict[str, List[Dict]], Dict[str, List[Dict]]]:
+        """分批載入所有錦標賽的投資組合與持倉"""
+        portfolios: Dict[str, List[Dict]] = {tournament_id: [] for tournament_id in tournament_ids}
+        positions: Dict[str, List[Dict]] = {tournament_id: [] for tournament_id in tournament_ids}
+
+        supabase = self.service.supabase
+        portfolio_query = supabase.table('tournament_portfolios').select('tournament_id, user_id, cash_balance').in_('tournament_id', tournament_ids)
+        for row in fetch_all(portfolio_query, 'tournament_id,user_id'):
+            portfolios[row['tournament_id']].append(row)
+        position_query = supabase.table('tournament_positions').select('tournament_id, user_id, symbol, qty, avg_cost').in_('tournament_id', tournament_ids)
+        for row in fetch_all(position_query, 'tournament_id,user_id,symbol'):
+            positions[row['tournament_id']].append(row)
+        return portfolios, positions
+
+    def _snapshot(self, tournament_ids: List[str], as_of: date, table: str,
+                  snapshot_at: Optional[datetime]) -> Tuple[int, List[str]]:
+        """建立快照，回傳 (寫入筆數, 寫入成功的錦標賽 ID)"""
+        if not tournament_ids:
+            return 0, []
+
+        start_time = time.time()
+        portfolios, positions = self._load_accounts(tournament_ids)
+
+        # 所有錦標賽共用一次股價查詢
+        symbols = sorted({row['symbol'] for rows in positions.values() for row in rows})
+        prices = self.price_fetcher(symbols) if symbols else {}
+
+        engine = self.service.snapshot_engine
+        rows_written = 0
+        succeeded = []
+        for tournament_id in tournament_ids:
+            valuations = value_accounts(portfolios[tournament_id], positions[tournament_id], prices)
+            try:
+                rows_written += len(engine.take_snapshot(tournament_id, valuations, as_of, table, snapshot_at))
+                succeeded.append(tournament_id)
+            except Exception as e:
+                self.last_error = str(e)
+                logger.error(f"錦標賽快照寫入失敗 {tournament_id}: {e}")
+
+        # 排行榜績效欄位來自快照狀態，快照後換 ETag
+        if succeeded:
+            try:
+                self.service.http_cache.bump([leaderboard_scope(tournament_id) for tournament_id in succeeded])
+            except Exception as e:
+                logger.error(f"HTTP 快取版本更新失敗: {e}")
+
+        self.runs += 1
+        self.rows_written += rows_written
+        self.last_run_at = datetime.now(timezone.utc).isoformat()
+        self.last_duration_ms = (time.time() - start_time) * 1000
+        return rows_written, succeeded
+
+    def run_intraday(self, local_now: datetime) -> int:
+        """為所有進行中錦標賽建立盤中快照"""
+        tournament_ids = self.service.status_cache.active_ids(local_now)
+        rows, _ = self._snapshot(tournament_ids, local_now.date(), INTRADAY_TABLE, local_now.astimezone(timezone.utc))
+        logger.info(f"📸 盤中快照完成: {len(tournament_ids)} 場錦標賽, {rows} 筆, {self.last_duration_ms:.0f}ms")
+        return rows
+
+    def run_daily_close(self, as_of: date) -> bool:
+        """收盤後寫入每日快照並刪除寫入成功的錦標賽的當日盤中快照，全部成功時回傳 True"""
+        closes_at = datetime.combine(as_of, self.closes_at, tzinfo=self.tz)
+        tournament_ids = self.service.status_cache.active_ids(closes_at)
+        rows, succeeded = self._snapshot(tournament_ids, as_of, DAILY_TABLE, None)
+
+        # 失敗的錦標賽保留盤中快照，重試前仍有當日資料
+        if succeeded:
+            self.service.supabase.table(INTRADAY_TABLE).delete().in_('tournament_id', succeeded).eq('as_of_date', as_of.isoformat()).execute()
+
+        failed = len(tournament_ids) - len(succeeded)
+        if failed:
+            logger.warning(f"⚠️ 每日快照部分失敗: {as_of}, {failed} 場錦標賽將於下一個間隔重試")
+            return False
+
+        self.last_close_date = as_of.isoformat()
+        logger.info(f"🗓️ 每日快照彙總完成: {as_of}, {len(tournament_ids)} 場錦標賽, {rows} 筆")
+        return True
+
+    def metrics(self) -> Dict:
+        """獲取排程統計"""
+        return {
+            'interval_seconds': self.interval,
+            'trading_hours': f"{self.opens_at:%H:%M}-{self.closes_at:%H:%M}",
+            'timezone': self.tz.key,
+            'runs': self.runs,
+            'rows_written': self.rows_written,
+            'last_run_at': self.last_run_at,
+            'last_duration_ms': self.last_duration_ms,
+            'last_close_date': self.last_close_date,
+            'last_error': self.last_error
+        }
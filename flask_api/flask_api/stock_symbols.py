@@ -0,0 +1,57 @@
+"""
+股票代號工具
+報價、交易與即時推播共用同一套代號標準化，訂閱端與發布端的主題一致
+"""
+
+# 熱門台股清單
+POPULAR_TAIWAN_STOCKS = {
+    "2330": "台積電",
+    "2454": "聯發科", 
+    "2317": "鴻海",
+    "2308": "台達電",
+    "2382": "廣達",
+    "2412": "中華電",
+    "2881": "富邦金",
+    "2891": "中信金",
+    "2886": "兆豐金",
+    "2303": "聯電",
+    "3008": "大立光",
+    "2002": "中鋼",
+    "1303": "南亞",
+    "1301": "台塑",
+    "2207": "和泰車",
+    "2357": "華碩",
+    "2409": "友達",
+    "2474": "可成",
+    "6505": "台塑化",
+    "2912": "統一超"
+}
+
+def normalize_taiwan_stock_symbol(symbol: str) -> str:
+    """標準化台股股票代號"""
+    symbol = symbol.upper().strip()
+    
+    # 如果是純數字且長度為4，自動加上 .TW
+    if symbol.isdigit() and len(symbol) == 4:
+        return f"{symbol}.TW"
+    
+    # 如果已經有 .TW 後綴，直接返回
+    if symbol.endswith('.TW') or symbol.endswith('.TWO'):
+        return symbol
+    
+    # 檢查是否為熱門台股（4位數字）
+    base_symbol = symbol.replace('.TW', '').replace('.TWO', '')
+    if base_symbol in POPULAR_TAIWAN_STOCKS:
+        return f"{base_symbol}.TW"
+    
+    # 其他情況直接返回（可能是美股或其他市場）
+    return symbol
+
+def is_taiwan_stock(symbol: str) -> bool:
+    """判斷是否為台股"""
+    return symbol.endswith('.TW') or symbol.endswith('.TWO')
+
+def get_taiwan_stock_name(symbol: str) -> str:
+    """獲取台股中文名稱"""
+    base_symbol = symbol.replace('.TW', '').replace('.TWO', '')
+    return POPULAR_TAIWAN_STOCKS.get(base_symbol, f"{symbol} 股份有限公司")
@@ -0,0 +1,220 @@
+"""
+Supabase / PostgREST 連線池客戶端
+所有 table / rpc 呼叫共用同一組 HTTP keep-alive 連線池
+
+設計重點:
+1. 共用傳輸層 - 同一 Supabase 專案的所有客戶端共用連線池，避免重複建立 TLS 連線
+2. 連線限制 - 每個主機的最大連線數、keep-alive 連線數與閒置逾時
+3. 併發限制 - 限制同時進行中的請求數，避免 gevent worker 打爆資料庫
+4. 請求指標 - 依資料表 / RPC 統計請求數、錯誤數與延遲
+
+使用方式與 supabase.create_client 相同:
+    from supabase_pool import create_client
+    supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+"""
+
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+import httpx
+from postgrest import SyncPostgrestClient
+from postgrest.utils import SyncClient
+from supabase import Client
+from supabase.lib.client_options import ClientOptions
+
+logger = logging.getLogger(__name__)
+
+@dataclass(frozen=True)
+class PoolConfig:
+    """連線池設定（可用環境變數覆蓋）"""
+    max_connections: int = int(os.environ.get('SUPABASE_POOL_MAX_CONNECTIONS', 50))        # 每個主機最大連線數
+    max_keepalive_connections: int = int(os.environ.get('SUPABASE_POOL_MAX_KEEPALIVE', 20))  # 保持存活的閒置連線數
+    keepalive_expiry: float = float(os.environ.get('SUPABASE_POOL_KEEPALIVE_EXPIRY', 30))  # 閒置連線保留秒數
+    max_in_flight: int = int(os.environ.get('SUPABASE_POOL_MAX_IN_FLIGHT', 50))            # 同時進行中的請求上限
+    connect_timeout: float = 5.0   # 建立連線逾時
+    read_timeout: float = 15.0     # 讀取回應逾時
+    write_timeout: float = 15.0    # 送出請求逾時
+    pool_timeout: float = 5.0      # 等待可用連線逾時
+
+    def timeout(self) -> httpx.Timeout:
+        return httpx.Timeout(
+            connect=self.connect_timeout,
+            read=self.read_timeout,
+            write=self.write_timeout,
+            pool=self.pool_timeout
+        )
+
+    def limits(self) -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive_connections,
+            keepalive_expiry=self.keepalive_expiry
+        )
+
+class RequestMetrics:
+    """依操作（資料表 / RPC）統計的請求指標"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict] = {}
+        self.in_flight = 0
+
+    @staticmethod
+    def operation_name(request: httpx.Request) -> str:
+        """由請求路徑推導操作名稱，例如 GET tournaments / POST rpc:update_tournament_position"""
+        path = request.url.path
+        if '/rest/v1/' in path:
+            path = path.split('/rest/v1/', 1)[1]
+        path = path.strip('/')
+        if path.startswith('rpc/'):
+            path = f"rpc:{path[4:]}"
+        return f"{request.method} {path}"
+
+    def started(self):
+        with self._lock:
+            self.in_flight += 1
+
+    def finished(self, operation: str, elapsed_ms: float, error: bool):
+        with self._lock:
+            self.in_flight -= 1
+            stats = self._stats.setdefault(operation, {
+                'count': 0,
+                'errors': 0,
+                'total_ms': 0.0,
+                'max_ms': 0.0
+            })
+            stats['count'] += 1
+            stats['total_ms'] += elapsed_ms
+            stats['max_ms'] = max(stats['max_ms'], elapsed_ms)
+            if error:
+                stats['errors'] += 1
+
+    def snapshot(self) -> Dict:
+        """獲取統計快照"""
+        with self._lock:
+            operations = {}
+            for operation, stats in self._stats.items():
+                operations[operation] = {
+                    **stats,
+                    'avg_ms': stats['total_ms'] / stats['count'] if stats['count'] else 0.0
+                }
+            return {
+                'in_flight': self.in_flight,
+                'total_requests': sum(s['count'] for s in self._stats.values()),
+                'total_errors': sum(s['errors'] for s in self._stats.values()),
+                'operations': operations
+            }
+
+class PooledSession(SyncClient):
+    """共用傳輸層、限制併發並記錄指標的 PostgREST HTTP 會話"""
+
+    def __init__(self, *args, metrics: RequestMetrics, in_flight: threading.BoundedSemaphore,
+                 pool_timeout: float, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._metrics = metrics
+        self._in_flight = in_flight
+        self._pool_timeout = pool_timeout
+
+    def send(self, request: httpx.Request, **kwargs) -> httpx.Response:
+        if not self._in_flight.acquire(timeout=self._pool_timeout):
+            raise httpx.PoolTimeout(f"Supabase 併發請求已達上限，等待逾時 {self._pool_timeout}s", request=request)
+
+        operation = RequestMetrics.operation_name(request)
+        self._metrics.started()
+        start_time = time.time()
+        error = True
+        try:
+            response = super().send(request, **kwargs)
+            error = response.status_code >= 400
+            return response
+        finally:
+            self._in_flight.release()
+            self._metrics.finished(operation, (time.time() - start_time) * 1000, error)
+
+    def close(self):
+        # 傳輸層由連線池共用，不隨單一會話關閉
+        pass
+
+class PooledPostgrestClient(SyncPostgrestClient):
+    """使用共用連線池的 PostgREST 客戶端"""
+
+    def __init__(self, base_url: str, *, pool: 'SupabasePool', **kwargs):
+        self._pool = pool
+        super().__init__(base_url, **kwargs)
+
+    def create_session(self, base_url: str, headers: Dict[str, str], timeout) -> SyncClient:
+        return self._pool.create_session(base_url, headers)
+
+class PooledSupabaseClient(Client):
+    """PostgREST 請求走共用連線池的 Supabase 客戶端"""
+
+    def __init__(self, supabase_url: str, supabase_key: str, pool: 'SupabasePool',
+                 options: Optional[ClientOptions] = None):
+        self._pool = pool
+        super().__init__(supabase_url, supabase_key, options or ClientOptions())
+
+    def _init_postgrest_client(self, rest_url: str, headers: Dict[str, str], schema: str, timeout=None):
+        return PooledPostgrestClient(rest_url, pool=self._pool, headers=headers, schema=schema)
+
+class SupabasePool:
+    """單一 Supabase 專案的共用連線池"""
+
+    def __init__(self, config: Optional[PoolConfig] = None):
+        self.config = config or PoolConfig()
+        self.metrics = RequestMetrics()
+        self.transport = httpx.HTTPTransport(limits=self.config.limits(), retries=1)
+        self._in_flight = threading.BoundedSemaphore(self.config.max_in_flight)
+
+    def create_session(self, base_url: str, headers: Dict[str, str]) -> PooledSession:
+        return PooledSession(
+            base_url=base_url,
+            headers=headers,
+            timeout=self.config.timeout(),
+            transport=self.transport,
+            metrics=self.metrics,
+            in_flight=self._in_flight,
+            pool_timeout=self.config.pool_timeout
+        )
+
+    def close(self):
+        self.transport.close()
+
+# 全局連線池（每個 Supabase URL 一個，跨請求共用）
+_pools: Dict[str, SupabasePool] = {}
+_clients: Dict[Tuple[str, str], Client] = {}
+_pools_lock = threading.Lock()
+
+def get_pool(supabase_url: str, config: Optional[PoolConfig] = None) -> SupabasePool:
+    """獲取 Supabase 專案的共用連線池"""
+    with _pools_lock:
+        pool = _pools.get(supabase_url)
+        if pool is None:
+            pool = SupabasePool(config)
+            _pools[supabase_url] = pool
+            logger.info(f"🔗 Supabase 連線池建立: 最大連線 {pool.config.max_connections}, "
+                        f"keep-alive {pool.config.max_keepalive_connections}, 併發上限 {pool.config.max_in_flight}")
+        return pool
+
+def create_client(supabase_url: str, supabase_key: str, options: Optional[ClientOptions] = None) -> Client:
+    """建立（或重用）走共用連線池的 Supabase 客戶端"""
+    cache_key = (supabase_url, supabase_key)
+    with _pools_lock:
+        client = _clients.get(cache_key)
+    if client is not None and options is None:
+        return client
+
+    client = PooledSupabaseClient(supabase_url, supabase_key, get_pool(supabase_url), options)
+    if options is None:
+        with _pools_lock:
+            client = _clients.setdefault(cache_key, client)
+    return client
+
+def get_supabase_metrics() -> Dict:
+    """獲取所有連線池的請求指標"""
+    with _pools_lock:
+        pools = dict(_pools)
+    return {url: pool.metrics.snapshot() for url, pool in pools.items()}
@@ -0,0 +1,62 @@
+"""
+快取值編解碼單元測試
+版本位元組、壓縮門檻與舊版 JSON 文字相容
+"""
+
+import json
+
+import pytest
+
+import cache_codec
+
+SAMPLE = {'symbol': '2330.TW', 'name': '台積電', 'current_price': 600.5, 'volume': 12345, 'tags': ['半導體', None]}
+
+@pytest.mark.parametrize('codec, fmt', [('json', cache_codec.FORMAT_JSON), ('msgpack', cache_codec.FORMAT_MSGPACK)])
+def test_round_trip_with_version_byte(codec, fmt):
+    """新格式以版本位元組開頭，解碼回原始值"""
+    if codec == 'msgpack':
+        pytest.importorskip('msgpack')
+    encoded = cache_codec.encode(SAMPLE, codec)
+    assert encoded[0] == fmt
+    assert cache_codec.decode(encoded) == SAMPLE
+
+def test_legacy_json_text_is_decoded():
+    """舊版 worker 寫入的純 JSON（bytes 或 str）仍可解碼"""
+    legacy = json.dumps(SAMPLE, ensure_ascii=False)
+    assert cache_codec.decode(legacy) == SAMPLE
+    assert cache_codec.decode(legacy.encode('utf-8')) == SAMPLE
+
+def test_legacy_codec_writes_plain_json():
+    """legacy 寫入格式沒有版本位元組，舊版 worker 可直接 json.loads"""
+    encoded = cache_codec.encode(SAMPLE, 'legacy')
+    assert json.loads(encoded) == SAMPLE
+
+@pytest.mark.parametrize('codec', ['json', 'msgpack'])
+def test_large_values_are_compressed(codec, monkeypatch):
+    """超過壓縮門檻的值以 zstd 壓縮並設定壓縮旗標"""
+    pytest.importorskip('zstandard')
+    if codec == 'msgpack':
+        pytest.importorskip('msgpack')
+    monkeypatch.setattr(cache_codec, 'COMPRESS_THRESHOLD', 64)
+    value = [SAMPLE] * 50
+
+    encoded = cache_codec.encode(value, codec)
+    assert encoded[0] & cache_codec.FLAG_ZSTD
+    assert len(encoded) < len(cache_codec.encode(value, 'legacy'))
+    assert cache_codec.decode(encoded) == value
+
+def test_small_values_are_not_compressed():
+    """門檻以下不壓縮"""
+    encoded = cache_codec.encode({'a': 1}, 'json')
+    assert not encoded[0] & cache_codec.FLAG_ZSTD
+
+def test_empty_and_missing_values():
+    """未命中（None）與空值解碼為 None"""
+    assert cache_codec.decode(None) is None
+    assert cache_codec.decode(b'') is None
+
+def test_decode_text():
+    """純文字值不經 JSON 解析"""
+    assert cache_codec.decode_text(b'active') == 'active'
+    assert cache_codec.decode_text('active') == 'active'
+    assert cache_codec.decode_text(None) is None
@@ -0,0 +1,52 @@
+"""
+投影式資料存取單元測試
+紀錄欄位與 tournament_schema.sql 一致、數值欄位轉型
+"""
+
+import os
+import re
+from unittest.mock import MagicMock
+
+import pytest
+
+from data_access import (
+    TournamentEntryRecord, TournamentListingRecord, TournamentTradeRecord, decode_records, select_records
+)
+
+SCHEMA_PATH = os.path.join(os.path.dirname(__file__), 'tournament_schema.sql')
+
+def schema_columns(table: str):
+    """從 tournament_schema.sql 解析資料表欄位"""
+    with open(SCHEMA_PATH, encoding='utf-8') as schema:
+        sql = schema.read()
+    body = re.search(rf'CREATE TABLE {table} \((.*?)\n\)', sql, re.S).group(1)
+    columns = set()
+    for line in body.splitlines():
+        match = re.match(r'\s+([a-z_]+)\s', line)
+        if match and match.group(1) not in ('primary', 'unique', 'constraint'):
+            columns.add(match.group(1))
+    return columns
+
+@pytest.mark.parametrize('record_cls', [TournamentListingRecord, TournamentEntryRecord, TournamentTradeRecord])
+def test_projection_matches_schema(record_cls):
+    """投影欄位都存在於資料表（不存在的欄位會讓 PostgREST 回傳 400）"""
+    projected = {column.strip() for column in record_cls.COLUMNS.split(',')}
+    assert projected <= schema_columns(record_cls.TABLE)
+
+def test_select_records_uses_projection():
+    supabase = MagicMock()
+    select_records(supabase, TournamentEntryRecord)
+    supabase.table.assert_called_once_with('tournaments')
+    supabase.table.return_value.select.assert_called_once_with('id, name, entry_capital')
+
+def test_numeric_columns_are_converted():
+    """numeric 欄位（PostgREST 可能回傳字串）轉為 float / int，None 保持為 None"""
+    listing, = decode_records([{
+        'id': 't1', 'name': '月賽', 'entry_capital': '1000000.00',
+        'current_participants': 12, 'max_participants': None
+    }], TournamentListingRecord)
+    assert listing.entry_capital == 1000000.0
+    assert listing.current_participants == 12
+    assert listing.max_participants is None
+    assert listing.starts_at is None
+    assert not hasattr(listing, '__dict__')
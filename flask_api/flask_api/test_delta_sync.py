@@ -0,0 +1,82 @@
+"""
+差異同步單元測試
+完整內容、差異、未變動與版本號落後過多時的回應
+"""
+
+import pytest
+
+from delta_sync import DeltaTracker
+
+def rows_of(*pairs):
+    return [{'user_id': user_id, 'total_assets': assets} for user_id, assets in pairs]
+
+@pytest.fixture
+def tracker():
+    return DeltaTracker(history=4)
+
+def test_first_request_is_full(tracker):
+    """沒有帶版本號時回傳完整內容"""
+    rows = rows_of(('a', 100), ('b', 200))
+    result = tracker.diff('leaderboard:t1', rows, 'user_id')
+    assert result.full
+    assert result.version == 1
+    assert result.rows == rows
+
+def test_unchanged_is_not_modified(tracker):
+    """內容未變動時不遞增版本號"""
+    rows = rows_of(('a', 100), ('b', 200))
+    version = tracker.diff('leaderboard:t1', rows, 'user_id').version
+
+    result = tracker.diff('leaderboard:t1', rows, 'user_id', since=version)
+    assert result.version == version
+    assert result.not_modified
+
+def test_delta_contains_changed_and_removed_rows(tracker):
+    """只回傳變動的列與被移除的鍵值"""
+    version = tracker.diff('leaderboard:t1', rows_of(('a', 100), ('b', 200), ('c', 300)), 'user_id').version
+
+    result = tracker.diff('leaderboard:t1', rows_of(('a', 150), ('c', 300), ('d', 50)), 'user_id', since=version)
+    assert not result.full
+    assert result.version == version + 1
+    assert sorted(row['user_id'] for row in result.rows) == ['a', 'd']
+    assert result.removed == ['b']
+
+def test_delta_merges_several_versions(tracker):
+    """跨多個版本的差異合併回傳"""
+    version = tracker.diff('r', rows_of(('a', 1), ('b', 1)), 'user_id').version
+    tracker.diff('r', rows_of(('a', 2), ('b', 1)), 'user_id')
+    tracker.diff('r', rows_of(('a', 2), ('b', 2)), 'user_id')
+
+    result = tracker.diff('r', rows_of(('a', 2), ('b', 2)), 'user_id', since=version)
+    assert result.version == version + 2
+    assert sorted(row['user_id'] for row in result.rows) == ['a', 'b']
+
+def test_summary_change_is_reported(tracker):
+    """摘要欄位變動時遞增版本號並標示 summary_changed"""
+    rows = rows_of(('a', 1))
+    version = tracker.diff('r', rows, 'user_id', summary={'participants': 1}).version
+
+    result = tracker.diff('r', rows, 'user_id', since=version, summary={'participants': 2})
+    assert result.summary_changed
+    assert result.rows == [] and result.removed == []
+
+@pytest.mark.parametrize('since', [0, 99])
+def test_stale_or_unknown_version_is_full(tracker, since):
+    """版本號超出環形緩衝或大於目前版本時回傳完整內容"""
+    for assets in range(6):
+        tracker.diff('r', rows_of(('a', assets)), 'user_id')
+
+    result = tracker.diff('r', rows_of(('a', 5)), 'user_id', since=since)
+    assert result.full
+
+def test_redis_backend_matches_local():
+    """Redis 實作與行程內實作結果一致"""
+    fakeredis = pytest.importorskip('fakeredis')
+    tracker = DeltaTracker(fakeredis.FakeRedis(), history=4)
+
+    version = tracker.diff('r', rows_of(('a', 1), ('b', 1)), 'user_id').version
+    result = tracker.diff('r', rows_of(('a', 2)), 'user_id', since=version)
+    assert result.version == version + 1
+    assert [row['user_id'] for row in result.rows] == ['a']
+    assert result.removed == ['b']
+    assert tracker.diff('r', rows_of(('a', 2)), 'user_id', since=result.version).not_modified
@@ -0,0 +1,70 @@
+"""
+交易費用引擎單元測試
+單筆與整批計算結果一致、最低手續費與當沖減半
+"""
+
+import pytest
+
+from fee_engine import FeeEngine, MarketFeeSchedule, market_for_symbol
+
+@pytest.fixture
+def engine():
+    return FeeEngine()
+
+def test_taiwan_regular_trade(engine):
+    """台股一般交易：手續費 0.1425%、交易稅 0.3%"""
+    fees = engine.compute_one(100000, 'TW')
+    assert fees['brokerage_fee'] == pytest.approx(142.5)
+    assert fees['securities_tax'] == pytest.approx(300)
+    assert fees['total_cost'] == pytest.approx(442.5)
+
+def test_taiwan_min_fee_and_day_trade_tax(engine):
+    """小額交易套用最低手續費，當沖交易稅減半"""
+    fees = engine.compute_one(1000, 'TW', is_day_trading=True)
+    assert fees['brokerage_fee'] == pytest.approx(20)
+    assert fees['securities_tax'] == pytest.approx(1.5)
+
+def test_us_trade_has_no_tax(engine):
+    """美股只收手續費，沒有最低手續費與交易稅"""
+    fees = engine.compute_one(1000, 'US')
+    assert fees['brokerage_fee'] == pytest.approx(1.425)
+    assert fees['securities_tax'] == 0
+
+def test_batch_matches_single(engine):
+    """整批計算（混合市場與當沖旗標）與逐筆計算結果相同"""
+    amounts = [100000, 1000, 5000, 250000]
+    markets = ['TW', 'TW', 'US', 'TW']
+    day_trading = [False, True, False, True]
+
+    rows = engine.compute(amounts, markets, day_trading).rows()
+    expected = [engine.compute_one(*args) for args in zip(amounts, markets, day_trading)]
+    for row, single in zip(rows, expected):
+        assert row == pytest.approx(single)
+
+def test_batch_with_single_market(engine):
+    """市場參數可為單一字串"""
+    breakdown = engine.compute([1000, 100000], 'TW')
+    assert breakdown.brokerage_fee.tolist() == pytest.approx([20, 142.5])
+
+def test_unknown_market_is_rejected(engine):
+    """未設定費率的市場拋出 ValueError"""
+    with pytest.raises(ValueError):
+        engine.compute_one(1000, 'HK')
+    with pytest.raises(ValueError):
+        engine.compute([1000, 1000], ['TW', 'HK'])
+    with pytest.raises(ValueError):
+        engine.compute([1000, 1000], ['TW'])
+
+def test_register_overrides_schedule(engine):
+    """註冊同市場費率表會覆蓋原設定"""
+    engine.register(MarketFeeSchedule(market='US', brokerage_rate=0.001, min_fee=1.0))
+    assert engine.compute_one(100, 'US')['brokerage_fee'] == pytest.approx(1.0)
+    assert engine.compute([100], 'US').brokerage_fee[0] == pytest.approx(1.0)
+
+@pytest.mark.parametrize('symbol, market', [
+    ('2330.TW', 'TW'),
+    ('6488.two', 'TW'),
+    ('AAPL', 'US'),
+])
+def test_market_for_symbol(symbol, market):
+    assert market_for_symbol(symbol) == market
@@ -0,0 +1,88 @@
+"""
+條件式 GET 單元測試
+ETag 相符回傳 304、版本號遞增與定期重新驗證
+"""
+
+import pytest
+from flask import Flask, jsonify
+
+import http_cache as http_cache_module
+from http_cache import HttpCache
+
+@pytest.fixture
+def cache():
+    return HttpCache()
+
+@pytest.fixture
+def client(cache):
+    app = Flask(__name__)
+    calls = []
+
+    @app.route('/api/items')
+    @cache.conditional(['items'], max_age=5, s_maxage=30)
+    def items():
+        calls.append(1)
+        return jsonify({'count': len(calls)})
+
+    @app.route('/api/quote')
+    @cache.conditional(['quote'], revalidate_every=10)
+    def quote():
+        return jsonify({'price': 600})
+
+    @app.route('/api/missing')
+    @cache.conditional(['items'])
+    def missing():
+        return jsonify({'error': 'not found'}), 404
+
+    app.calls = calls
+    return app.test_client()
+
+def test_if_none_match_returns_304(client):
+    """相同版本號帶 If-None-Match 時回傳 304，不執行端點"""
+    first = client.get('/api/items')
+    assert first.status_code == 200
+    assert first.headers['Cache-Control'] == 'public, max-age=5, s-maxage=30'
+    etag = first.headers['ETag']
+
+    second = client.get('/api/items', headers={'If-None-Match': etag})
+    assert second.status_code == 304
+    assert second.data == b''
+    assert len(client.application.calls) == 1
+
+def test_bump_changes_etag(client, cache):
+    """資料變動遞增版本號後 ETag 改變"""
+    etag = client.get('/api/items').headers['ETag']
+    cache.bump(['items'])
+
+    response = client.get('/api/items', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+
+def test_query_string_is_part_of_etag(client):
+    """不同查詢參數的 ETag 不同"""
+    assert client.get('/api/items?page=1').headers['ETag'] != client.get('/api/items?page=2').headers['ETag']
+
+def test_revalidate_every_rotates_etag(client, monkeypatch):
+    """未遞增版本號的資料每隔 revalidate_every 秒產生新 ETag"""
+    now = [1000.0]
+    monkeypatch.setattr(http_cache_module.time, 'time', lambda: now[0])
+
+    etag = client.get('/api/quote').headers['ETag']
+    now[0] += 5
+    assert client.get('/api/quote', headers={'If-None-Match': etag}).status_code == 304
+    now[0] += 10
+    assert client.get('/api/quote', headers={'If-None-Match': etag}).status_code == 200
+
+def test_error_response_is_not_cached(client):
+    """非 200 回應不加 ETag"""
+    response = client.get('/api/missing')
+    assert response.status_code == 404
+    assert 'ETag' not in response.headers
+
+def test_versions_with_redis():
+    """Redis 版本號一次讀取多個範圍"""
+    fakeredis = pytest.importorskip('fakeredis')
+    cache = HttpCache(fakeredis.FakeRedis())
+    cache.bump(['a', 'b'])
+    cache.bump(['a'])
+    assert cache.versions(['a', 'b', 'c']) == [2, 1, 0]
@@ -0,0 +1,96 @@
+"""
+鍵集分頁單元測試
+游標編解碼、格式驗證與逐頁讀取不重複不遺漏
+"""
+
+import base64
+import re
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+from keyset_pagination import (
+    DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, InvalidCursor, decode_cursor, encode_cursor, fetch_page, page_size
+)
+
+CURSOR_FILTER = re.compile(r'\(executed_at\.lt\."([^"]+)",and\(executed_at\.eq\."([^"]+)",id\.lt\."([^"]+)"\)\)')
+
+class FakeQuery:
+    """以記憶體資料模擬 PostgREST 查詢（只解析 fetch_page 會加入的參數）"""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.params = httpx.QueryParams()
+        self._limit = None
+
+    def limit(self, size):
+        self._limit = size
+        return self
+
+    def execute(self):
+        assert list(self.params.keys()).count('order') == 1
+        rows = sorted(self.rows, key=lambda row: (row['executed_at'], row['id']), reverse=True)
+        condition = self.params.get('or')
+        if condition:
+            match = CURSOR_FILTER.fullmatch(condition)
+            assert match and match.group(1) == match.group(2)
+            executed_at, row_id = match.group(1), match.group(3)
+            rows = [row for row in rows if (row['executed_at'], row['id']) < (executed_at, row_id)]
+        return SimpleNamespace(data=rows[:self._limit])
+
+def test_cursor_round_trip():
+    """游標為 URL 安全字串，解碼回 (時間, id)"""
+    row = {'executed_at': '2026-10-19T09:30:00.123+00:00', 'id': '6f1c2a9e-1b2c-4d5e-8f90-1234567890ab'}
+    cursor = encode_cursor(row)
+    assert '=' not in cursor and '/' not in cursor and '+' not in cursor
+    assert decode_cursor(cursor) == (row['executed_at'], row['id'])
+
+@pytest.mark.parametrize('cursor', [
+    'not base64!',
+    encode_cursor({'executed_at': '2026-10-19', 'id': '1'})[:-2] + '$$',
+    # 缺少分隔符號
+    base64.urlsafe_b64encode(b'2026-10-19').decode('ascii'),
+    # 夾帶 PostgREST 篩選語法
+    encode_cursor({'executed_at': '2026-10-19",id.gt."0', 'id': '1'}),
+    encode_cursor({'executed_at': '2026-10-19', 'id': '1),or(id.gt.0'}),
+])
+def test_invalid_cursor_is_rejected(cursor):
+    """格式不符或含特殊字元的游標拒絕"""
+    with pytest.raises(InvalidCursor):
+        decode_cursor(cursor)
+
+def test_page_size_bounds():
+    """每頁筆數預設值與上下限"""
+    assert page_size(None) == DEFAULT_PAGE_SIZE
+    assert page_size('') == DEFAULT_PAGE_SIZE
+    assert page_size('0') == 1
+    assert page_size('20') == 20
+    assert page_size(str(MAX_PAGE_SIZE * 10)) == MAX_PAGE_SIZE
+
+def test_fetch_page_walks_all_rows_once():
+    """同時間的多筆成交依 id 排序，逐頁讀取不重複不遺漏"""
+    rows = [
+        {'executed_at': f"2026-10-19T09:{minute:02d}:00", 'id': f"{index:04d}"}
+        for index, minute in enumerate([1, 1, 1, 2, 2, 3, 3, 3, 3, 4, 5, 5])
+    ]
+
+    seen, cursor, pages = [], None, 0
+    while True:
+        page, cursor = fetch_page(FakeQuery(rows), 5, cursor)
+        seen.extend(row['id'] for row in page)
+        pages += 1
+        if cursor is None:
+            break
+
+    assert pages == 3
+    assert len(seen) == len(set(seen)) == len(rows)
+    expected = sorted(rows, key=lambda row: (row['executed_at'], row['id']), reverse=True)
+    assert seen == [row['id'] for row in expected]
+
+def test_fetch_page_without_next_page():
+    """剛好一頁時不回傳下一頁游標"""
+    rows = [{'executed_at': '2026-10-19T09:00:00', 'id': str(index)} for index in range(5)]
+    page, cursor = fetch_page(FakeQuery(rows), 5)
+    assert len(page) == 5
+    assert cursor is None
@@ -0,0 +1,110 @@
+"""
+錦標賽即時排行榜單元測試
+載入與增量更新，以及載入與進行中交易互斥（載入不覆蓋成交、不遺漏成交）
+"""
+
+import threading
+import time
+
+import pytest
+
+from leaderboard import RealtimeLeaderboard
+
+INITIAL_BALANCE = 100000.0
+
+PORTFOLIOS = [
+    {'user_id': 'u1', 'cash_balance': 50000.0},
+    {'user_id': 'u2', 'cash_balance': 95000.0}
+]
+POSITIONS = [
+    {'user_id': 'u1', 'symbol': '2330', 'qty': 100, 'avg_cost': 500.0},
+    {'user_id': 'u2', 'symbol': '2330', 'qty': 20, 'avg_cost': 500.0}
+]
+
+@pytest.fixture(params=['local', 'redis'])
+def board(request):
+    if request.param == 'redis':
+        fakeredis = pytest.importorskip('fakeredis')
+        return RealtimeLeaderboard(fakeredis.FakeRedis(), initial_balance=INITIAL_BALANCE,
+                                   trade_lease=2.0, seed_timeout=2.0)
+    return RealtimeLeaderboard(initial_balance=INITIAL_BALANCE, trade_lease=2.0, seed_timeout=2.0)
+
+def test_seed_and_record_trade(board):
+    """載入後依交易價差增量調整總資產"""
+    board.seed('t1', PORTFOLIOS, POSITIONS)
+    assert [entry['user_id'] for entry in board.top('t1')] == ['u2', 'u1']
+
+    # 以 490 買入 10 股，市價 500：總資產 +100
+    board.record_trade('t1', 'u1', '2330', 'buy', 10, 490.0)
+    assert board.rank('t1', 'u1')['total_assets'] == pytest.approx(100100.0)
+
+def test_ensure_seeded_loads_once(board):
+    """已載入時不再呼叫 loader"""
+    calls = []
+
+    def loader():
+        calls.append(1)
+        return PORTFOLIOS, POSITIONS
+
+    assert board.ensure_seeded('t1', loader)
+    assert not board.ensure_seeded('t1', loader)
+    assert len(calls) == 1
+
+def test_seeding_waits_for_inflight_trade(board):
+    """載入者等進行中的交易完成才讀取數據庫"""
+    loaded = threading.Event()
+
+    def loader():
+        loaded.set()
+        return PORTFOLIOS, POSITIONS
+
+    board.begin_trade('t1', 'trade-1')
+    seeder = threading.Thread(target=board.ensure_seeded, args=('t1', loader))
+    seeder.start()
+
+    assert not loaded.wait(0.2)
+    board.end_trade('t1', 'trade-1')
+    assert loaded.wait(1.0)
+    seeder.join(1.0)
+    assert board.is_seeded('t1')
+
+def test_trade_during_seeding_applies_after_load(board):
+    """載入期間開始的交易等待載入完成，成交不被載入覆蓋"""
+    loading = threading.Event()
+    release = threading.Event()
+    traded = threading.Event()
+
+    def loader():
+        loading.set()
+        release.wait(1.0)
+        # 交易尚未寫入數據庫，載入結果不含此筆成交
+        return PORTFOLIOS, POSITIONS
+
+    def trade():
+        board.begin_trade('t1', 'trade-1')
+        board.record_trade('t1', 'u1', '2330', 'buy', 10, 490.0, prior_total_assets=INITIAL_BALANCE)
+        board.end_trade('t1', 'trade-1')
+        traded.set()
+
+    seeder = threading.Thread(target=board.ensure_seeded, args=('t1', loader))
+    seeder.start()
+    assert loading.wait(1.0)
+
+    trader = threading.Thread(target=trade)
+    trader.start()
+    assert not traded.wait(0.2)
+
+    release.set()
+    seeder.join(1.0)
+    trader.join(1.0)
+    assert traded.is_set()
+    assert board.rank('t1', 'u1')['total_assets'] == pytest.approx(100100.0)
+
+def test_expired_inflight_trade_does_not_block_seeding(board):
+    """未解除的登記在租約到期後不再阻擋載入"""
+    board.trade_lease = 0.1
+    board.begin_trade('t1', 'crashed')
+
+    started = time.time()
+    assert board.ensure_seeded('t1', lambda: (PORTFOLIOS, POSITIONS))
+    assert time.time() - started < 1.0
@@ -0,0 +1,75 @@
+"""
+公平交易鎖單元測試
+FIFO 取得順序、只有擁有者可釋放、逾時與租約到期
+"""
+
+import threading
+import time
+
+import pytest
+
+from lock_manager import LockManager, LockTimeout
+
+@pytest.fixture(params=['local', 'redis'])
+def manager(request):
+    if request.param == 'redis':
+        fakeredis = pytest.importorskip('fakeredis')
+        return LockManager(fakeredis.FakeRedis(), wait_timeout=2.0)
+    return LockManager(wait_timeout=2.0)
+
+def test_waiters_acquire_in_fifo_order(manager):
+    """等待者依排隊順序取得鎖"""
+    order = []
+    holder = manager.lock('trade_lock:a')
+
+    def worker(index):
+        with manager.lock('trade_lock:a'):
+            order.append(index)
+
+    threads = []
+    for index in range(5):
+        thread = threading.Thread(target=worker, args=(index,))
+        thread.start()
+        threads.append(thread)
+        # 確保依序進入等待佇列
+        time.sleep(0.05)
+
+    holder.release()
+    for thread in threads:
+        thread.join(5)
+    assert order == list(range(5))
+
+def test_only_owner_can_release(manager):
+    """過期的擁有者不能釋放新擁有者的鎖"""
+    first = manager.acquire('trade_lock:b', lease_ttl=0.1)
+    time.sleep(0.15)
+    second = manager.acquire('trade_lock:b', wait_timeout=0.5)
+    assert second is not None
+
+    assert not first.release()
+    assert not first.extend()
+    assert second.extend(5)
+    assert second.release()
+
+def test_timeout(manager):
+    """鎖被持有時逾時回傳 None（lock 拋出 LockTimeout）"""
+    holder = manager.acquire('trade_lock:c')
+    assert manager.acquire('trade_lock:c', wait_timeout=0.05) is None
+    with pytest.raises(LockTimeout):
+        manager.lock('trade_lock:c', wait_timeout=0.05)
+
+    holder.release()
+    assert manager.acquire('trade_lock:c', wait_timeout=0.05) is not None
+
+def test_timed_out_waiter_does_not_block_queue(manager):
+    """逾時離開的等待者不會卡住後面的等待者"""
+    holder = manager.acquire('trade_lock:d')
+    assert manager.acquire('trade_lock:d', wait_timeout=0.05) is None
+
+    acquired = []
+    thread = threading.Thread(target=lambda: acquired.append(manager.acquire('trade_lock:d', wait_timeout=2.0)))
+    thread.start()
+    time.sleep(0.05)
+    holder.release()
+    thread.join(5)
+    assert acquired and acquired[0] is not None
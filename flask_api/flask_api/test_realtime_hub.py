@@ -0,0 +1,61 @@
+"""
+即時推播中心單元測試
+主題分派、慢速客戶端丟棄舊事件，以及閒置頻道不中斷訂閱
+"""
+
+import threading
+
+import pytest
+
+from realtime_hub import RealtimeHub, quote_topic
+from redis_cache import listen_pubsub
+
+class IdlePubSub:
+    """前幾次輪詢沒有訊息（頻道閒置），之後回傳一筆訊息"""
+
+    def __init__(self, idle_polls, stop):
+        self.idle_polls = idle_polls
+        self.stop = stop
+        self.polls = 0
+
+    def get_message(self, ignore_subscribe_messages=False, timeout=0.0):
+        self.polls += 1
+        if self.polls <= self.idle_polls:
+            return None
+        self.stop.set()
+        return {'type': 'message', 'data': b'2330.TW'}
+
+def test_listen_pubsub_survives_idle_polls():
+    """輪詢逾時只代表沒有訊息，不結束訂閱"""
+    stop = threading.Event()
+    pubsub = IdlePubSub(idle_polls=5, stop=stop)
+    assert list(listen_pubsub(pubsub, stop)) == [{'type': 'message', 'data': b'2330.TW'}]
+    assert pubsub.polls == 6
+
+def test_local_dispatch_by_topic():
+    """Redis 未連線時只分派給訂閱該主題的連線"""
+    hub = RealtimeHub()
+    with hub.subscribe([quote_topic('2330.TW')]) as tsmc, hub.subscribe([quote_topic('2317.TW')]) as foxconn:
+        hub.publish(quote_topic('2330.TW'), 'quote', {'price': 600})
+        assert tsmc.get(0.1) == (quote_topic('2330.TW'), 'quote', {'price': 600})
+        assert foxconn.get(0.01) is None
+    assert hub.metrics()['connections'] == 0
+
+def test_slow_client_drops_oldest_events():
+    """佇列滿時丟棄最舊的事件"""
+    hub = RealtimeHub(max_queue=2)
+    with hub.subscribe(['t']) as subscription:
+        for index in range(3):
+            hub.publish('t', 'tick', {'index': index})
+        assert [subscription.get(0.01)[2]['index'] for _ in range(2)] == [1, 2]
+        assert subscription.dropped == 1
+
+def test_redis_listener_dispatches_across_idle_gap():
+    """經 Redis pub/sub 分派：閒置超過輪詢逾時後發佈的事件仍會送達"""
+    fakeredis = pytest.importorskip('fakeredis')
+    hub = RealtimeHub(fakeredis.FakeRedis())
+    with hub.subscribe([quote_topic('2330.TW')]) as subscription:
+        # 等待訂閱執行緒完成訂閱並經過一次以上的閒置輪詢
+        assert subscription.get(1.5) is None
+        hub.publish(quote_topic('2330.TW'), 'quote', {'price': 600})
+        assert subscription.get(2) == (quote_topic('2330.TW'), 'quote', {'price': 600})
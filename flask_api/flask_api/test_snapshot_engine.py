@@ -0,0 +1,181 @@
+"""
+錦標賽快照績效引擎單元測試
+增量累積狀態（報酬、回撤、夏普值）、批量寫入與排行榜績效欄位
+"""
+
+import math
+from datetime import date, datetime
+from unittest.mock import MagicMock
+
+import pytest
+
+from snapshot_engine import ParticipantState, SnapshotEngine, value_accounts
+
+INITIAL_BALANCE = 1000000.0
+
+def valuation(total_assets):
+    return {'cash_balance': total_assets, 'equity_value': 0.0}
+
+@pytest.fixture
+def supabase():
+    return MagicMock()
+
+@pytest.fixture
+def engine(supabase):
+    return SnapshotEngine(supabase, initial_balance=INITIAL_BALANCE)
+
+def test_value_accounts():
+    """持股以股價計值，沒有股價時以平均成本計值"""
+    portfolios = [{'user_id': 'a', 'cash_balance': '1000'}, {'user_id': 'b', 'cash_balance': 500}]
+    positions = [
+        {'user_id': 'a', 'symbol': '2330.TW', 'qty': 10, 'avg_cost': 500},
+        {'user_id': 'a', 'symbol': '2317.TW', 'qty': 5, 'avg_cost': 100},
+        {'user_id': 'x', 'symbol': '2330.TW', 'qty': 1, 'avg_cost': 500},
+    ]
+    valuations = value_accounts(portfolios, positions, {'2330.TW': 600})
+    assert valuations == {
+        'a': {'cash_balance': 1000.0, 'equity_value': 6500.0},
+        'b': {'cash_balance': 500.0, 'equity_value': 0.0},
+    }
+
+def test_participant_state_matches_full_recomputation():
+    """逐日增量更新的結果與以完整歷史重新計算相同"""
+    closes = [1010000, 990000, 1030000, 1000000, 1050000]
+    state = ParticipantState()
+    for day, total_assets in enumerate(closes, start=1):
+        state.observe(f"2026-10-{day:02d}", total_assets, INITIAL_BALANCE)
+    state.commit_day()
+
+    previous = [INITIAL_BALANCE] + closes[:-1]
+    returns = [close / prev - 1 for close, prev in zip(closes, previous)]
+    mean = sum(returns) / len(returns)
+    variance = sum((r - mean) ** 2 for r in returns) / (len(returns) - 1)
+
+    assert state.days == len(closes)
+    assert state.cum_factor == pytest.approx(closes[-1] / INITIAL_BALANCE)
+    assert state.mean == pytest.approx(mean)
+    assert state.m2 / (state.days - 1) == pytest.approx(variance)
+    assert state.wins == sum(1 for r in returns if r > 0)
+    # 最大回撤：1030000 → 1000000
+    assert state.max_dd == pytest.approx(1 - 1000000 / 1030000)
+
+def test_intraday_observations_update_drawdown_only_once_per_day():
+    """盤中多次觀測只在換日時結算一次，回撤包含盤中低點"""
+    state = ParticipantState()
+    state.observe('2026-10-01', 1000000, INITIAL_BALANCE)
+    state.observe('2026-10-01', 900000, INITIAL_BALANCE)
+    state.observe('2026-10-01', 1050000, INITIAL_BALANCE)
+    assert state.days == 0
+    assert state.max_dd == pytest.approx(0.1)
+
+    state.observe('2026-10-02', 1050000, INITIAL_BALANCE)
+    assert state.days == 1
+    assert state.cum_factor == pytest.approx(1.05)
+
+def test_compute_rows(engine):
+    """快照列包含現金、持股、總資產與績效欄位"""
+    rows = engine.compute('t1', {'a': {'cash_balance': 400000, 'equity_value': 700000}},
+                          date(2026, 10, 1), states={}, trade_counts={'a': 3})
+    assert rows == [{
+        'tournament_id': 't1',
+        'user_id': 'a',
+        'as_of_date': '2026-10-01',
+        'cash_balance': 400000.0,
+        'equity_value': 700000.0,
+        'total_assets': 1100000.0,
+        'daily_return': 0.1,
+        'twr_return': 0.1,
+        'max_dd': 0.0,
+        'sharpe_ratio': 0.0,
+        'win_rate': 1.0,
+        'total_trades': 3
+    }]
+
+def test_take_snapshot_batches_and_is_idempotent(engine, supabase):
+    """一次 upsert 寫入整場快照，同日重跑不重複累計"""
+    engine.record_trade('t1', 'a')
+    engine.record_trade('t1', 'a')
+    valuations = {'a': valuation(1050000), 'b': valuation(980000)}
+
+    rows = engine.take_snapshot('t1', valuations, date(2026, 10, 1))
+    assert len(rows) == 2
+    supabase.table.assert_called_once_with('tournament_snapshots')
+    upsert = supabase.table.return_value.upsert
+    upsert.assert_called_once()
+    assert upsert.call_args.kwargs['on_conflict'] == 'tournament_id,user_id,as_of_date'
+
+    # 已計入的交易筆數扣除後，重跑同一天結果相同
+    again = engine.take_snapshot('t1', valuations, date(2026, 10, 1))
+    assert again == rows
+    assert {row['user_id']: row['total_trades'] for row in again} == {'a': 2, 'b': 0}
+
+def test_failed_upsert_keeps_state(engine, supabase):
+    """寫入失敗時不保存狀態，也不扣除交易筆數"""
+    engine.record_trade('t1', 'a')
+    supabase.table.return_value.upsert.return_value.execute.side_effect = RuntimeError('timeout')
+
+    with pytest.raises(RuntimeError):
+        engine.take_snapshot('t1', {'a': valuation(1050000)}, date(2026, 10, 1))
+    assert engine._load_states('t1') == {}
+    assert engine._read_trade_counts('t1') == {'a': 1}
+
+def test_intraday_snapshot_uses_snapshot_at(engine, supabase):
+    """盤中快照以 snapshot_at 為衝突鍵值並記錄更新時間"""
+    snapshot_at = datetime(2026, 10, 1, 10, 30)
+    rows = engine.take_snapshot('t1', {'a': valuation(1010000)}, date(2026, 10, 1),
+                                table='tournament_snapshots_intraday', snapshot_at=snapshot_at)
+    assert rows[0]['snapshot_at'] == snapshot_at.isoformat()
+    upsert = supabase.table.return_value.upsert
+    assert upsert.call_args.kwargs['on_conflict'] == 'tournament_id,user_id,snapshot_at'
+    assert engine._load_states('t1')['a'].updated_at == snapshot_at.isoformat()
+
+def test_performance_fields(engine):
+    """排行榜列以累積狀態加上即時總資產計算績效，沒有狀態的用戶以初始資金計算"""
+    engine.take_snapshot('t1', {'a': valuation(1050000)}, date(2026, 10, 1))
+
+    # 快照 +5% 後即時總資產再上漲，同一交易日的報酬以初始資金計算；不足兩個交易日夏普值為 0
+    entries = [{'user_id': 'a', 'total_assets': 1100000}, {'user_id': 'b', 'total_assets': 1020000}]
+    engine.performance('t1', entries)
+
+    assert entries[0]['twr_return'] == pytest.approx(0.1)
+    assert entries[0]['max_drawdown'] == 0.0
+    assert entries[0]['sharpe_ratio'] == 0.0
+    assert entries[0]['updated_at'] == '2026-10-01'
+    assert entries[1] == {
+        'user_id': 'b', 'total_assets': 1020000,
+        'twr_return': 0.02, 'max_drawdown': 0.0, 'sharpe_ratio': 0.0, 'updated_at': None
+    }
+
+    # 次日盤中回落：累計報酬與回撤以前一日收盤為基準
+    engine.take_snapshot('t1', {'a': valuation(1050000)}, date(2026, 10, 2),
+                         table='tournament_snapshots_intraday', snapshot_at=datetime(2026, 10, 2, 10))
+    entries = [{'user_id': 'a', 'total_assets': 997500}]
+    engine.performance('t1', entries)
+    assert entries[0]['twr_return'] == pytest.approx(-0.0025)
+    assert entries[0]['max_drawdown'] == pytest.approx(0.05)
+    assert entries[0]['updated_at'] == '2026-10-02T10:00:00'
+
+def test_sharpe_ratio_is_annualized(engine):
+    """夏普值為日報酬平均 / 標準差 × √252"""
+    closes = [1010000, 1000000, 1020000]
+    for day, total_assets in enumerate(closes, start=1):
+        rows = engine.take_snapshot('t1', {'a': valuation(total_assets)}, date(2026, 10, day))
+
+    previous = [INITIAL_BALANCE] + closes[:-1]
+    returns = [close / prev - 1 for close, prev in zip(closes, previous)]
+    mean = sum(returns) / len(returns)
+    std = math.sqrt(sum((r - mean) ** 2 for r in returns) / (len(returns) - 1))
+    assert rows[0]['sharpe_ratio'] == pytest.approx(mean / std * math.sqrt(252), abs=1e-4)
+
+def test_redis_backend_round_trip(supabase):
+    """狀態與交易筆數保存在 Redis 時結果一致"""
+    fakeredis = pytest.importorskip('fakeredis')
+    engine = SnapshotEngine(supabase, fakeredis.FakeRedis(), initial_balance=INITIAL_BALANCE)
+    engine.record_trade('t1', 'a')
+
+    engine.take_snapshot('t1', {'a': valuation(1050000)}, date(2026, 10, 1))
+    rows = engine.take_snapshot('t1', {'a': valuation(1102500)}, date(2026, 10, 2))
+    assert rows[0]['daily_return'] == pytest.approx(0.05)
+    assert rows[0]['twr_return'] == pytest.approx(0.1025)
+    assert rows[0]['total_trades'] == 1
+    assert engine._read_trade_counts('t1') == {'a': 0}
@@ -5,7 +5,8 @@
 
 import sys
 import os
-from supabase import create_client, Client
+from supabase import Client
+from supabase_pool import create_client
 
 # Supabase配置
 SUPABASE_URL = "https://wujlbjrouqcpnifbakmw.supabase.co"
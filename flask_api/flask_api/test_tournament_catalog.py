@@ -0,0 +1,66 @@
+"""
+錦標賽目錄單元測試
+數據庫欄位對應 API 回應欄位、版本號變動時重新載入、參與索引快取
+"""
+
+from unittest.mock import MagicMock
+
+import pytest
+
+from http_cache import HttpCache, TOURNAMENTS_SCOPE
+from tournament_catalog import TournamentCatalog
+
+TOURNAMENT_ROW = {
+    'id': 't1', 'name': '十月月賽', 'description': '', 'status': 'active',
+    'starts_at': '2026-10-01T00:00:00+00:00', 'ends_at': '2026-10-31T23:59:59+00:00',
+    'entry_capital': '1000000', 'current_participants': 42, 'max_participants': 100,
+    'created_at': '2026-09-20T00:00:00+00:00'
+}
+
+@pytest.fixture
+def supabase():
+    supabase = MagicMock()
+    supabase.table.return_value.select.return_value.execute.return_value = MagicMock(data=[TOURNAMENT_ROW])
+    supabase.table.return_value.select.return_value.eq.return_value.execute.return_value = MagicMock(
+        data=[{'tournament_id': 't1'}]
+    )
+    return supabase
+
+def test_rows_use_api_field_names(supabase):
+    """回應沿用 start_date / end_date / initial_balance 欄位名稱"""
+    catalog = TournamentCatalog(supabase)
+    tournament, = catalog.tournaments()
+
+    supabase.table.return_value.select.assert_called_with(
+        'id, name, description, status, starts_at, ends_at, entry_capital, '
+        'current_participants, max_participants, created_at'
+    )
+    assert tournament['start_date'] == TOURNAMENT_ROW['starts_at']
+    assert tournament['end_date'] == TOURNAMENT_ROW['ends_at']
+    assert tournament['initial_balance'] == 1000000.0
+    assert tournament['current_participants'] == 42
+    assert 'starts_at' not in tournament and 'entry_capital' not in tournament
+
+def test_reload_on_version_bump(supabase):
+    """錦標賽列表版本號遞增後重新載入，未變動時不查詢數據庫"""
+    http_cache = HttpCache()
+    catalog = TournamentCatalog(supabase, http_cache=http_cache, version_check_interval=0)
+
+    catalog.tournaments()
+    catalog.tournaments()
+    assert catalog.reloads == 1
+
+    http_cache.bump([TOURNAMENTS_SCOPE])
+    catalog.tournaments()
+    assert catalog.reloads == 2
+
+def test_memberships_are_cached_until_invalidated(supabase):
+    """參與索引讀取一次後快取，加入 / 退出後清除"""
+    catalog = TournamentCatalog(supabase)
+    assert catalog.memberships('u1') == {'t1'}
+    assert catalog.memberships('u1') == {'t1'}
+    assert catalog.membership_loads == 1
+
+    catalog.invalidate_memberships('u1')
+    catalog.memberships('u1')
+    assert catalog.membership_loads == 2
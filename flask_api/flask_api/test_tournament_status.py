@@ -0,0 +1,58 @@
+"""
+錦標賽狀態本地快取單元測試
+交易時間窗判斷、本地命中，以及閒置後仍能收到狀態變更通知
+"""
+
+import time
+from datetime import datetime, timedelta, timezone
+from unittest.mock import MagicMock
+
+import pytest
+
+from tournament_status import TournamentStatusCache, TournamentWindow, publish_status_change
+
+def tournaments_table(rows):
+    """模擬 supabase.table('tournaments') 的查詢（eq / in_ 皆回傳 rows）"""
+    supabase = MagicMock()
+    query = supabase.table.return_value.select.return_value
+    query.eq.return_value.execute.side_effect = lambda: MagicMock(data=list(rows))
+    query.in_.return_value.execute.side_effect = lambda: MagicMock(data=list(rows))
+    return supabase
+
+def test_window_is_active():
+    """只有 active 且在時間窗內可交易"""
+    now = datetime.now(timezone.utc)
+    window = TournamentWindow('active', now - timedelta(days=1), now + timedelta(days=1))
+    assert window.is_active(now)
+    assert not window.is_active(now + timedelta(days=2))
+    assert not TournamentWindow('upcoming').is_active(now)
+
+def test_is_active_hits_local_cache():
+    """首次查詢載入後不再查詢數據庫"""
+    supabase = tournaments_table([{'id': 't1', 'status': 'active', 'starts_at': None, 'ends_at': None}])
+    cache = TournamentStatusCache(supabase)
+
+    assert cache.is_active('t1')
+    assert cache.is_active('t1')
+    assert cache.misses == 1 and cache.hits == 1
+
+def test_status_change_arrives_after_idle_channel():
+    """頻道閒置超過輪詢逾時後發佈的狀態變更仍會觸發重新載入"""
+    fakeredis = pytest.importorskip('fakeredis')
+    redis_client = fakeredis.FakeRedis()
+    rows = [{'id': 't1', 'status': 'active', 'starts_at': None, 'ends_at': None}]
+    cache = TournamentStatusCache(tournaments_table(rows), redis_client)
+    cache.start()
+    try:
+        assert cache.is_active('t1')
+        time.sleep(1.5)
+
+        rows[0] = {'id': 't1', 'status': 'finished', 'starts_at': None, 'ends_at': None}
+        publish_status_change(redis_client, 't1')
+        deadline = time.time() + 3
+        while cache.invalidations == 0 and time.time() < deadline:
+            time.sleep(0.05)
+        assert cache.invalidations == 1
+        assert not cache.is_active('t1')
+    finally:
+        cache.stop()
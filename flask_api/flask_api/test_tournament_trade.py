@@ -0,0 +1,99 @@
+"""
+錦標賽原子性交易單元測試
+單一 RPC（execute_tournament_trade）完成驗證與寫入，數據庫驗證錯誤（23514）轉為 ValueError
+"""
+
+from unittest.mock import MagicMock
+
+import pytest
+from postgrest.exceptions import APIError
+
+from tournament_service import TournamentPortfolio, TournamentTrade, TournamentTradingService
+
+@pytest.fixture
+def supabase():
+    return MagicMock()
+
+@pytest.fixture
+def service(supabase):
+    service = TournamentTradingService(supabase)
+    service.status_cache.stop()
+    supabase.reset_mock()
+    yield service
+    service.executor.shutdown(wait=False)
+
+def make_trade(side='buy', qty=100, price=600.0):
+    return TournamentTrade(
+        tournament_id='t1', user_id='u1', symbol='2330.TW', side=side,
+        qty=qty, price=price, total_amount=qty * price, executed_at='2026-10-19T09:30:00',
+        trade_ref='order-1'
+    )
+
+def make_portfolio(cash_balance=1000000.0):
+    return TournamentPortfolio(
+        tournament_id='t1', user_id='u1', cash_balance=cash_balance,
+        equity_value=0.0, total_assets=cash_balance, updated_at='2026-10-19T09:00:00'
+    )
+
+def test_trade_is_one_rpc_call(service, supabase):
+    """交易、投資組合與持倉在同一個 RPC 內寫入，不另外呼叫資料表"""
+    trade = make_trade()
+    supabase.rpc.return_value.execute.return_value = MagicMock(data={'trade': {'id': trade.trade_id}})
+
+    result = service._execute_atomic_transaction(make_portfolio(), trade)
+
+    supabase.rpc.assert_called_once_with('execute_tournament_trade', {
+        'p_trade_id': trade.trade_id,
+        'p_tournament_id': 't1',
+        'p_user_id': 'u1',
+        'p_symbol': '2330.TW',
+        'p_side': 'buy',
+        'p_qty': 100,
+        'p_price': 600.0,
+        'p_total_amount': 60000.0,
+        'p_executed_at': '2026-10-19T09:30:00',
+        'p_trade_ref': 'order-1'
+    })
+    supabase.table.assert_not_called()
+    assert result['trade_record'] == {'id': trade.trade_id}
+    assert result['total_amount'] == 60000.0
+
+def test_check_violation_becomes_value_error(service, supabase):
+    """數據庫端驗證失敗（SQLSTATE 23514）轉為 ValueError，訊息沿用數據庫訊息"""
+    supabase.rpc.return_value.execute.side_effect = APIError({
+        'message': '持股不足: 需要 100 股, 可用 0 股', 'code': '23514', 'hint': None, 'details': None
+    })
+
+    with pytest.raises(ValueError, match='持股不足'):
+        service._execute_atomic_transaction(make_portfolio(), make_trade(side='sell'))
+
+def test_other_database_errors_are_raised(service, supabase):
+    """其他數據庫錯誤原樣拋出，不視為交易驗證錯誤"""
+    supabase.rpc.return_value.execute.side_effect = APIError({
+        'message': 'deadlock detected', 'code': '40P01', 'hint': None, 'details': None
+    })
+
+    with pytest.raises(APIError):
+        service._execute_atomic_transaction(make_portfolio(), make_trade())
+
+def test_execute_tournament_trade_uses_single_rpc(service, supabase, monkeypatch):
+    """主要入口點：驗證通過後以一次 RPC 完成交易"""
+    trade = make_trade()
+    monkeypatch.setattr(service, '_verify_tournament_active', lambda tournament_id: True)
+    monkeypatch.setattr(service, '_get_tournament_portfolio', lambda *args: make_portfolio())
+    supabase.rpc.return_value.execute.return_value = MagicMock(data={'trade': {'id': trade.trade_id}})
+
+    result = service.execute_tournament_trade(trade)
+
+    assert result['success']
+    assert result['trade_id'] == trade.trade_id
+    assert supabase.rpc.call_count == 1
+
+def test_insufficient_cash_is_rejected_before_rpc(service, supabase, monkeypatch):
+    """資金不足時在應用端拒絕，不呼叫 RPC"""
+    monkeypatch.setattr(service, '_verify_tournament_active', lambda tournament_id: True)
+    monkeypatch.setattr(service, '_get_tournament_portfolio', lambda *args: make_portfolio(cash_balance=1000.0))
+
+    with pytest.raises(ValueError, match='資金不足'):
+        service.execute_tournament_trade(make_trade())
+    supabase.rpc.assert_not_called()
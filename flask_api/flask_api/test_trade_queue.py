@@ -0,0 +1,93 @@
+"""
+帳戶序列化交易佇列單元測試
+同帳戶依序執行、不同帳戶平行、分批讓出執行緒與例外傳遞
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from trade_queue import AccountTradeQueue
+
+@pytest.fixture
+def executor():
+    executor = ThreadPoolExecutor(max_workers=4)
+    yield executor
+    executor.shutdown(wait=True)
+
+def test_same_account_runs_in_submit_order(executor):
+    """同一帳戶的交易依提交順序逐筆執行，且不會同時執行"""
+    queue = AccountTradeQueue(executor, max_batch=3)
+    order, running, overlap = [], [0], []
+    lock = threading.Lock()
+
+    def trade(index):
+        with lock:
+            running[0] += 1
+            overlap.append(running[0])
+        order.append(index)
+        with lock:
+            running[0] -= 1
+        return index
+
+    futures = [queue.submit(('t1', 'a'), trade, index) for index in range(20)]
+    assert [future.result(5) for future in futures] == list(range(20))
+    assert order == list(range(20))
+    assert max(overlap) == 1
+    assert queue.depth(('t1', 'a')) == 0
+
+def test_accounts_run_in_parallel(executor):
+    """不同帳戶的佇列可同時執行"""
+    queue = AccountTradeQueue(executor)
+    barrier = threading.Barrier(2, timeout=5)
+
+    futures = [queue.submit(('t1', user_id), barrier.wait) for user_id in ('a', 'b')]
+    for future in futures:
+        future.result(5)
+
+def test_batch_yields_thread():
+    """連續處理 max_batch 筆後讓出執行緒，讓其他帳戶有機會執行"""
+    executor = ThreadPoolExecutor(max_workers=1)
+    queue = AccountTradeQueue(executor, max_batch=2)
+    order = []
+    gate = threading.Event()
+
+    # 佔住唯一的執行緒，讓兩個帳戶的交易都先排隊
+    blocker = executor.submit(gate.wait, 5)
+    futures = [queue.submit('a', order.append, f"a{index}") for index in range(4)]
+    futures.append(queue.submit('b', order.append, 'b0'))
+    gate.set()
+
+    for future in futures:
+        future.result(5)
+    blocker.result(5)
+    executor.shutdown(wait=True)
+    assert order == ['a0', 'a1', 'b0', 'a2', 'a3']
+
+def test_exception_is_propagated(executor):
+    """交易失敗時 Future 帶例外，不影響後續交易"""
+    queue = AccountTradeQueue(executor)
+
+    def fail():
+        raise ValueError('餘額不足')
+
+    failed = queue.submit('a', fail)
+    succeeded = queue.submit('a', lambda: 'ok')
+    with pytest.raises(ValueError):
+        failed.result(5)
+    assert succeeded.result(5) == 'ok'
+
+    metrics = queue.metrics()
+    assert metrics['failed'] == 1
+    assert metrics['completed'] == 1
+
+def test_shutdown_executor_fails_pending_trades():
+    """執行緒池已關閉時提交的交易直接失敗"""
+    executor = ThreadPoolExecutor(max_workers=1)
+    executor.shutdown()
+    queue = AccountTradeQueue(executor)
+
+    future = queue.submit('a', lambda: 'ok')
+    with pytest.raises(RuntimeError):
+        future.result(1)
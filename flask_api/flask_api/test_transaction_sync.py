@@ -4,7 +4,8 @@
 模擬從iOS端插入一筆交易記錄到Supabase，然後驗證API能正確返回
 """
 
-from supabase import create_client, Client
+from supabase import Client
+from supabase_pool import create_client
 import json
 import uuid
 from datetime import datetime
@@ -0,0 +1,264 @@
+"""
+錦標賽目錄與用戶參與索引
+/api/available-tournaments 與 /api/user-tournaments 由記憶體中的目錄過濾產生，不在每次請求查詢整張 tournaments 表
+
+設計重點:
+1. 目錄：行程內保存所有錦標賽預先組好的回應欄位（starts_at / ends_at / entry_capital
+   對應回應的 start_date / end_date / initial_balance），
+   錦標賽列表版本號（http_cache TOURNAMENTS_SCOPE）變動或超過 TTL 時重新載入；
+   版本號每秒最多讀取一次
+2. 參與索引：每位用戶一個集合（來源為 tournament_members），加入 / 退出時刪除，下次讀取重新載入；
+   沒有參與任何錦標賽的用戶以空字串成員標記，避免每次都查詢數據庫
+3. 交易筆數：每位用戶一個雜湊（錦標賽 -> 筆數），成交時併入呼叫端管線累加。
+   尚未重建的錦標賽不累加（避免只有部分筆數），讀取時缺少的錦標賽以 get_user_trade_counts
+   數據庫函數重建；雜湊建立後一小時過期，重建期間的少量誤差於過期後自動校正
+4. Redis 未連線時參與索引與交易筆數保存在行程內
+
+Redis 鍵值:
+    tournament_memberships:{user_id}  集合 已參與的錦標賽 ID
+    user_trade_counts:{user_id}       雜湊 錦標賽 ID -> 交易筆數
+"""
+
+import logging
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import cache_codec
+from data_access import select_records, decode_records, TournamentListingRecord
+from http_cache import TOURNAMENTS_SCOPE
+
+logger = logging.getLogger(__name__)
+
+# 欄位存在時才累加（不存在代表該錦標賽尚未由數據庫重建）
+# KEYS: 交易筆數雜湊  ARGV: 錦標賽 ID
+INCREMENT_SCRIPT = """
+if redis.call('HEXISTS', KEYS[1], ARGV[1]) == 1 then
+    return redis.call('HINCRBY', KEYS[1], ARGV[1], 1)
+end
+return 0
+"""
+
+EMPTY_MEMBERSHIP = ''  # 空集合標記
+
+class TournamentCatalog:
+    """錦標賽目錄、參與索引與用戶交易筆數"""
+
+    def __init__(self, supabase_client, redis_client=None, http_cache=None, ttl: float = 30.0,
+                 version_check_interval: float = 1.0, membership_ttl: int = 300, trade_count_ttl: int = 3600):
+        self.supabase = supabase_client
+        self.redis = redis_client
+        self.http_cache = http_cache
+        self.ttl = ttl                                        # 目錄最長保留秒數（數據庫外部修改）
+        self.version_check_interval = version_check_interval  # 版本號讀取間隔（秒）
+        self.membership_ttl = membership_ttl                  # 參與索引過期秒數
+        self.trade_count_ttl = trade_count_ttl                # 交易筆數重新校正間隔（秒）
+
+        if self.redis:
+            self._increment_script = self.redis.register_script(INCREMENT_SCRIPT)
+
+        self._rows: Dict[str, Dict] = {}  # tid -> 預先組好的回應欄位（共用，使用時複製）
+        self._version: Optional[int] = None
+        self._loaded_at = 0.0
+        self._checked_at = 0.0
+        self._reload_lock = threading.Lock()
+
+        # Redis 備用方案
+        self._local_memberships: Dict[str, Tuple[float, Set[str]]] = {}
+        self._local_trade_counts: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+        # 統計指標
+        self.reloads = 0
+        self.membership_loads = 0
+        self.trade_count_loads = 0
+
+    @staticmethod
+    def _membership_key(user_id: str) -> str:
+        return f"tournament_memberships:{user_id}"
+
+    @staticmethod
+    def _trade_count_key(user_id: str) -> str:
+        return f"user_trade_counts:{user_id}"
+
+    # ========================================
+    # 目錄
+    # ========================================
+
+    def _current_version(self) -> Optional[int]:
+        if self.http_cache is None:
+            return None
+        return self.http_cache.versions([TOURNAMENTS_SCOPE])[0]
+
+    def _stale(self, now: float) -> Tuple[bool, Optional[int]]:
+        if self._version is None or now - self._loaded_at >= self.ttl:
+            return True, self._current_version()
+        if now - self._checked_at < self.version_check_interval:
+            return False, self._version
+        self._checked_at = now
+        version = self._current_version()
+        return version != self._version, version
+
+    def _reload(self, version: Optional[int]):
+        response = select_records(self.supabase, TournamentListingRecord).execute()
+        tournaments = decode_records(response.data, TournamentListingRecord)
+        rows = {}
+        for tournament in tournaments:
+            # 數據庫欄位（tournament_schema.sql）對應 API 回應欄位
+            rows[tournament.id] = {
+                'id': tournament.id,
+                'name': tournament.name,
+                'description': tournament.description,
+                'status': tournament.status,
+                'start_date': tournament.starts_at,
+                'end_date': tournament.ends_at,
+                'initial_balance': tournament.entry_capital,
+                'current_participants': tournament.current_participants,
+                'max_participants': tournament.max_participants,
+                'created_at': tournament.created_at,
+                'created_by': 'user'  # 簡化為所有錦標賽都屬於用戶
+            }
+
+        now = time.time()
+        self._rows = rows
+        self._version, self._loaded_at, self._checked_at = version, now, now
+        self.reloads += 1
+        logger.info(f"📚 錦標賽目錄已載入: {len(tournaments)} 個錦標賽")
+
+    def tournaments(self) -> List[Dict]:
+        """所有錦標賽的回應欄位（共用字典，呼叫端需複製後再修改）"""
+        stale, version = self._stale(time.time())
+        if stale:
+            with self._reload_lock:
+                # 等待鎖期間其他執行緒可能已重新載入
+                if self._version is None or self._version != version or time.time() - self._loaded_at >= self.ttl:
+                    try:
+                        self._reload(version)
+                    except Exception:
+                        if self._version is None:
+                            raise
+                        logger.exception("錦標賽目錄重新載入失敗，沿用舊資料")
+        return list(self._rows.values())
+
+    # ========================================
+    # 參與索引
+    # ========================================
+
+    def _load_memberships(self, user_id: str) -> Set[str]:
+        result = self.supabase.table('tournament_members').select('tournament_id').eq('user_id', user_id).execute()
+        self.membership_loads += 1
+        return {row['tournament_id'] for row in result.data}
+
+    def memberships(self, user_id: str) -> Set[str]:
+        """用戶已參與的錦標賽 ID"""
+        if self.redis:
+            key = self._membership_key(user_id)
+            members = self.redis.smembers(key)
+            if members:
+                return {cache_codec.decode_text(member) for member in members} - {EMPTY_MEMBERSHIP}
+
+            tournament_ids = self._load_memberships(user_id)
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.sadd(key, *(tournament_ids or {EMPTY_MEMBERSHIP}))
+            pipe.expire(key, self.membership_ttl)
+            pipe.execute()
+            return tournament_ids
+
+        now = time.time()
+        with self._lock:
+            cached = self._local_memberships.get(user_id)
+            if cached and cached[0] > now:
+                return set(cached[1])
+        tournament_ids = self._load_memberships(user_id)
+        with self._lock:
+            self._local_memberships[user_id] = (now + self.membership_ttl, tournament_ids)
+        return set(tournament_ids)
+
+    def invalidate_memberships(self, user_id: str):
+        """加入 / 退出錦標賽後清除參與索引"""
+        try:
+            if self.redis:
+                self.redis.delete(self._membership_key(user_id))
+            else:
+                with self._lock:
+                    self._local_memberships.pop(user_id, None)
+        except Exception as e:
+            logger.error(f"參與索引清除失敗: {e}")
+
+    # ========================================
+    # 交易筆數
+    # ========================================
+
+    def record_trade(self, user_id: str, tournament_id: str, pipe=None):
+        """累加一筆成交（可併入呼叫端的 Redis 管線）"""
+        if self.redis:
+            self._increment_script(keys=[self._trade_count_key(user_id)], args=[tournament_id], client=pipe or self.redis)
+            return
+
+        with self._lock:
+            counts = self._local_trade_counts.get(user_id)
+            if counts is not None and tournament_id in counts:
+                counts[tournament_id] += 1
+
+    def _load_trade_counts(self, user_id: str, tournament_ids: List[str]) -> Dict[str, int]:
+        result = self.supabase.rpc('get_user_trade_counts', {
+            'p_user_id': user_id,
+            'p_tournament_ids': tournament_ids
+        }).execute()
+        self.trade_count_loads += 1
+        counts = {tournament_id: 0 for tournament_id in tournament_ids}
+        for row in result.data or []:
+            counts[row['tournament_id']] = int(row['trade_count'] or 0)
+        return counts
+
+    def trade_counts(self, user_id: str, tournament_ids: Iterable[str]) -> Dict[str, int]:
+        """用戶在各錦標賽的交易筆數（尚未記錄的錦標賽由數據庫重建）"""
+        tournament_ids = sorted(tournament_ids)
+        if not tournament_ids:
+            return {}
+
+        if self.redis:
+            key = self._trade_count_key(user_id)
+            raw = self.redis.hgetall(key)
+            counts = {cache_codec.decode_text(field): int(value) for field, value in raw.items()}
+            missing = [tournament_id for tournament_id in tournament_ids if tournament_id not in counts]
+            if missing:
+                loaded = self._load_trade_counts(user_id, missing)
+                pipe = self.redis.pipeline(transaction=False)
+                pipe.hset(key, mapping=loaded)
+                if not raw:
+                    # 只在建立時設定過期，到期後整個雜湊重新校正
+                    pipe.expire(key, self.trade_count_ttl)
+                pipe.execute()
+                counts.update(loaded)
+            return {tournament_id: counts[tournament_id] for tournament_id in tournament_ids}
+
+        with self._lock:
+            counts = dict(self._local_trade_counts.get(user_id, {}))
+        missing = [tournament_id for tournament_id in tournament_ids if tournament_id not in counts]
+        if missing:
+            loaded = self._load_trade_counts(user_id, missing)
+            with self._lock:
+                self._local_trade_counts.setdefault(user_id, {}).update(loaded)
+            counts.update(loaded)
+        return {tournament_id: counts[tournament_id] for tournament_id in tournament_ids}
+
+    def metrics(self) -> Dict:
+        """獲取目錄與索引統計"""
+        return {
+            'tournaments': len(self._rows),
+            'catalog_version': self._version,
+            'catalog_reloads': self.reloads,
+            'membership_loads': self.membership_loads,
+            'trade_count_loads': self.trade_count_loads
+        }
+
+# 全局錦標賽目錄實例（單例模式）
+tournament_catalog = None
+
+def get_tournament_catalog(supabase_client=None, redis_client=None, http_cache=None) -> TournamentCatalog:
+    """獲取錦標賽目錄實例（單例模式）"""
+    global tournament_catalog
+    if tournament_catalog is None:
+        tournament_catalog = TournamentCatalog(supabase_client, redis_client, http_cache)
+    return tournament_catalog
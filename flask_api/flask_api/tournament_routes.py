@@ -10,7 +10,7 @@
 """
 
 from flask import Blueprint, request, jsonify, current_app
-from datetime import datetime, timedelta
+from datetime import datetime
 import json
 import uuid
 import logging
@@ -19,7 +19,12 @@ from typing import Dict, List, Optional
 import asyncio
 
 from tournament_service import get_tournament_service, TournamentTrade
-from app import supabase, redis_client, fetch_yahoo_finance_price, set_cached_price, get_cached_price
+from order_dedup import get_order_dedup_cache
+from supabase_pool import get_supabase_metrics
+from snapshot_scheduler import SnapshotScheduler, SNAPSHOT_SCHEDULER_ENABLED
+from http_cache import get_http_cache, leaderboard_scope, TOURNAMENTS_SCOPE
+from keyset_pagination import page_size, InvalidCursor
+from app import supabase, redis_client, response_compressor, fetch_yahoo_finance_price, set_cached_price, get_cached_price, get_cached_prices, set_cached_prices
 
 logger = logging.getLogger(__name__)
 
@@ -30,13 +35,45 @@ def get_tournament_service_instance():
     """獲取錦標賽服務實例"""
     return get_tournament_service(supabase, redis_client)
 
+# 交易冪等性（與 /api/trade 共用去重快取）
+order_dedup_cache = get_order_dedup_cache(redis_client)
+
+# HTTP 快取驗證（與主應用共用版本號）
+http_cache = get_http_cache(redis_client)
+
+def fetch_snapshot_prices(symbols: List[str]) -> Dict[str, float]:
+    """快照用股價：整批讀取快取，未命中者查詢後一次寫回快取"""
+    cached = get_cached_prices(symbols)
+    fetched = {}
+    for symbol in symbols:
+        if symbol not in cached:
+            fetched[symbol] = fetch_yahoo_finance_price(symbol)
+    if fetched:
+        set_cached_prices(fetched)
+    
+    prices = {}
+    for symbol, data in {**cached, **fetched}.items():
+        if data and data.get('current_price'):
+            prices[symbol] = float(data['current_price'])
+    return prices
+
+# 盤中快照排程器（每個 worker 一個，各 worker 以 Redis 搶占排程時段）
+snapshot_scheduler = SnapshotScheduler(get_tournament_service_instance, fetch_snapshot_prices)
+
+@tournament_bp.before_app_request
+def start_snapshot_scheduler():
+    """收到第一個請求時啟動排程器（gunicorn preload_app 在 master 載入應用，執行緒不會帶到 fork 出的 worker）"""
+    if SNAPSHOT_SCHEDULER_ENABLED:
+        snapshot_scheduler.start()
+
 # ========================================
 # 1. 高併發交易 API
 # ========================================
 
 @tournament_bp.route('/<tournament_id>/trade', methods=['POST'])
+@order_dedup_cache.idempotent
 def execute_tournament_trade(tournament_id):
-    """執行錦標賽交易（高併發優化版）"""
+    """執行錦標賽交易（高併發優化版，可帶 client_order_id 防止重試重複成交）"""
     data = request.get_json()
     
     # 驗證必要參數
@@ -60,7 +97,8 @@ def execute_tournament_trade(tournament_id):
             qty=float(data['qty']),
             price=float(data['price']),
             total_amount=float(data['qty']) * float(data['price']),
-            executed_at=datetime.utcnow().isoformat()
+            executed_at=datetime.utcnow().isoformat(),
+            trade_ref=data.get('client_order_id')
         )
         
         # 執行交易
@@ -75,6 +113,7 @@ def execute_tournament_trade(tournament_id):
             'success': True,
             'tournament_id': tournament_id,
             'trade_id': result.get('trade_id'),
+            'client_order_id': data.get('client_order_id'),
             'execution_time_ms': result.get('execution_time_ms'),
             'api_response_time_ms': api_time,
             'trade_details': {
@@ -109,15 +148,16 @@ def execute_batch_trades(tournament_id):
         
         results = []
         errors = []
+        submitted = []
+        required_fields = ['user_id', 'symbol', 'side', 'qty', 'price']
         
+        # 提交至帳戶序列佇列：同一用戶依提交順序執行，不同用戶平行（受執行緒池大小限制）
         for i, trade_data in enumerate(data['trades']):
             try:
                 # 驗證單個交易數據
-                required_fields = ['user_id', 'symbol', 'side', 'qty', 'price']
-                for field in required_fields:
-                    if field not in trade_data:
-                        errors.append(f"交易 {i+1}: 缺少參數 {field}")
-                        continue
+                missing_fields = [field for field in required_fields if field not in trade_data]
+                if missing_fields:
+                    raise ValueError(f"缺少參數 {', '.join(missing_fields)}")
                 
                 # 構建交易對象
                 trade = TournamentTrade(
@@ -131,30 +171,54 @@ def execute_batch_trades(tournament_id):
                     executed_at=datetime.utcnow().isoformat()
                 )
                 
-                # 執行交易
-                result = service.execute_tournament_trade(trade)
+                submitted_at = time.time()
+                future = service.submit_tournament_trade(trade)
+                completed_at = {}
+                future.add_done_callback(lambda _, done=completed_at: done.setdefault('at', time.time()))
+                submitted.append((i, future, submitted_at, completed_at))
+                
+            except Exception as trade_error:
+                submitted.append((i, trade_error, None, None))
+        
+        # 依原始順序收集結果
+        for i, future, submitted_at, completed_at in submitted:
+            try:
+                if isinstance(future, Exception):
+                    raise future
+                result = future.result()
+                latency = (completed_at.get('at', time.time()) - submitted_at) * 1000
+                execution_time = result.get('execution_time_ms') or 0
                 results.append({
                     'trade_index': i + 1,
                     'success': True,
                     'trade_id': result.get('trade_id'),
-                    'execution_time_ms': result.get('execution_time_ms')
+                    'execution_time_ms': execution_time,
+                    'queue_wait_ms': max(latency - execution_time, 0),
+                    'latency_ms': latency
                 })
                 
             except Exception as trade_error:
+                results.append({
+                    'trade_index': i + 1,
+                    'success': False,
+                    'error': str(trade_error)
+                })
                 errors.append(f"交易 {i+1}: {str(trade_error)}")
         
         total_time = (time.time() - start_time) * 1000
+        successful_trades = len(results) - len(errors)
         
-        logger.info(f"📦 批量交易完成: {len(results)} 成功, {len(errors)} 失敗, 總時間: {total_time:.2f}ms")
+        logger.info(f"📦 批量交易完成: {successful_trades} 成功, {len(errors)} 失敗, 總時間: {total_time:.2f}ms")
         
         return jsonify({
             'success': len(errors) == 0,
             'tournament_id': tournament_id,
             'total_trades': len(data['trades']),
-            'successful_trades': len(results),
+            'successful_trades': successful_trades,
             'failed_trades': len(errors),
             'total_time_ms': total_time,
             'avg_time_per_trade_ms': total_time / len(data['trades']) if data['trades'] else 0,
+            'throughput_tps': successful_trades / (total_time / 1000) if total_time > 0 else 0,
             'results': results,
             'errors': errors,
             'timestamp': datetime.utcnow().isoformat()
@@ -164,31 +228,113 @@ def execute_batch_trades(tournament_id):
         logger.error(f"❌ 批量交易失敗: {e}")
         return jsonify({"error": str(e)}), 500
 
+@tournament_bp.route('/<tournament_id>/bulk-trade', methods=['POST'])
+def execute_bulk_trades(tournament_id):
+    """批量寫入錦標賽交易（回合結算 / 匯入委託檔重播，一次數據庫呼叫）"""
+    data = request.get_json()
+    
+    if 'trades' not in data or not isinstance(data['trades'], list):
+        return jsonify({"error": "缺少交易列表參數"}), 400
+    
+    try:
+        start_time = time.time()
+        service = get_tournament_service_instance()
+        
+        required_fields = ['user_id', 'symbol', 'side', 'qty', 'price']
+        trades = []
+        trade_indexes = []
+        results = [None] * len(data['trades'])
+        
+        for i, trade_data in enumerate(data['trades']):
+            missing_fields = [field for field in required_fields if field not in trade_data]
+            if missing_fields:
+                results[i] = {'trade_index': i + 1, 'success': False, 'error': f"缺少參數 {', '.join(missing_fields)}"}
+                continue
+            
+            trades.append(TournamentTrade(
+                tournament_id=tournament_id,
+                user_id=trade_data['user_id'],
+                symbol=trade_data['symbol'],
+                side=trade_data['side'],
+                qty=float(trade_data['qty']),
+                price=float(trade_data['price']),
+                total_amount=float(trade_data['qty']) * float(trade_data['price']),
+                executed_at=trade_data.get('executed_at') or datetime.utcnow().isoformat(),
+                trade_ref=trade_data.get('client_order_id')
+            ))
+            trade_indexes.append(i)
+        
+        bulk_result = service.execute_bulk_trades(trades) if trades else {'results': [], 'execution_time_ms': 0}
+        
+        for i, result in zip(trade_indexes, bulk_result['results']):
+            results[i] = {'trade_index': i + 1, **result}
+        
+        errors = [f"交易 {r['trade_index']}: {r['error']}" for r in results if not r['success']]
+        total_time = (time.time() - start_time) * 1000
+        successful_trades = len(results) - len(errors)
+        
+        logger.info(f"📦 批量寫入完成: {successful_trades} 成功, {len(errors)} 失敗, 總時間: {total_time:.2f}ms")
+        
+        return jsonify({
+            'success': len(errors) == 0,
+            'tournament_id': tournament_id,
+            'total_trades': len(data['trades']),
+            'successful_trades': successful_trades,
+            'failed_trades': len(errors),
+            'total_time_ms': total_time,
+            'execution_time_ms': bulk_result['execution_time_ms'],
+            'throughput_tps': successful_trades / (total_time / 1000) if total_time > 0 else 0,
+            'results': results,
+            'errors': errors,
+            'timestamp': datetime.utcnow().isoformat()
+        })
+        
+    except ValueError as ve:
+        logger.warning(f"⚠️ 批量寫入驗證失敗: {ve}")
+        return jsonify({"error": str(ve)}), 400
+        
+    except Exception as e:
+        logger.error(f"❌ 批量寫入失敗: {e}")
+        return jsonify({"error": str(e)}), 500
+
 # ========================================
 # 2. 實時排行榜 API
 # ========================================
 
 @tournament_bp.route('/<tournament_id>/leaderboard', methods=['GET'])
+@http_cache.conditional(lambda tournament_id: [leaderboard_scope(tournament_id)], max_age=0, s_maxage=1)
 def get_tournament_leaderboard(tournament_id):
-    """獲取錦標賽實時排行榜"""
+    """獲取錦標賽實時排行榜（帶 since=<version> 時只回傳變動的列，未變動回傳 304）"""
     try:
         limit = min(int(request.args.get('limit', 100)), 500)
+        offset = max(int(request.args.get('offset', 0)), 0)
+        since = request.args.get('since', type=int)
         service = get_tournament_service_instance()
         
         start_time = time.time()
-        leaderboard = service.get_tournament_leaderboard(tournament_id, limit)
+        result = service.get_tournament_leaderboard_delta(tournament_id, limit, offset, since)
+        if result.not_modified:
+            return '', 304
+        total_participants = service.get_leaderboard_size(tournament_id)
         query_time = (time.time() - start_time) * 1000
         
-        logger.info(f"📊 排行榜查詢完成: {tournament_id}, {len(leaderboard)} 位參與者, {query_time:.2f}ms")
+        logger.info(f"📊 排行榜查詢完成: {tournament_id}, {len(result.rows)} 位參與者, {query_time:.2f}ms")
         
-        return jsonify({
+        response = {
             'success': True,
             'tournament_id': tournament_id,
-            'leaderboard': leaderboard,
-            'total_participants': len(leaderboard),
+            'version': result.version,
+            'delta': not result.full,
+            'leaderboard': result.rows,
+            'total_participants': total_participants,
             'query_time_ms': query_time,
             'last_updated': datetime.utcnow().isoformat()
-        })
+        }
+        if not result.full:
+            # 客戶端以 user_id 合併變動列、移除 removed，再依 rank 排序
+            response['since'] = since
+            response['removed'] = result.removed
+        return jsonify(response)
         
     except Exception as e:
         logger.error(f"❌ 獲取排行榜失敗: {e}")
@@ -198,29 +344,24 @@ def get_tournament_leaderboard(tournament_id):
 def get_user_rank(tournament_id, user_id):
     """獲取用戶在錦標賽中的排名"""
     try:
+        neighbours = min(max(int(request.args.get('neighbours', 5)), 0), 50)
         service = get_tournament_service_instance()
-        leaderboard = service.get_tournament_leaderboard(tournament_id, 1000)  # 獲取更多數據以確定準確排名
-        
-        user_rank = None
-        user_stats = None
-        
-        for rank, participant in enumerate(leaderboard, 1):
-            if participant['user_id'] == user_id:
-                user_rank = rank
-                user_stats = participant
-                break
+        rank_info = service.get_user_rank(tournament_id, user_id, neighbours)
         
-        if user_rank is None:
+        if rank_info is None:
             return jsonify({"error": "用戶未參與此錦標賽"}), 404
         
         return jsonify({
             'success': True,
             'tournament_id': tournament_id,
             'user_id': user_id,
-            'rank': user_rank,
-            'total_participants': len(leaderboard),
-            'user_stats': user_stats,
-            'top_10_percent': user_rank <= len(leaderboard) * 0.1,
+            'rank': rank_info['rank'],
+            'total_participants': rank_info['total_participants'],
+            'percentile': rank_info['percentile'],
+            'user_stats': rank_info['user_stats'],
+            'neighbours_above': rank_info['above'],
+            'neighbours_below': rank_info['below'],
+            'top_10_percent': rank_info['rank'] <= rank_info['total_participants'] * 0.1,
             'timestamp': datetime.utcnow().isoformat()
         })
         
@@ -233,17 +374,17 @@ def get_user_rank(tournament_id, user_id):
 # ========================================
 
 @tournament_bp.route('/<tournament_id>/stats', methods=['GET'])
+@http_cache.conditional(lambda tournament_id: [leaderboard_scope(tournament_id)], max_age=0, s_maxage=1, revalidate_every=60)
 def get_tournament_stats(tournament_id):
     """獲取錦標賽統計信息"""
     try:
-        # 使用數據庫函數獲取實時統計
-        result = supabase.rpc('get_tournament_stats', {'p_tournament_id': tournament_id}).execute()
+        # 即時計數器（成交時累加，定期與數據庫校正）
+        service = get_tournament_service_instance()
+        stats = service.get_tournament_stats(tournament_id)
         
-        if result.data:
-            stats = result.data[0] if isinstance(result.data, list) else result.data
-            
-            # 添加額外的統計信息
-            stats['api_query_time'] = datetime.utcnow().isoformat()
+        if stats:
+            # 添加額外的統計信息（複製一份，避免修改共用快取）
+            stats = {**stats, 'api_query_time': datetime.utcnow().isoformat()}
             
             return jsonify({
                 'success': True,
@@ -259,28 +400,49 @@ def get_tournament_stats(tournament_id):
         logger.error(f"❌ 獲取錦標賽統計失敗: {e}")
         return jsonify({"error": str(e)}), 500
 
+@tournament_bp.route('/<tournament_id>/trades', methods=['GET'])
+def get_tournament_trades(tournament_id):
+    """獲取錦標賽成交紀錄（可依 user_id 篩選，以 cursor 取得下一頁）"""
+    user_id = request.args.get('user_id')
+    cursor = request.args.get('cursor')
+    
+    try:
+        limit = page_size(request.args.get('limit'))
+    except ValueError:
+        return jsonify({"error": "無效的 limit 參數"}), 400
+    
+    try:
+        service = get_tournament_service_instance()
+        
+        start_time = time.time()
+        trades, next_cursor = service.get_trade_history(tournament_id, user_id, limit, cursor)
+        query_time = (time.time() - start_time) * 1000
+        
+        response = jsonify({
+            'success': True,
+            'tournament_id': tournament_id,
+            'user_id': user_id,
+            'trades': trades,
+            'next_cursor': next_cursor,
+            'query_time_ms': query_time
+        })
+        if next_cursor:
+            response.headers['X-Next-Cursor'] = next_cursor
+        return response
+        
+    except InvalidCursor as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logger.error(f"❌ 獲取成交紀錄失敗: {e}")
+        return jsonify({"error": str(e)}), 500
+
 @tournament_bp.route('/active-tournaments', methods=['GET'])
+@http_cache.conditional([TOURNAMENTS_SCOPE], max_age=0, s_maxage=10, revalidate_every=30)
 def get_active_tournaments():
     """獲取所有進行中的錦標賽"""
     try:
-        result = supabase.table('tournaments').select('*').eq('status', 'active').execute()
-        
-        tournaments = []
-        for tournament in result.data:
-            # 獲取每個錦標賽的參與者數量
-            participants_result = supabase.table('tournament_members').select('user_id').eq('tournament_id', tournament['id']).execute()
-            
-            tournaments.append({
-                'id': tournament['id'],
-                'name': tournament['name'],
-                'description': tournament.get('description', ''),
-                'starts_at': tournament['starts_at'],
-                'ends_at': tournament['ends_at'],
-                'entry_capital': tournament['entry_capital'],
-                'max_participants': tournament['max_participants'],
-                'current_participants': len(participants_result.data),
-                'status': tournament['status']
-            })
+        service = get_tournament_service_instance()
+        tournaments = service.get_active_tournaments()
         
         logger.info(f"📋 獲取進行中錦標賽: {len(tournaments)} 個")
         
@@ -306,27 +468,14 @@ def get_performance_metrics():
         service = get_tournament_service_instance()
         metrics = service.get_performance_metrics()
         
-        # 添加數據庫性能統計
-        try:
-            db_stats_result = supabase.table('tournament_performance_monitor').select('*').execute()
-            metrics['database_stats'] = db_stats_result.data
-        except Exception as db_error:
-            logger.warning(f"⚠️ 獲取數據庫統計失敗: {db_error}")
-            metrics['database_stats'] = []
+        # Supabase 連線池請求指標
+        metrics['supabase_http'] = get_supabase_metrics()
         
-        # 添加最近交易統計
-        try:
-            recent_trades = supabase.table('tournament_trades').select('tournament_id').gte('executed_at', (datetime.utcnow() - timedelta(minutes=1)).isoformat()).execute()
-            metrics['recent_activity'] = {
-                'trades_last_minute': len(recent_trades.data),
-                'active_tournaments': len(set(trade['tournament_id'] for trade in recent_trades.data))
-            }
-        except Exception as activity_error:
-            logger.warning(f"⚠️ 獲取近期活動統計失敗: {activity_error}")
-            metrics['recent_activity'] = {
-                'trades_last_minute': 0,
-                'active_tournaments': 0
-            }
+        # 快照排程（排行榜延遲上限）
+        metrics['snapshot_scheduler'] = snapshot_scheduler.metrics()
+        
+        # 回應壓縮（本 worker）
+        metrics['response_compression'] = response_compressor.metrics()
         
         return jsonify({
             'success': True,
@@ -419,73 +568,53 @@ def tournament_load_test():
         
         start_time = time.time()
         
-        # 模擬併發交易
-        import threading
-        import queue
+        # 模擬併發交易（每個用戶一條序列佇列，不同用戶平行執行）
+        import random
+        service = get_tournament_service_instance()
+        symbols = ['2330.TW', '2454.TW', '2317.TW', 'AAPL', 'TSLA']
         
-        results_queue = queue.Queue()
-        errors_queue = queue.Queue()
+        submitted = []
+        for user_index in range(concurrent_users):
+            user_id = f"load_test_user_{user_index:04d}"
+            
+            for trade_index in range(trades_per_user):
+                # 隨機選擇股票和交易參數
+                symbol = random.choice(symbols)
+                side = random.choice(['buy', 'sell'])
+                qty = random.randint(1, 100)
+                price = random.uniform(100, 1000)
+                
+                trade = TournamentTrade(
+                    tournament_id=tournament_id,
+                    user_id=user_id,
+                    symbol=symbol,
+                    side=side,
+                    qty=qty,
+                    price=price,
+                    total_amount=qty * price,
+                    executed_at=datetime.utcnow().isoformat()
+                )
+                
+                submitted.append((user_index, trade_index, service.submit_tournament_trade(trade)))
         
-        def simulate_user_trading(user_index):
+        # 收集結果
+        results = []
+        errors = []
+        for user_index, trade_index, future in submitted:
             try:
-                user_id = f"load_test_user_{user_index:04d}"
-                
-                for trade_index in range(trades_per_user):
-                    # 隨機選擇股票和交易參數
-                    import random
-                    symbols = ['2330.TW', '2454.TW', '2317.TW', 'AAPL', 'TSLA']
-                    symbol = random.choice(symbols)
-                    side = random.choice(['buy', 'sell'])
-                    qty = random.randint(1, 100)
-                    price = random.uniform(100, 1000)
-                    
-                    trade = TournamentTrade(
-                        tournament_id=tournament_id,
-                        user_id=user_id,
-                        symbol=symbol,
-                        side=side,
-                        qty=qty,
-                        price=price,
-                        total_amount=qty * price,
-                        executed_at=datetime.utcnow().isoformat()
-                    )
-                    
-                    # 執行交易
-                    service = get_tournament_service_instance()
-                    result = service.execute_tournament_trade(trade)
-                    
-                    results_queue.put({
-                        'user_index': user_index,
-                        'trade_index': trade_index,
-                        'execution_time_ms': result.get('execution_time_ms', 0)
-                    })
-                    
+                result = future.result()
+                results.append({
+                    'user_index': user_index,
+                    'trade_index': trade_index,
+                    'execution_time_ms': result.get('execution_time_ms', 0)
+                })
             except Exception as e:
-                errors_queue.put({
+                errors.append({
                     'user_index': user_index,
+                    'trade_index': trade_index,
                     'error': str(e)
                 })
         
-        # 啟動併發用戶線程
-        threads = []
-        for i in range(concurrent_users):
-            thread = threading.Thread(target=simulate_user_trading, args=(i,))
-            threads.append(thread)
-            thread.start()
-        
-        # 等待所有線程完成
-        for thread in threads:
-            thread.join()
-        
-        # 收集結果
-        results = []
-        while not results_queue.empty():
-            results.append(results_queue.get())
-        
-        errors = []
-        while not errors_queue.empty():
-            errors.append(errors_queue.get())
-        
         total_time = (time.time() - start_time) * 1000
         total_trades = len(results)
         
@@ -513,7 +642,8 @@ def tournament_load_test():
                 'avg_execution_time_ms': avg_execution_time,
                 'max_execution_time_ms': max_execution_time,
                 'min_execution_time_ms': min_execution_time,
-                'throughput_tps': total_trades / (total_time / 1000) if total_time > 0 else 0
+                'throughput_tps': total_trades / (total_time / 1000) if total_time > 0 else 0,
+                'trade_queue': service.trade_queue.metrics()
             },
             'errors_sample': errors[:10],  # 只返回前10個錯誤
             'timestamp': datetime.utcnow().isoformat()
@@ -95,7 +95,9 @@ CREATE TABLE tournament_trades_2025_03 PARTITION OF tournament_trades
 -- 根據需要添加更多分區
 
 -- 交易表高效能索引
-CREATE INDEX idx_tournament_trades_user_time ON tournament_trades(tournament_id, user_id, executed_at DESC);
+-- 成交紀錄以 (executed_at, id) 游標分頁，id 為同時間成交的排序依據
+CREATE INDEX idx_tournament_trades_user_time ON tournament_trades(tournament_id, user_id, executed_at DESC, id DESC);
+CREATE INDEX idx_tournament_trades_time ON tournament_trades(tournament_id, executed_at DESC, id DESC);
 CREATE INDEX idx_tournament_trades_symbol_time ON tournament_trades(tournament_id, symbol, executed_at DESC);
 CREATE INDEX idx_tournament_trades_status ON tournament_trades(tournament_id, status);
 CREATE INDEX idx_tournament_trades_side_time ON tournament_trades(tournament_id, side, executed_at DESC);
@@ -149,6 +151,28 @@ CREATE INDEX idx_tournament_snapshots_leaderboard ON tournament_snapshots(tourna
 CREATE INDEX idx_tournament_snapshots_user_history ON tournament_snapshots(tournament_id, user_id, as_of_date DESC);
 CREATE INDEX idx_tournament_snapshots_daily_return ON tournament_snapshots(tournament_id, as_of_date DESC, daily_return DESC);
 
+-- 盤中快照表（依排程間隔寫入，收盤彙總為每日快照後刪除）
+CREATE TABLE tournament_snapshots_intraday (
+    tournament_id uuid NOT NULL REFERENCES tournaments(id) ON DELETE CASCADE,
+    user_id uuid NOT NULL,
+    snapshot_at timestamptz NOT NULL,
+    as_of_date date NOT NULL,
+    cash_balance numeric NOT NULL,
+    equity_value numeric NOT NULL,
+    total_assets numeric NOT NULL,
+    daily_return numeric DEFAULT 0,
+    twr_return numeric DEFAULT 0,
+    max_dd numeric DEFAULT 0,
+    sharpe_ratio numeric DEFAULT 0,
+    win_rate numeric DEFAULT 0,
+    total_trades integer DEFAULT 0,
+    PRIMARY KEY (tournament_id, user_id, snapshot_at)
+);
+
+-- 盤中快照索引（支援最新排名與收盤清除）
+CREATE INDEX idx_tournament_snapshots_intraday_latest ON tournament_snapshots_intraday(tournament_id, snapshot_at DESC, total_assets DESC);
+CREATE INDEX idx_tournament_snapshots_intraday_date ON tournament_snapshots_intraday(tournament_id, as_of_date);
+
 -- ========================================
 -- 7. 審計日誌表（合規和監控）
 -- ========================================
@@ -295,6 +319,269 @@ BEGIN
 END;
 $$;
 
+-- 單一事務執行錦標賽交易（驗證 + 記錄交易 + 更新投資組合 + 更新持倉）
+-- 取代 insert + update_tournament_portfolio_buy/sell + update_tournament_position 三次往返
+CREATE OR REPLACE FUNCTION execute_tournament_trade(
+    p_trade_id uuid,
+    p_tournament_id uuid,
+    p_user_id uuid,
+    p_symbol text,
+    p_side text,
+    p_qty numeric,
+    p_price numeric,
+    p_total_amount numeric,
+    p_executed_at timestamptz DEFAULT now(),
+    p_trade_ref text DEFAULT NULL
+)
+RETURNS jsonb
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_cash_balance numeric;
+    v_equity_value numeric;
+    v_current_qty numeric;
+    v_current_avg_cost numeric;
+    v_new_qty numeric;
+    v_new_avg_cost numeric;
+    v_trade tournament_trades%ROWTYPE;
+    v_portfolio tournament_portfolios%ROWTYPE;
+BEGIN
+    IF p_side NOT IN ('buy', 'sell') THEN
+        RAISE EXCEPTION '無效的交易方向: %', p_side USING ERRCODE = 'check_violation';
+    END IF;
+    
+    -- 鎖定投資組合（同一帳戶的交易在此序列化）
+    SELECT cash_balance, equity_value
+    INTO v_cash_balance, v_equity_value
+    FROM tournament_portfolios
+    WHERE tournament_id = p_tournament_id
+      AND user_id = p_user_id
+    FOR UPDATE;
+    
+    IF NOT FOUND THEN
+        RAISE EXCEPTION '投資組合更新失敗：用戶 % 在錦標賽 % 中不存在', p_user_id, p_tournament_id;
+    END IF;
+    
+    -- 鎖定持倉
+    SELECT qty, avg_cost
+    INTO v_current_qty, v_current_avg_cost
+    FROM tournament_positions
+    WHERE tournament_id = p_tournament_id
+      AND user_id = p_user_id
+      AND symbol = p_symbol
+    FOR UPDATE;
+    
+    v_current_qty := COALESCE(v_current_qty, 0);
+    v_current_avg_cost := COALESCE(v_current_avg_cost, 0);
+    
+    -- 驗證並計算新的數量和成本
+    IF p_side = 'buy' THEN
+        IF v_cash_balance < p_total_amount THEN
+            RAISE EXCEPTION '資金不足: 需要 $%, 可用 $%', p_total_amount, v_cash_balance USING ERRCODE = 'check_violation';
+        END IF;
+        
+        v_new_qty := v_current_qty + p_qty;
+        -- 加權平均成本計算
+        IF v_current_qty > 0 THEN
+            v_new_avg_cost := ((v_current_qty * v_current_avg_cost) + (p_qty * p_price)) / v_new_qty;
+        ELSE
+            v_new_avg_cost := p_price;
+        END IF;
+    ELSE -- sell
+        IF v_current_qty < p_qty THEN
+            RAISE EXCEPTION '持股不足: 需要 % 股, 可用 % 股', p_qty, v_current_qty USING ERRCODE = 'check_violation';
+        END IF;
+        
+        v_new_qty := v_current_qty - p_qty;
+        v_new_avg_cost := v_current_avg_cost; -- 賣出時成本不變
+    END IF;
+    
+    -- 1. 記錄交易
+    INSERT INTO tournament_trades (id, tournament_id, user_id, symbol, side, qty, price, total_amount, executed_at, status, trade_ref)
+    VALUES (p_trade_id, p_tournament_id, p_user_id, p_symbol, p_side, p_qty, p_price, p_total_amount, p_executed_at, 'executed', p_trade_ref)
+    RETURNING * INTO v_trade;
+    
+    -- 2. 更新投資組合
+    UPDATE tournament_portfolios
+    SET
+        cash_balance = cash_balance + CASE WHEN p_side = 'buy' THEN -p_total_amount ELSE p_total_amount END,
+        equity_value = equity_value + CASE WHEN p_side = 'buy' THEN p_total_amount ELSE -p_total_amount END,
+        last_trade_at = now(),
+        updated_at = now(),
+        version = version + 1
+    WHERE tournament_id = p_tournament_id
+      AND user_id = p_user_id
+    RETURNING * INTO v_portfolio;
+    
+    -- 3. 更新持倉（清倉時刪除記錄）
+    IF v_new_qty > 0 THEN
+        INSERT INTO tournament_positions (tournament_id, user_id, symbol, qty, avg_cost, last_trade_at, updated_at, version)
+        VALUES (p_tournament_id, p_user_id, p_symbol, v_new_qty, v_new_avg_cost, now(), now(), 1)
+        ON CONFLICT (tournament_id, user_id, symbol)
+        DO UPDATE SET
+            qty = v_new_qty,
+            avg_cost = v_new_avg_cost,
+            last_trade_at = now(),
+            updated_at = now(),
+            version = tournament_positions.version + 1;
+    ELSE
+        DELETE FROM tournament_positions
+        WHERE tournament_id = p_tournament_id
+          AND user_id = p_user_id
+          AND symbol = p_symbol;
+    END IF;
+    
+    RETURN jsonb_build_object(
+        'trade', to_jsonb(v_trade),
+        'portfolio', jsonb_build_object(
+            'cash_balance', v_portfolio.cash_balance,
+            'equity_value', v_portfolio.equity_value,
+            'total_assets', v_portfolio.total_assets,
+            'updated_at', v_portfolio.updated_at
+        ),
+        'position', jsonb_build_object(
+            'qty', v_new_qty,
+            'avg_cost', v_new_avg_cost
+        )
+    );
+END;
+$$;
+
+-- 批量執行錦標賽交易（一次多列寫入交易記錄 + 依帳戶 / 股票彙總後集合式更新）
+-- 交易已在應用層依序驗證，此處以投資組合版本號確認驗證後帳戶未被其他交易變動
+CREATE OR REPLACE FUNCTION execute_tournament_trade_batch(
+    p_trades jsonb,     -- [{id, tournament_id, user_id, symbol, side, qty, price, total_amount, executed_at, trade_ref}]
+    p_accounts jsonb,   -- [{tournament_id, user_id, expected_version, cash_delta}]
+    p_positions jsonb   -- [{tournament_id, user_id, symbol, qty_delta, avg_cost}]
+)
+RETURNS jsonb
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_conflicts integer;
+    v_inserted integer;
+    v_portfolios jsonb;
+    v_positions jsonb;
+BEGIN
+    -- 依固定順序鎖定所有相關投資組合（避免死鎖）
+    PERFORM 1
+    FROM tournament_portfolios p
+    JOIN jsonb_to_recordset(p_accounts) AS a(tournament_id uuid, user_id uuid, expected_version integer, cash_delta numeric)
+      ON p.tournament_id = a.tournament_id
+     AND p.user_id = a.user_id
+    ORDER BY p.tournament_id, p.user_id
+    FOR UPDATE OF p;
+    
+    -- 驗證後帳戶已變動則整批重試
+    SELECT COUNT(*)
+    INTO v_conflicts
+    FROM jsonb_to_recordset(p_accounts) AS a(tournament_id uuid, user_id uuid, expected_version integer, cash_delta numeric)
+    LEFT JOIN tournament_portfolios p
+      ON p.tournament_id = a.tournament_id
+     AND p.user_id = a.user_id
+    WHERE p.version IS DISTINCT FROM a.expected_version;
+    
+    IF v_conflicts > 0 THEN
+        RAISE EXCEPTION '% 個帳戶在驗證後已變動，請重新驗證', v_conflicts USING ERRCODE = 'serialization_failure';
+    END IF;
+    
+    -- 1. 多列寫入交易記錄
+    INSERT INTO tournament_trades (id, tournament_id, user_id, symbol, side, qty, price, total_amount, executed_at, status, trade_ref)
+    SELECT t.id, t.tournament_id, t.user_id, t.symbol, t.side, t.qty, t.price, t.total_amount,
+           COALESCE(t.executed_at, now()), 'executed', t.trade_ref
+    FROM jsonb_to_recordset(p_trades) AS t(id uuid, tournament_id uuid, user_id uuid, symbol text, side text,
+                                           qty numeric, price numeric, total_amount numeric,
+                                           executed_at timestamptz, trade_ref text);
+    
+    GET DIAGNOSTICS v_inserted = ROW_COUNT;
+    
+    -- 2. 套用每個帳戶彙總後的現金變動
+    WITH updated AS (
+        UPDATE tournament_portfolios p
+        SET
+            cash_balance = p.cash_balance + a.cash_delta,
+            equity_value = p.equity_value - a.cash_delta,
+            last_trade_at = now(),
+            updated_at = now(),
+            version = p.version + 1
+        FROM jsonb_to_recordset(p_accounts) AS a(tournament_id uuid, user_id uuid, expected_version integer, cash_delta numeric)
+        WHERE p.tournament_id = a.tournament_id
+          AND p.user_id = a.user_id
+        RETURNING p.tournament_id, p.user_id, p.cash_balance, p.equity_value, p.total_assets, p.updated_at
+    )
+    SELECT COALESCE(jsonb_agg(to_jsonb(updated)), '[]'::jsonb)
+    INTO v_portfolios
+    FROM updated;
+    
+    -- 3. 套用每個帳戶 / 股票彙總後的持倉變動
+    WITH upserted AS (
+        INSERT INTO tournament_positions AS tp (tournament_id, user_id, symbol, qty, avg_cost, last_trade_at, updated_at, version)
+        SELECT x.tournament_id, x.user_id, x.symbol, x.qty_delta, x.avg_cost, now(), now(), 1
+        FROM jsonb_to_recordset(p_positions) AS x(tournament_id uuid, user_id uuid, symbol text, qty_delta numeric, avg_cost numeric)
+        ON CONFLICT (tournament_id, user_id, symbol)
+        DO UPDATE SET
+            qty = tp.qty + EXCLUDED.qty,
+            avg_cost = EXCLUDED.avg_cost,
+            last_trade_at = now(),
+            updated_at = now(),
+            version = tp.version + 1
+        RETURNING tp.tournament_id, tp.user_id, tp.symbol, tp.qty, tp.avg_cost
+    )
+    SELECT COALESCE(jsonb_agg(to_jsonb(upserted)), '[]'::jsonb)
+    INTO v_positions
+    FROM upserted;
+    
+    -- 清倉時刪除記錄
+    DELETE FROM tournament_positions tp
+    USING jsonb_to_recordset(p_positions) AS x(tournament_id uuid, user_id uuid, symbol text, qty_delta numeric, avg_cost numeric)
+    WHERE tp.tournament_id = x.tournament_id
+      AND tp.user_id = x.user_id
+      AND tp.symbol = x.symbol
+      AND tp.qty <= 0;
+    
+    RETURN jsonb_build_object(
+        'trades_inserted', v_inserted,
+        'portfolios', v_portfolios,
+        'positions', v_positions
+    );
+END;
+$$;
+
+-- 維護錦標賽參與人數計數（加入 / 退出時增減 tournaments.current_participants）
+-- 取代列表查詢時逐場計算 tournament_members 的 N+1 查詢
+CREATE OR REPLACE FUNCTION sync_tournament_participants()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    IF TG_OP IN ('DELETE', 'UPDATE') THEN
+        UPDATE tournaments
+        SET current_participants = GREATEST(current_participants - 1, 0),
+            updated_at = now()
+        WHERE id = OLD.tournament_id;
+    END IF;
+    
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        UPDATE tournaments
+        SET current_participants = current_participants + 1,
+            updated_at = now()
+        WHERE id = NEW.tournament_id;
+    END IF;
+    
+    RETURN NULL;
+END;
+$$;
+
+CREATE TRIGGER trg_tournament_members_count
+AFTER INSERT OR DELETE OR UPDATE OF tournament_id ON tournament_members
+FOR EACH ROW EXECUTE FUNCTION sync_tournament_participants();
+
+-- 既有資料回填參與人數
+UPDATE tournaments t
+SET current_participants = (
+    SELECT COUNT(*) FROM tournament_members tm WHERE tm.tournament_id = t.id
+);
+
 -- 獲取錦標賽實時統計
 CREATE OR REPLACE FUNCTION get_tournament_stats(p_tournament_id uuid)
 RETURNS jsonb
@@ -333,6 +620,32 @@ BEGIN
 END;
 $$;
 
+-- 用戶在各錦標賽的交易筆數（/api/user-tournaments 交易計數器重建用）
+-- 錦標賽交易（tournament_trades）與一般交易 API 寫入的 portfolio_transactions 合計，
+-- 排除加入錦標賽的標記紀錄；皆走 (tournament_id, user_id ...) 索引
+CREATE OR REPLACE FUNCTION get_user_trade_counts(p_user_id uuid, p_tournament_ids uuid[])
+RETURNS TABLE (tournament_id uuid, trade_count bigint)
+LANGUAGE plpgsql
+STABLE
+AS $$
+BEGIN
+    RETURN QUERY
+    SELECT t.tournament_id, COUNT(*)::bigint
+    FROM (
+        SELECT tt.tournament_id FROM tournament_trades tt
+        WHERE tt.tournament_id = ANY(p_tournament_ids)
+          AND tt.user_id = p_user_id
+          AND tt.status = 'executed'
+        UNION ALL
+        SELECT pt.tournament_id FROM portfolio_transactions pt
+        WHERE pt.tournament_id = ANY(p_tournament_ids)
+          AND pt.user_id = p_user_id
+          AND pt.action IN ('buy', 'sell')
+    ) t
+    GROUP BY t.tournament_id;
+END;
+$$;
+
 -- ========================================
 -- 9. 性能優化設置
 -- ========================================
@@ -414,6 +727,7 @@ COMMENT ON TABLE tournament_trades IS '錦標賽交易表（按月分區，支
 COMMENT ON TABLE tournament_portfolios IS '錦標賽投資組合表（樂觀鎖版本控制）';
 COMMENT ON TABLE tournament_positions IS '錦標賽持倉表（實時更新）';
 COMMENT ON TABLE tournament_snapshots IS '錦標賽快照表（排行榜和統計）';
+COMMENT ON TABLE tournament_snapshots_intraday IS '錦標賽盤中快照表（收盤後彙總至每日快照）';
 COMMENT ON VIEW tournament_performance_monitor IS '錦標賽性能監控視圖';
 
 -- 完成
@@ -6,7 +6,7 @@
 1. 完全數據隔離 - 錦標賽數據與日常交易分離
 2. 併發安全 - 原子操作和樂觀鎖機制
 3. 高效能快取 - 多層快取策略
-4. 實時更新 - WebSocket 支援
+4. 實時更新 - SSE 即時推播（成交與排名變動）
 5. 監控告警 - 完整的性能監控
 """
 
@@ -20,9 +20,27 @@ import threading
 from typing import Dict, List, Optional, Tuple
 from dataclasses import dataclass, asdict
 import asyncio
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import ThreadPoolExecutor, Future
 import redis
-from supabase import create_client, Client
+from supabase import Client
+
+from postgrest.exceptions import APIError
+
+import cache_codec
+from redis_cache import cache_get_many, cache_set_many, cache_delete_many
+from lock_manager import LockManager, LockHandle
+from trade_queue import AccountTradeQueue
+from tournament_status import TournamentStatusCache
+from leaderboard import get_realtime_leaderboard
+from snapshot_engine import get_snapshot_engine, value_accounts
+from tournament_stats import TournamentStatsTracker
+from activity_metrics import TradeActivityCounter
+from realtime_hub import get_realtime_hub, user_topic, leaderboard_topic
+from delta_sync import get_delta_tracker, DeltaResult
+from http_cache import get_http_cache, leaderboard_scope, TOURNAMENTS_SCOPE
+from keyset_pagination import fetch_page, DEFAULT_PAGE_SIZE
+from data_access import record, select_records, decode_records, fetch_all, TournamentTradeRecord
+from tournament_catalog import get_tournament_catalog
 
 logger = logging.getLogger(__name__)
 
@@ -39,14 +57,15 @@ class TournamentTrade:
     executed_at: str
     status: str = 'executed'
     trade_id: str = None
+    trade_ref: str = None  # 客戶端訂單編號（client_order_id）
     
     def __post_init__(self):
         if self.trade_id is None:
             self.trade_id = str(uuid.uuid4())
 
-@dataclass 
+@record('tournament_portfolios')
 class TournamentPortfolio:
-    """錦標賽投資組合數據結構"""
+    """錦標賽投資組合數據結構（欄位即數據庫查詢投影）"""
     tournament_id: str
     user_id: str
     cash_balance: float
@@ -64,16 +83,55 @@ class TournamentTradingService:
     def __init__(self, supabase_client: Client, redis_client: redis.Redis = None):
         self.supabase = supabase_client
         self.redis = redis_client
-        self.executor = ThreadPoolExecutor(max_workers=20)  # 處理併發交易
+        self.executor = ThreadPoolExecutor(max_workers=20, thread_name_prefix='tournament-trade')  # 處理併發交易
+        self.trade_queue = AccountTradeQueue(self.executor)  # 每個帳戶一條序列佇列
+        
+        # 錦標賽狀態本地快取（定期刷新 + Redis pub/sub 失效通知）
+        self.status_cache = TournamentStatusCache(supabase_client, redis_client)
+        self.status_cache.start()
+        
+        # 即時排行榜（逐筆交易與股價更新增量維護）
+        self.leaderboard = get_realtime_leaderboard(redis_client)
+        
+        # 快照績效引擎（每位參與者 O(1) 增量計算）
+        self.snapshot_engine = get_snapshot_engine(supabase_client, redis_client)
+        
+        # 錦標賽統計計數器（成交時累加，定期與數據庫校正）
+        self.stats_tracker = TournamentStatsTracker(supabase_client, redis_client, self.leaderboard)
+        
+        # 交易活動滑動視窗計數（性能監控用）
+        self.activity = TradeActivityCounter(redis_client)
+        
+        # 即時推播（成交與排名變動）
+        self.realtime = get_realtime_hub(redis_client)
+        
+        # 版本化差異回應（since=<version> 只回傳變動的列）
+        self.delta_tracker = get_delta_tracker(redis_client)
+        
+        # HTTP 快取版本號（排行榜與錦標賽列表變動時遞增）
+        self.http_cache = get_http_cache(redis_client)
+        
+        # 錦標賽目錄、參與索引與用戶交易筆數
+        self.catalog = get_tournament_catalog(supabase_client, redis_client, self.http_cache)
         
         # 快取配置
         self.PORTFOLIO_CACHE_TTL = 60  # 投資組合快取1分鐘
         self.POSITION_CACHE_TTL = 30   # 持倉快取30秒
         self.PRICE_CACHE_TTL = 10      # 股價快取10秒
+        self.ACTIVE_TOURNAMENTS_CACHE_TTL = 30  # 進行中錦標賽列表快取30秒（參與人數變動時清除）
+        self.ACTIVE_TOURNAMENTS_CACHE_KEY = 'tournament_active_list'
+        
+        # 數據庫交易函數的驗證錯誤代碼（check_violation）
+        self.TRADE_VALIDATION_ERROR_CODE = '23514'
+        # 批量交易驗證後帳戶已變動（serialization_failure）
+        self.BULK_CONFLICT_ERROR_CODE = '40001'
+        self.BULK_MAX_RETRIES = 3
+        self.BULK_QUERY_CHUNK_SIZE = 200  # in_ 查詢每批鍵值數（避免 URL 過長）
         
         # 併發控制
-        self.trade_locks = {}  # 每個用戶的交易鎖
         self.lock_timeout = 30  # 鎖定超時30秒
+        self.lock_wait_timeout = 5  # 等待交易鎖最長5秒
+        self.lock_manager = LockManager(redis_client, lease_ttl=self.lock_timeout, wait_timeout=self.lock_wait_timeout)
         
         logger.info("🚀 TournamentTradingService 初始化完成")
     
@@ -82,42 +140,28 @@ class TournamentTradingService:
         lock_key = f"trade_lock:{tournament_id}:{user_id}"
         return lock_key
     
-    def _acquire_trade_lock(self, tournament_id: str, user_id: str) -> bool:
-        """獲取交易鎖（防止併發交易衝突）"""
+    def _acquire_trade_lock(self, tournament_id: str, user_id: str) -> Optional[LockHandle]:
+        """獲取交易鎖（依序排隊等待，逾時回傳 None）"""
         lock_key = self._get_user_trade_lock(tournament_id, user_id)
-        
-        if self.redis:
-            # 使用 Redis 分散式鎖
-            return self.redis.set(lock_key, "locked", ex=self.lock_timeout, nx=True)
-        else:
-            # 使用本地鎖
-            if lock_key in self.trade_locks:
-                lock_time = self.trade_locks[lock_key]
-                if time.time() - lock_time < self.lock_timeout:
-                    return False
-            
-            self.trade_locks[lock_key] = time.time()
-            return True
+        return self.lock_manager.acquire(lock_key, wait_timeout=self.lock_wait_timeout)
     
-    def _release_trade_lock(self, tournament_id: str, user_id: str):
-        """釋放交易鎖"""
-        lock_key = self._get_user_trade_lock(tournament_id, user_id)
-        
-        if self.redis:
-            self.redis.delete(lock_key)
-        else:
-            self.trade_locks.pop(lock_key, None)
+    @staticmethod
+    def _portfolio_cache_key(tournament_id: str, user_id: str) -> str:
+        return f"tournament_portfolio:{tournament_id}:{user_id}"
+    
+    @staticmethod
+    def _position_cache_key(tournament_id: str, user_id: str, symbol: str) -> str:
+        return f"tournament_position:{tournament_id}:{user_id}:{symbol}"
     
     def _get_cached_portfolio(self, tournament_id: str, user_id: str) -> Optional[TournamentPortfolio]:
         """從快取獲取投資組合"""
-        cache_key = f"tournament_portfolio:{tournament_id}:{user_id}"
+        cache_key = self._portfolio_cache_key(tournament_id, user_id)
         
         if self.redis:
             try:
-                cached_data = self.redis.get(cache_key)
+                cached_data = cache_get_many(self.redis, [cache_key])[0]
                 if cached_data:
-                    data = json.loads(cached_data)
-                    return TournamentPortfolio(**data)
+                    return TournamentPortfolio(**cached_data)
             except Exception as e:
                 logger.error(f"Redis 快取讀取失敗: {e}")
         
@@ -125,35 +169,57 @@ class TournamentTradingService:
     
     def _set_cached_portfolio(self, portfolio: TournamentPortfolio):
         """設定投資組合快取"""
-        cache_key = f"tournament_portfolio:{portfolio.tournament_id}:{portfolio.user_id}"
+        cache_key = self._portfolio_cache_key(portfolio.tournament_id, portfolio.user_id)
         
         if self.redis:
             try:
-                self.redis.setex(cache_key, self.PORTFOLIO_CACHE_TTL, json.dumps(asdict(portfolio)))
+                cache_set_many(self.redis, {cache_key: asdict(portfolio)}, self.PORTFOLIO_CACHE_TTL)
             except Exception as e:
                 logger.error(f"Redis 快取寫入失敗: {e}")
     
-    def _get_tournament_portfolio(self, tournament_id: str, user_id: str) -> Optional[TournamentPortfolio]:
+    def _get_cached_account(self, tournament_id: str, user_id: str, symbol: str) -> Tuple[Optional[TournamentPortfolio], Optional[Dict]]:
+        """一次 Redis 往返同時讀取投資組合與單一持倉快取"""
+        if not self.redis:
+            return None, None
+        
+        try:
+            portfolio_data, position = cache_get_many(self.redis, [
+                self._portfolio_cache_key(tournament_id, user_id),
+                self._position_cache_key(tournament_id, user_id, symbol)
+            ])
+            portfolio = TournamentPortfolio(**portfolio_data) if portfolio_data else None
+            return portfolio, position
+        except Exception as e:
+            logger.error(f"Redis 帳戶快取讀取失敗: {e}")
+            return None, None
+    
+    def _invalidate_account_cache(self, tournament_id: str, user_id: str, symbols: List[str]):
+        """一次往返清除投資組合與持倉快取"""
+        if not self.redis:
+            return
+        
+        keys = [self._portfolio_cache_key(tournament_id, user_id)]
+        keys.extend(self._position_cache_key(tournament_id, user_id, symbol) for symbol in symbols)
+        try:
+            cache_delete_many(self.redis, keys)
+        except Exception as e:
+            logger.error(f"Redis 快取清除失敗: {e}")
+    
+    def _get_tournament_portfolio(self, tournament_id: str, user_id: str,
+                                  cached_portfolio: Optional[TournamentPortfolio] = None) -> Optional[TournamentPortfolio]:
         """獲取錦標賽投資組合（優先快取）"""
         # 先從快取獲取
-        cached_portfolio = self._get_cached_portfolio(tournament_id, user_id)
+        if cached_portfolio is None:
+            cached_portfolio = self._get_cached_portfolio(tournament_id, user_id)
         if cached_portfolio:
             return cached_portfolio
         
         # 快取未命中，從數據庫獲取
         try:
-            result = self.supabase.table('tournament_portfolios').select('*').eq('tournament_id', tournament_id).eq('user_id', user_id).execute()
+            result = select_records(self.supabase, TournamentPortfolio).eq('tournament_id', tournament_id).eq('user_id', user_id).execute()
             
             if result.data:
-                data = result.data[0]
-                portfolio = TournamentPortfolio(
-                    tournament_id=data['tournament_id'],
-                    user_id=data['user_id'],
-                    cash_balance=float(data['cash_balance']),
-                    equity_value=float(data['equity_value']),
-                    total_assets=float(data['total_assets']),
-                    updated_at=data['updated_at']
-                )
+                portfolio = TournamentPortfolio.from_row(result.data[0])
                 
                 # 更新快取
                 self._set_cached_portfolio(portfolio)
@@ -190,98 +256,61 @@ class TournamentTradingService:
     
     def _get_position(self, tournament_id: str, user_id: str, symbol: str) -> Dict:
         """獲取持倉信息"""
-        cache_key = f"tournament_position:{tournament_id}:{user_id}:{symbol}"
+        return self.get_positions(tournament_id, user_id, [symbol])[symbol]
+    
+    def get_positions(self, tournament_id: str, user_id: str, symbols: List[str]) -> Dict[str, Dict]:
+        """批次獲取持倉信息（快取一次往返，未命中部分一次查詢數據庫）"""
+        positions = {}
+        cache_keys = [self._position_cache_key(tournament_id, user_id, symbol) for symbol in symbols]
         
         # 檢查快取
         if self.redis:
             try:
-                cached_data = self.redis.get(cache_key)
-                if cached_data:
-                    return json.loads(cached_data)
+                for symbol, cached_data in zip(symbols, cache_get_many(self.redis, cache_keys)):
+                    if cached_data:
+                        positions[symbol] = cached_data
             except Exception as e:
                 logger.error(f"Redis 持倉快取讀取失敗: {e}")
         
+        missing = [symbol for symbol in symbols if symbol not in positions]
+        if not missing:
+            return positions
+        
         # 從數據庫獲取
         try:
-            result = self.supabase.table('tournament_positions').select('*').eq('tournament_id', tournament_id).eq('user_id', user_id).eq('symbol', symbol).execute()
+            result = self.supabase.table('tournament_positions').select('symbol, qty, avg_cost').eq('tournament_id', tournament_id).eq('user_id', user_id).in_('symbol', missing).execute()
             
-            if result.data:
-                position = {
-                    'qty': float(result.data[0]['qty']),
-                    'avg_cost': float(result.data[0]['avg_cost'])
+            loaded = {symbol: {'qty': 0.0, 'avg_cost': 0.0} for symbol in missing}
+            for row in result.data:
+                loaded[row['symbol']] = {
+                    'qty': float(row['qty']),
+                    'avg_cost': float(row['avg_cost'])
                 }
-            else:
-                position = {'qty': 0.0, 'avg_cost': 0.0}
             
             # 更新快取
             if self.redis:
-                self.redis.setex(cache_key, self.POSITION_CACHE_TTL, json.dumps(position))
+                cache_set_many(self.redis, {
+                    self._position_cache_key(tournament_id, user_id, symbol): position
+                    for symbol, position in loaded.items()
+                }, self.POSITION_CACHE_TTL)
             
-            return position
+            positions.update(loaded)
             
         except Exception as e:
             logger.error(f"獲取持倉失敗: {e}")
-            return {'qty': 0.0, 'avg_cost': 0.0}
-    
-    def _update_portfolio_atomic(self, tournament_id: str, user_id: str, side: str, amount: float):
-        """原子性更新投資組合"""
-        try:
-            if side == 'buy':
-                # 買入：減少現金，增加股票價值
-                result = self.supabase.rpc('update_tournament_portfolio_buy', {
-                    'p_tournament_id': tournament_id,
-                    'p_user_id': user_id,
-                    'p_amount': amount
-                }).execute()
-            else:
-                # 賣出：增加現金，減少股票價值
-                result = self.supabase.rpc('update_tournament_portfolio_sell', {
-                    'p_tournament_id': tournament_id,
-                    'p_user_id': user_id,
-                    'p_amount': amount
-                }).execute()
-            
-            # 清除快取
-            cache_key = f"tournament_portfolio:{tournament_id}:{user_id}"
-            if self.redis:
-                self.redis.delete(cache_key)
-            
-            logger.info(f"✅ 原子性更新投資組合: {side} ${amount}")
-            
-        except Exception as e:
-            logger.error(f"原子性更新投資組合失敗: {e}")
-            raise
-    
-    def _update_position_atomic(self, tournament_id: str, user_id: str, symbol: str, side: str, qty: float, price: float):
-        """原子性更新持倉"""
-        try:
-            result = self.supabase.rpc('update_tournament_position', {
-                'p_tournament_id': tournament_id,
-                'p_user_id': user_id,
-                'p_symbol': symbol,
-                'p_side': side,
-                'p_qty': qty,
-                'p_price': price
-            }).execute()
-            
-            # 清除持倉快取
-            cache_key = f"tournament_position:{tournament_id}:{user_id}:{symbol}"
-            if self.redis:
-                self.redis.delete(cache_key)
-            
-            logger.info(f"✅ 原子性更新持倉: {symbol} {side} {qty}@{price}")
-            
-        except Exception as e:
-            logger.error(f"原子性更新持倉失敗: {e}")
-            raise
+            for symbol in missing:
+                positions[symbol] = {'qty': 0.0, 'avg_cost': 0.0}
+        
+        return positions
     
     def execute_tournament_trade(self, trade: TournamentTrade) -> Dict:
         """執行錦標賽交易（主要入口點）"""
         start_time = time.time()
         
         try:
-            # 1. 獲取交易鎖
-            if not self._acquire_trade_lock(trade.tournament_id, trade.user_id):
+            # 1. 獲取交易鎖（同一用戶的交易依序排隊）
+            trade_lock = self._acquire_trade_lock(trade.tournament_id, trade.user_id)
+            if trade_lock is None:
                 raise ValueError("用戶有交易進行中，請稍後重試")
             
             try:
@@ -289,17 +318,24 @@ class TournamentTradingService:
                 if not self._verify_tournament_active(trade.tournament_id):
                     raise ValueError("錦標賽未開始或已結束")
                 
-                # 3. 獲取用戶投資組合
-                portfolio = self._get_tournament_portfolio(trade.tournament_id, trade.user_id)
+                # 3. 獲取用戶投資組合與持倉（一次快取往返）
+                cached_portfolio, cached_position = self._get_cached_account(trade.tournament_id, trade.user_id, trade.symbol)
+                portfolio = self._get_tournament_portfolio(trade.tournament_id, trade.user_id, cached_portfolio)
                 if not portfolio:
                     # 創建初始投資組合
                     portfolio = self._create_initial_portfolio(trade.tournament_id, trade.user_id)
                 
                 # 4. 驗證交易合法性
-                self._validate_trade(portfolio, trade)
+                self._validate_trade(portfolio, trade, cached_position)
                 
-                # 5. 執行原子性交易
-                trade_result = self._execute_atomic_transaction(portfolio, trade)
+                # 5. 執行原子性交易（排行榜載入中時等待，載入不會覆蓋此筆成交）
+                self.leaderboard.begin_trade(trade.tournament_id, trade.trade_id)
+                try:
+                    trade_result = self._execute_atomic_transaction(portfolio, trade)
+                except Exception:
+                    self.leaderboard.end_trade(trade.tournament_id, trade.trade_id)
+                    raise
+                self._record_leaderboard_trade(trade, portfolio.total_assets, gate_token=trade.trade_id)
                 
                 # 6. 記錄性能指標
                 execution_time = (time.time() - start_time) * 1000  # 轉換為毫秒
@@ -314,37 +350,21 @@ class TournamentTradingService:
                 
             finally:
                 # 釋放交易鎖
-                self._release_trade_lock(trade.tournament_id, trade.user_id)
+                trade_lock.release()
                 
         except Exception as e:
             logger.error(f"錦標賽交易執行失敗: {e}")
             raise
     
+    def submit_tournament_trade(self, trade: TournamentTrade) -> Future:
+        """提交交易至帳戶序列佇列（同一帳戶依序執行，不同帳戶平行），回傳 Future"""
+        return self.trade_queue.submit((trade.tournament_id, trade.user_id), self.execute_tournament_trade, trade)
+    
     def _verify_tournament_active(self, tournament_id: str) -> bool:
-        """驗證錦標賽是否進行中"""
-        cache_key = f"tournament_status:{tournament_id}"
-        
-        # 檢查快取
-        if self.redis:
-            cached_status = self.redis.get(cache_key)
-            if cached_status:
-                return cached_status.decode() == 'active'
-        
-        # 查詢數據庫
-        try:
-            result = self.supabase.table('tournaments').select('status').eq('id', tournament_id).execute()
-            if result.data:
-                status = result.data[0]['status']
-                # 快取狀態5分鐘
-                if self.redis:
-                    self.redis.setex(cache_key, 300, status)
-                return status == 'active'
-        except Exception as e:
-            logger.error(f"驗證錦標賽狀態失敗: {e}")
-        
-        return False
+        """驗證錦標賽是否進行中（本地狀態快取，無網路 I/O）"""
+        return self.status_cache.is_active(tournament_id)
     
-    def _validate_trade(self, portfolio: TournamentPortfolio, trade: TournamentTrade):
+    def _validate_trade(self, portfolio: TournamentPortfolio, trade: TournamentTrade, position: Optional[Dict] = None):
         """驗證交易合法性"""
         if trade.side == 'buy':
             # 買入驗證資金充足
@@ -353,7 +373,8 @@ class TournamentTradingService:
         
         elif trade.side == 'sell':
             # 賣出驗證持股充足
-            position = self._get_position(trade.tournament_id, trade.user_id, trade.symbol)
+            if position is None:
+                position = self._get_position(trade.tournament_id, trade.user_id, trade.symbol)
             if position['qty'] < trade.qty:
                 raise ValueError(f"持股不足: 需要 {trade.qty} 股, 可用 {position['qty']} 股")
         
@@ -361,84 +382,578 @@ class TournamentTradingService:
             raise ValueError(f"無效的交易方向: {trade.side}")
     
     def _execute_atomic_transaction(self, portfolio: TournamentPortfolio, trade: TournamentTrade) -> Dict:
-        """執行原子性交易"""
+        """執行原子性交易（單一數據庫事務：驗證、記錄交易、更新投資組合與持倉）"""
         try:
-            # 使用 Supabase 事務處理
-            # 1. 記錄交易
-            trade_record = asdict(trade)
-            trade_result = self.supabase.table('tournament_trades').insert(trade_record).execute()
-            
-            # 2. 更新投資組合
-            self._update_portfolio_atomic(trade.tournament_id, trade.user_id, trade.side, trade.total_amount)
+            result = self.supabase.rpc('execute_tournament_trade', {
+                'p_trade_id': trade.trade_id,
+                'p_tournament_id': trade.tournament_id,
+                'p_user_id': trade.user_id,
+                'p_symbol': trade.symbol,
+                'p_side': trade.side,
+                'p_qty': trade.qty,
+                'p_price': trade.price,
+                'p_total_amount': trade.total_amount,
+                'p_executed_at': trade.executed_at,
+                'p_trade_ref': trade.trade_ref
+            }).execute()
+        except APIError as e:
+            # 數據庫端驗證失敗（資金或持股不足）視為交易驗證錯誤
+            self._invalidate_account_cache(trade.tournament_id, trade.user_id, [trade.symbol])
+            if e.code == self.TRADE_VALIDATION_ERROR_CODE:
+                raise ValueError(e.message)
+            logger.error(f"原子性交易執行失敗: {e}")
+            raise
+        except Exception as e:
+            self._invalidate_account_cache(trade.tournament_id, trade.user_id, [trade.symbol])
+            logger.error(f"原子性交易執行失敗: {e}")
+            raise
+        
+        outcome = result.data or {}
+        self._refresh_account_cache(trade, outcome)
+        
+        logger.info(f"✅ 原子性交易完成: {trade.side} {trade.symbol} {trade.qty}@{trade.price}")
+        
+        return {
+            'trade_record': outcome.get('trade'),
+            'symbol': trade.symbol,
+            'side': trade.side,
+            'qty': trade.qty,
+            'price': trade.price,
+            'total_amount': trade.total_amount
+        }
+    
+    def _refresh_account_cache(self, trade: TournamentTrade, outcome: Dict):
+        """以交易事務回傳的最新狀態寫回快取（一次管線往返），下一筆交易直接命中快取"""
+        portfolio_data = outcome.get('portfolio')
+        position = outcome.get('position')
+        if not self.redis or not portfolio_data or not position:
+            self._invalidate_account_cache(trade.tournament_id, trade.user_id, [trade.symbol])
+            return
+        
+        portfolio = TournamentPortfolio(
+            tournament_id=trade.tournament_id,
+            user_id=trade.user_id,
+            cash_balance=float(portfolio_data['cash_balance']),
+            equity_value=float(portfolio_data['equity_value']),
+            total_assets=float(portfolio_data['total_assets']),
+            updated_at=portfolio_data['updated_at']
+        )
+        
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.setex(self._portfolio_cache_key(trade.tournament_id, trade.user_id),
+                       self.PORTFOLIO_CACHE_TTL, cache_codec.encode(asdict(portfolio)))
+            pipe.setex(self._position_cache_key(trade.tournament_id, trade.user_id, trade.symbol),
+                       self.POSITION_CACHE_TTL, cache_codec.encode({
+                           'qty': float(position['qty']),
+                           'avg_cost': float(position['avg_cost'])
+                       }))
+            pipe.execute()
+        except Exception as e:
+            logger.error(f"Redis 快取寫入失敗: {e}")
+            self._invalidate_account_cache(trade.tournament_id, trade.user_id, [trade.symbol])
+    
+    # ========================================
+    # 批量交易（結算 / 匯入委託檔重播）
+    # ========================================
+    
+    def execute_bulk_trades(self, trades: List[TournamentTrade]) -> Dict:
+        """批量執行錦標賽交易：記憶體中依序驗證，一次數據庫呼叫寫入全部交易與彙總變動"""
+        start_time = time.time()
+        results: List[Optional[Dict]] = [None] * len(trades)
+        
+        # 1. 驗證錦標賽狀態與交易基本欄位
+        tournament_active = {tid: self._verify_tournament_active(tid) for tid in {t.tournament_id for t in trades}}
+        candidates = []
+        for index, trade in enumerate(trades):
+            if not tournament_active[trade.tournament_id]:
+                results[index] = {'success': False, 'error': "錦標賽未開始或已結束"}
+            elif trade.qty <= 0 or trade.price <= 0:
+                results[index] = {'success': False, 'error': "交易數量與價格必須大於 0"}
+            else:
+                candidates.append((index, trade))
+        
+        # 2. 依固定順序取得所有帳戶的交易鎖（避免與其他批量交易死鎖）
+        accounts = sorted({(trade.tournament_id, trade.user_id) for _, trade in candidates})
+        lock_handles = []
+        gate_token = uuid.uuid4().hex
+        gated_tournaments = []
+        outcome = {}
+        try:
+            for tournament_id, user_id in accounts:
+                handle = self._acquire_trade_lock(tournament_id, user_id)
+                if handle is None:
+                    raise ValueError(f"帳戶交易鎖等待逾時: {tournament_id}:{user_id}")
+                lock_handles.append(handle)
             
-            # 3. 更新持倉
-            self._update_position_atomic(trade.tournament_id, trade.user_id, trade.symbol, trade.side, trade.qty, trade.price)
+            # 排行榜載入中時等待，載入不會覆蓋這批成交
+            for tournament_id in sorted({tournament_id for tournament_id, _ in accounts}):
+                self.leaderboard.begin_trade(tournament_id, gate_token)
+                gated_tournaments.append(tournament_id)
             
-            logger.info(f"✅ 原子性交易完成: {trade.side} {trade.symbol} {trade.qty}@{trade.price}")
+            for attempt in range(1, self.BULK_MAX_RETRIES + 1):
+                # 3. 批次載入投資組合與持倉
+                portfolios, versions, positions = self._load_bulk_accounts(accounts, {trade.symbol for _, trade in candidates})
+                
+                # 4. 記憶體中依序驗證並彙總變動
+                accepted, rejected, account_deltas, position_deltas = self._validate_bulk_trades(candidates, portfolios, versions, positions)
+                for index, _ in candidates:
+                    results[index] = None
+                for index, error in rejected.items():
+                    results[index] = {'success': False, 'error': error}
+                if not accepted:
+                    break
+                
+                # 5. 單一數據庫呼叫寫入
+                try:
+                    outcome = self._execute_bulk_transaction(accepted, account_deltas, position_deltas)
+                    break
+                except APIError as e:
+                    if e.code != self.BULK_CONFLICT_ERROR_CODE or attempt == self.BULK_MAX_RETRIES:
+                        raise
+                    logger.warning(f"⚠️ 批量交易帳戶已變動，重新驗證 (第 {attempt} 次)")
             
-            return {
-                'trade_record': trade_result.data[0] if trade_result.data else None,
-                'symbol': trade.symbol,
-                'side': trade.side,
-                'qty': trade.qty,
-                'price': trade.price,
-                'total_amount': trade.total_amount
-            }
+            for index, trade in candidates:
+                if results[index] is None:
+                    results[index] = {'success': True, 'trade_id': trade.trade_id}
+                    self._record_leaderboard_trade(trade)
             
         except Exception as e:
-            logger.error(f"原子性交易執行失敗: {e}")
+            logger.error(f"批量交易執行失敗: {e}")
+            self._invalidate_bulk_cache(trades)
             raise
+        finally:
+            for tournament_id in gated_tournaments:
+                self.leaderboard.end_trade(tournament_id, gate_token)
+            for handle in reversed(lock_handles):
+                handle.release()
+        
+        execution_time = (time.time() - start_time) * 1000
+        successful = sum(1 for result in results if result['success'])
+        logger.info(f"📦 批量交易寫入完成: {successful}/{len(trades)} 筆, {len(accounts)} 個帳戶, {execution_time:.2f}ms")
+        
+        return {
+            'success': successful == len(trades),
+            'total_trades': len(trades),
+            'successful_trades': successful,
+            'failed_trades': len(trades) - successful,
+            'accounts': len(accounts),
+            'execution_time_ms': execution_time,
+            'trades_inserted': outcome.get('trades_inserted', 0),
+            'results': results
+        }
+    
+    def _chunked(self, items: List) -> List[List]:
+        size = self.BULK_QUERY_CHUNK_SIZE
+        return [items[i:i + size] for i in range(0, len(items), size)]
     
-    def get_tournament_leaderboard(self, tournament_id: str, limit: int = 100) -> List[Dict]:
-        """獲取錦標賽排行榜"""
-        cache_key = f"tournament_leaderboard:{tournament_id}"
+    def _load_bulk_accounts(self, accounts: List[Tuple[str, str]], symbols: set) -> Tuple[Dict, Dict, Dict]:
+        """以 in_ 查詢批次載入投資組合（含版本號）與持倉，不存在的投資組合一次建立"""
+        users_by_tournament: Dict[str, List[str]] = {}
+        for tournament_id, user_id in accounts:
+            users_by_tournament.setdefault(tournament_id, []).append(user_id)
+        symbols = sorted(symbols)
         
-        # 檢查快取
+        portfolios: Dict[Tuple[str, str], TournamentPortfolio] = {}
+        versions: Dict[Tuple[str, str], int] = {}
+        positions: Dict[Tuple[str, str, str], Dict] = {}
+        
+        def load_portfolios(tournament_id: str, user_ids: List[str]):
+            for chunk in self._chunked(user_ids):
+                result = self.supabase.table('tournament_portfolios').select(
+                    f'{TournamentPortfolio.COLUMNS}, version'
+                ).eq('tournament_id', tournament_id).in_('user_id', chunk).execute()
+                for row in result.data:
+                    key = (tournament_id, row['user_id'])
+                    portfolios[key] = TournamentPortfolio.from_row(row)
+                    versions[key] = row['version']
+        
+        for tournament_id, user_ids in users_by_tournament.items():
+            load_portfolios(tournament_id, user_ids)
+            
+            # 創建缺少的初始投資組合
+            missing = [user_id for user_id in user_ids if (tournament_id, user_id) not in portfolios]
+            if missing:
+                now = datetime.utcnow().isoformat()
+                self.supabase.table('tournament_portfolios').upsert([
+                    {
+                        'tournament_id': tournament_id,
+                        'user_id': user_id,
+                        'cash_balance': 1000000.0,
+                        'equity_value': 0.0,
+                        'updated_at': now
+                    }
+                    for user_id in missing
+                ], on_conflict='tournament_id,user_id', ignore_duplicates=True).execute()
+                load_portfolios(tournament_id, missing)
+                logger.info(f"✅ 批量創建初始投資組合: {tournament_id}, {len(missing)} 位用戶")
+            
+            for chunk in self._chunked(user_ids):
+                result = self.supabase.table('tournament_positions').select(
+                    'user_id, symbol, qty, avg_cost'
+                ).eq('tournament_id', tournament_id).in_('user_id', chunk).in_('symbol', symbols).execute()
+                for row in result.data:
+                    positions[(tournament_id, row['user_id'], row['symbol'])] = {
+                        'qty': float(row['qty']),
+                        'avg_cost': float(row['avg_cost'])
+                    }
+        
+        return portfolios, versions, positions
+    
+    def _validate_bulk_trades(self, candidates: List[Tuple[int, TournamentTrade]], portfolios: Dict,
+                              versions: Dict, positions: Dict) -> Tuple[List[TournamentTrade], Dict[int, str], List[Dict], List[Dict]]:
+        """依提交順序在記憶體中驗證並套用交易，彙總每個帳戶 / 股票的變動"""
+        initial_cash = {key: portfolio.cash_balance for key, portfolio in portfolios.items()}
+        initial_qty = {key: position['qty'] for key, position in positions.items()}
+        
+        accepted = []
+        rejected = {}
+        touched_positions = set()
+        
+        for index, trade in candidates:
+            account_key = (trade.tournament_id, trade.user_id)
+            position_key = (trade.tournament_id, trade.user_id, trade.symbol)
+            portfolio = portfolios[account_key]
+            position = positions.setdefault(position_key, {'qty': 0.0, 'avg_cost': 0.0})
+            
+            try:
+                self._validate_trade(portfolio, trade, position)
+            except ValueError as e:
+                rejected[index] = str(e)
+                continue
+            
+            if trade.side == 'buy':
+                new_qty = position['qty'] + trade.qty
+                # 加權平均成本計算
+                if position['qty'] > 0:
+                    position['avg_cost'] = (position['qty'] * position['avg_cost'] + trade.qty * trade.price) / new_qty
+                else:
+                    position['avg_cost'] = trade.price
+                position['qty'] = new_qty
+                portfolio.cash_balance -= trade.total_amount
+                portfolio.equity_value += trade.total_amount
+            else:
+                position['qty'] -= trade.qty  # 賣出時成本不變
+                portfolio.cash_balance += trade.total_amount
+                portfolio.equity_value -= trade.total_amount
+            
+            accepted.append(trade)
+            touched_positions.add(position_key)
+        
+        touched_accounts = sorted({(trade.tournament_id, trade.user_id) for trade in accepted})
+        account_deltas = [
+            {
+                'tournament_id': tournament_id,
+                'user_id': user_id,
+                'expected_version': versions.get((tournament_id, user_id)),
+                'cash_delta': portfolios[(tournament_id, user_id)].cash_balance - initial_cash[(tournament_id, user_id)]
+            }
+            for tournament_id, user_id in touched_accounts
+        ]
+        position_deltas = [
+            {
+                'tournament_id': tournament_id,
+                'user_id': user_id,
+                'symbol': symbol,
+                'qty_delta': positions[(tournament_id, user_id, symbol)]['qty'] - initial_qty.get((tournament_id, user_id, symbol), 0.0),
+                'avg_cost': positions[(tournament_id, user_id, symbol)]['avg_cost']
+            }
+            for tournament_id, user_id, symbol in sorted(touched_positions)
+            # 批次內買入後全數賣出且原本無持倉者無需寫入
+            if (tournament_id, user_id, symbol) in initial_qty or positions[(tournament_id, user_id, symbol)]['qty'] > 0
+        ]
+        
+        return accepted, rejected, account_deltas, position_deltas
+    
+    def _execute_bulk_transaction(self, trades: List[TournamentTrade], account_deltas: List[Dict],
+                                  position_deltas: List[Dict]) -> Dict:
+        """單一數據庫事務：多列寫入交易記錄並集合式套用投資組合與持倉變動"""
+        result = self.supabase.rpc('execute_tournament_trade_batch', {
+            'p_trades': [
+                {
+                    'id': trade.trade_id,
+                    'tournament_id': trade.tournament_id,
+                    'user_id': trade.user_id,
+                    'symbol': trade.symbol,
+                    'side': trade.side,
+                    'qty': trade.qty,
+                    'price': trade.price,
+                    'total_amount': trade.total_amount,
+                    'executed_at': trade.executed_at,
+                    'trade_ref': trade.trade_ref
+                }
+                for trade in trades
+            ],
+            'p_accounts': account_deltas,
+            'p_positions': position_deltas
+        }).execute()
+        
+        outcome = result.data or {}
+        self._refresh_bulk_cache(outcome)
+        return outcome
+    
+    def _refresh_bulk_cache(self, outcome: Dict):
+        """以批量事務回傳的最新狀態寫回快取（一次管線往返）"""
+        if not self.redis:
+            return
+        
+        mapping = {}
+        for row in outcome.get('portfolios', []):
+            mapping[self._portfolio_cache_key(row['tournament_id'], row['user_id'])] = asdict(TournamentPortfolio(
+                tournament_id=row['tournament_id'],
+                user_id=row['user_id'],
+                cash_balance=float(row['cash_balance']),
+                equity_value=float(row['equity_value']),
+                total_assets=float(row['total_assets']),
+                updated_at=row['updated_at']
+            ))
+        
+        positions = {}
+        for row in outcome.get('positions', []):
+            qty = float(row['qty'])
+            positions[self._position_cache_key(row['tournament_id'], row['user_id'], row['symbol'])] = {
+                'qty': qty if qty > 0 else 0.0,
+                'avg_cost': float(row['avg_cost']) if qty > 0 else 0.0
+            }
+        
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            for key, value in mapping.items():
+                pipe.setex(key, self.PORTFOLIO_CACHE_TTL, cache_codec.encode(value))
+            for key, value in positions.items():
+                pipe.setex(key, self.POSITION_CACHE_TTL, cache_codec.encode(value))
+            pipe.execute()
+        except Exception as e:
+            logger.error(f"Redis 快取寫入失敗: {e}")
+    
+    def _invalidate_bulk_cache(self, trades: List[TournamentTrade]):
+        """批量交易失敗時清除所有相關帳戶快取"""
+        symbols_by_account: Dict[Tuple[str, str], set] = {}
+        for trade in trades:
+            symbols_by_account.setdefault((trade.tournament_id, trade.user_id), set()).add(trade.symbol)
+        for (tournament_id, user_id), symbols in symbols_by_account.items():
+            self._invalidate_account_cache(tournament_id, user_id, list(symbols))
+    
+    def get_active_tournaments(self) -> List[Dict]:
+        """獲取進行中錦標賽列表（參與人數由 current_participants 計數欄位提供，一次查詢）"""
         if self.redis:
             try:
-                cached_data = self.redis.get(cache_key)
-                if cached_data:
-                    return json.loads(cached_data)
+                cached = cache_get_many(self.redis, [self.ACTIVE_TOURNAMENTS_CACHE_KEY])[0]
+                if cached is not None:
+                    return cached
             except Exception as e:
-                logger.error(f"排行榜快取讀取失敗: {e}")
+                logger.error(f"Redis 快取讀取失敗: {e}")
+        
+        result = self.supabase.table('tournaments')\
+            .select('id, name, description, starts_at, ends_at, entry_capital, max_participants, current_participants, status')\
+            .eq('status', 'active')\
+            .execute()
+        
+        tournaments = [{
+            'id': tournament['id'],
+            'name': tournament['name'],
+            'description': tournament.get('description') or '',
+            'starts_at': tournament['starts_at'],
+            'ends_at': tournament['ends_at'],
+            'entry_capital': tournament['entry_capital'],
+            'max_participants': tournament['max_participants'],
+            'current_participants': tournament.get('current_participants') or 0,
+            'status': tournament['status']
+        } for tournament in result.data]
         
+        if self.redis:
+            try:
+                cache_set_many(self.redis, {self.ACTIVE_TOURNAMENTS_CACHE_KEY: tournaments}, self.ACTIVE_TOURNAMENTS_CACHE_TTL)
+            except Exception as e:
+                logger.error(f"Redis 快取寫入失敗: {e}")
+        return tournaments
+    
+    def invalidate_active_tournaments(self):
+        """參與者加入 / 退出或錦標賽狀態變更後清除列表快取"""
         try:
-            # 從快照表獲取最新排名
-            result = self.supabase.table('tournament_snapshots').select('*').eq('tournament_id', tournament_id).order('twr_return', desc=True).limit(limit).execute()
-            
-            leaderboard = []
-            for idx, snapshot in enumerate(result.data, 1):
-                leaderboard.append({
-                    'rank': idx,
-                    'user_id': snapshot['user_id'],
-                    'total_assets': float(snapshot['total_assets']),
-                    'twr_return': float(snapshot['twr_return']),
-                    'max_drawdown': float(snapshot.get('max_dd', 0)),
-                    'sharpe_ratio': float(snapshot.get('sharpe', 0)),
-                    'updated_at': snapshot['as_of_date']
-                })
-            
-            # 快取排行榜5分鐘
+            self.http_cache.bump([TOURNAMENTS_SCOPE])
             if self.redis:
-                self.redis.setex(cache_key, 300, json.dumps(leaderboard))
-            
-            return leaderboard
-            
+                cache_delete_many(self.redis, [self.ACTIVE_TOURNAMENTS_CACHE_KEY])
+        except Exception as e:
+            logger.error(f"Redis 快取清除失敗: {e}")
+    
+    def join_tournament(self, tournament_id: str, user_id: str, initial_balance: float = 1000000.0):
+        """加入錦標賽（重複加入不報錯，current_participants 由數據庫觸發器維護）"""
+        self.supabase.table('tournament_members').upsert({
+            'tournament_id': tournament_id,
+            'user_id': user_id,
+            'initial_balance': initial_balance
+        }, on_conflict='tournament_id,user_id', ignore_duplicates=True).execute()
+        self.invalidate_active_tournaments()
+        self.catalog.invalidate_memberships(user_id)
+    
+    def leave_tournament(self, tournament_id: str, user_id: str):
+        """退出錦標賽（current_participants 由數據庫觸發器維護）"""
+        self.supabase.table('tournament_members').delete().eq('tournament_id', tournament_id).eq('user_id', user_id).execute()
+        self.invalidate_active_tournaments()
+        self.catalog.invalidate_memberships(user_id)
+    
+    def get_tournament_leaderboard(self, tournament_id: str, limit: int = 100, offset: int = 0) -> List[Dict]:
+        """獲取錦標賽即時排行榜（Redis 有序集合與快照累積狀態，不查詢數據庫）"""
+        try:
+            self._ensure_leaderboard(tournament_id)
+            return self.snapshot_engine.performance(tournament_id, self.leaderboard.top(tournament_id, limit, offset))
         except Exception as e:
             logger.error(f"獲取排行榜失敗: {e}")
             return []
     
+    def get_tournament_leaderboard_delta(self, tournament_id: str, limit: int = 100, offset: int = 0,
+                                         since: Optional[int] = None) -> DeltaResult:
+        """獲取排行榜視窗相對 since 版本的差異（每個 limit / offset 視窗各自計算版本）"""
+        leaderboard = self.get_tournament_leaderboard(tournament_id, limit, offset)
+        return self.delta_tracker.diff(f"leaderboard:{tournament_id}:{offset}:{limit}", leaderboard, 'user_id', since)
+    
+    def get_user_rank(self, tournament_id: str, user_id: str, neighbours: int = 5) -> Optional[Dict]:
+        """獲取用戶排名、百分位數與鄰近排名（未參與回傳 None）"""
+        self._ensure_leaderboard(tournament_id)
+        context = self.leaderboard.rank_context(tournament_id, user_id, neighbours)
+        if context is not None:
+            self.snapshot_engine.performance(tournament_id, [context['user_stats'], *context['above'], *context['below']])
+        return context
+    
+    def get_leaderboard_size(self, tournament_id: str) -> int:
+        """排行榜參與人數"""
+        self._ensure_leaderboard(tournament_id)
+        return self.leaderboard.size(tournament_id)
+    
+    def get_tournament_stats(self, tournament_id: str) -> Optional[Dict]:
+        """獲取錦標賽統計（即時計數器，錦標賽不存在回傳 None）"""
+        self._ensure_leaderboard(tournament_id)
+        return self.stats_tracker.get(tournament_id)
+    
+    def get_trade_history(self, tournament_id: str, user_id: Optional[str] = None, limit: int = DEFAULT_PAGE_SIZE,
+                          cursor: Optional[str] = None) -> Tuple[List[TournamentTradeRecord], Optional[str]]:
+        """獲取錦標賽成交紀錄（鍵集分頁，回傳本頁資料與下一頁游標）"""
+        query = select_records(self.supabase, TournamentTradeRecord).eq('tournament_id', tournament_id)
+        if user_id:
+            query = query.eq('user_id', user_id)
+        rows, next_cursor = fetch_page(query, limit, cursor)
+        return decode_records(rows, TournamentTradeRecord), next_cursor
+    
+    def _load_tournament_accounts(self, tournament_id: str) -> Tuple[List[Dict], List[Dict]]:
+        """分批載入錦標賽所有參與者的投資組合與持倉（不受 PostgREST 筆數上限截斷）"""
+        portfolios = fetch_all(
+            self.supabase.table('tournament_portfolios').select('user_id, cash_balance').eq('tournament_id', tournament_id),
+            'user_id'
+        )
+        positions = fetch_all(
+            self.supabase.table('tournament_positions').select('user_id, symbol, qty, avg_cost').eq('tournament_id', tournament_id),
+            'user_id,symbol'
+        )
+        return portfolios, positions
+    
+    def _ensure_leaderboard(self, tournament_id: str):
+        """排行榜尚未建立時從數據庫載入（每場錦標賽一次，與進行中的交易互斥）"""
+        if self.leaderboard.ensure_seeded(tournament_id, lambda: self._load_tournament_accounts(tournament_id)):
+            self.http_cache.bump([leaderboard_scope(tournament_id)])
+    
+    def _record_leaderboard_trade(self, trade: TournamentTrade, prior_total_assets: Optional[float] = None,
+                                  gate_token: Optional[str] = None):
+        """成交後增量更新排行榜、快照交易計數、統計、活動與用戶交易筆數並推播成交（一次管線往返）
+
+        排名有變動時另外推播排名事件；gate_token 為 begin_trade 的登記，併入同一管線解除。
+        """
+        tournament_id, user_id = trade.tournament_id, trade.user_id
+        sign = 1 if trade.side == 'buy' else -1
+        fill = {
+            'tournament_id': tournament_id,
+            'trade_id': trade.trade_id,
+            'symbol': trade.symbol,
+            'side': trade.side,
+            'qty': trade.qty,
+            'price': trade.price,
+            'total_amount': trade.total_amount,
+            'executed_at': trade.executed_at,
+            'cash_delta': -sign * trade.total_amount,
+            'qty_delta': sign * trade.qty
+        }
+        
+        try:
+            pipe = self.redis.pipeline(transaction=False) if self.redis else None
+            board_key = self.leaderboard.board_key(tournament_id)
+            if pipe is not None:
+                pipe.zrevrank(board_key, user_id)
+            else:
+                before = self.leaderboard.rank(tournament_id, user_id)
+            
+            self.leaderboard.record_trade(tournament_id, user_id, trade.symbol, trade.side,
+                                          trade.qty, trade.price, prior_total_assets, client=pipe)
+            self.snapshot_engine.record_trade(tournament_id, user_id, pipe)
+            self.stats_tracker.record_trade(tournament_id, trade.total_amount, pipe)
+            self.activity.record_trade(tournament_id, pipe)
+            self.catalog.record_trade(user_id, tournament_id, pipe)
+            self.realtime.publish(user_topic(user_id), 'fill', fill, pipe)
+            self.http_cache.bump([leaderboard_scope(tournament_id)], pipe)
+            if gate_token is not None:
+                self.leaderboard.end_trade(tournament_id, gate_token, client=pipe)
+            
+            if pipe is not None:
+                pipe.zrevrank(board_key, user_id)
+                pipe.zscore(board_key, user_id)
+                results = pipe.execute()
+                previous_rank = None if results[0] is None else results[0] + 1
+                rank = None if results[-2] is None else results[-2] + 1
+                total_assets = results[-1]
+            else:
+                after = self.leaderboard.rank(tournament_id, user_id)
+                previous_rank = before['rank'] if before else None
+                rank, total_assets = after['rank'], after['total_assets']
+            
+            if rank is not None and rank != previous_rank:
+                event = {
+                    'tournament_id': tournament_id,
+                    'user_id': user_id,
+                    'rank': rank,
+                    'previous_rank': previous_rank,
+                    'total_assets': round(float(total_assets), 2)
+                }
+                self.realtime.publish_many([
+                    (leaderboard_topic(tournament_id), 'rank', event),
+                    (user_topic(user_id), 'rank', event)
+                ])
+        except Exception as e:
+            logger.error(f"排行榜更新失敗: {e}")
+            # 解除登記可重複執行，管線失敗時確保不殘留
+            if gate_token is not None:
+                self.leaderboard.end_trade(tournament_id, gate_token)
+    
+    def take_tournament_snapshot(self, tournament_id: str, prices: Optional[Dict[str, float]] = None,
+                                 as_of_date=None, table: str = 'tournament_snapshots') -> List[Dict]:
+        """以目前投資組合與股價為所有參與者建立績效快照（一次批量寫入）
+
+        prices 未提供的股票以平均成本計價。
+        """
+        portfolios, positions = self._load_tournament_accounts(tournament_id)
+        valuations = value_accounts(portfolios, positions, prices or {})
+        
+        rows = self.snapshot_engine.take_snapshot(tournament_id, valuations, as_of_date, table)
+        self.http_cache.bump([leaderboard_scope(tournament_id)])  # 排行榜績效欄位來自快照狀態
+        return rows
+    
     def get_performance_metrics(self) -> Dict:
         """獲取系統性能指標"""
         metrics = {
             'timestamp': datetime.utcnow().isoformat(),
             'cache_status': {
                 'redis_connected': self.redis is not None and self.redis.ping() if self.redis else False,
-                'active_locks': len(self.trade_locks),
             },
+            'lock_status': self.lock_manager.metrics(),
+            'tournament_status_cache': self.status_cache.metrics(),
+            'tournament_stats': self.stats_tracker.metrics(),
+            'recent_activity': self.activity.snapshot(),
+            'realtime': self.realtime.metrics(),
+            'delta_responses': self.delta_tracker.metrics(),
+            'http_cache': self.http_cache.metrics(),
+            'tournament_catalog': self.catalog.metrics(),
             'executor_status': {
                 'active_threads': self.executor._threads.__len__() if hasattr(self.executor, '_threads') else 0,
-                'max_workers': self.executor._max_workers
+                'max_workers': self.executor._max_workers,
+                'trade_queue': self.trade_queue.metrics()
             }
         }
         
@@ -0,0 +1,160 @@
+"""
+錦標賽統計即時計數
+以逐筆累加的計數器提供 /api/tournament/<id>/stats，不在每次請求時掃描交易表
+
+設計重點:
+1. 每場錦標賽一個 Redis 雜湊，成交時在同一管線累加交易筆數與成交金額
+2. 參與人數、平均總資產與第一名直接讀取即時排行榜（有序集合）
+3. 定期以 get_tournament_stats 數據庫函數校正計數器（跨 worker 每個週期只校正一次）
+4. 觀眾高頻輪詢時，同一場錦標賽的結果在行程內保留 1 秒
+5. Redis 未連線時計數保存在行程內
+
+Redis 鍵值:
+    tournament_stats:{tid}            雜湊 total_trades / total_volume / reconciled_at
+    tournament_stats_reconcile:{tid}  校正搶占標記
+"""
+
+import logging
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+import cache_codec
+
+logger = logging.getLogger(__name__)
+
+class TournamentStatsTracker:
+    """錦標賽統計計數器"""
+
+    def __init__(self, supabase_client, redis_client, leaderboard, reconcile_interval: int = 300,
+                 memo_ttl: float = 1.0):
+        self.supabase = supabase_client
+        self.redis = redis_client
+        self.leaderboard = leaderboard
+        self.reconcile_interval = reconcile_interval  # 與數據庫校正間隔（秒）
+        self.memo_ttl = memo_ttl                      # 行程內結果保留秒數
+
+        self._local_counters: Dict[str, Dict[str, float]] = {}  # Redis 備用方案
+        self._memo: Dict[str, tuple] = {}                        # tid -> (到期時間, 統計)
+        self._lock = threading.Lock()
+
+        # 統計指標
+        self.memo_hits = 0
+        self.reads = 0
+        self.reconciliations = 0
+
+    @staticmethod
+    def _stats_key(tournament_id: str) -> str:
+        return f"tournament_stats:{tournament_id}"
+
+    @staticmethod
+    def _reconcile_key(tournament_id: str) -> str:
+        return f"tournament_stats_reconcile:{tournament_id}"
+
+    # ========================================
+    # 增量更新
+    # ========================================
+
+    def record_trade(self, tournament_id: str, amount: float, pipe=None):
+        """累加一筆成交（可併入呼叫端的 Redis 管線）"""
+        if self.redis:
+            client = pipe or self.redis
+            client.hincrby(self._stats_key(tournament_id), 'total_trades', 1)
+            client.hincrbyfloat(self._stats_key(tournament_id), 'total_volume', amount)
+            return
+
+        with self._lock:
+            counters = self._local_counters.setdefault(tournament_id, {'total_trades': 0, 'total_volume': 0.0})
+            counters['total_trades'] += 1
+            counters['total_volume'] += amount
+
+    # ========================================
+    # 校正
+    # ========================================
+
+    def _read_counters(self, tournament_id: str) -> Optional[Dict[str, float]]:
+        if self.redis:
+            raw = self.redis.hgetall(self._stats_key(tournament_id))
+            if not raw:
+                return None
+            return {cache_codec.decode_text(field): float(value) for field, value in raw.items()}
+
+        with self._lock:
+            counters = self._local_counters.get(tournament_id)
+            return dict(counters) if counters and 'reconciled_at' in counters else None
+
+    def reconcile(self, tournament_id: str) -> Optional[Dict[str, float]]:
+        """以數據庫函數重新計算交易筆數與成交金額（錦標賽不存在回傳 None）"""
+        result = self.supabase.rpc('get_tournament_stats', {'p_tournament_id': tournament_id}).execute()
+        stats = result.data[0] if isinstance(result.data, list) and result.data else result.data
+        if not stats:
+            return None
+
+        counters = {
+            'total_trades': int(stats.get('total_trades') or 0),
+            'total_volume': float(stats.get('total_volume') or 0),
+            'reconciled_at': time.time()
+        }
+        if self.redis:
+            self.redis.hset(self._stats_key(tournament_id), mapping=counters)
+        else:
+            with self._lock:
+                self._local_counters[tournament_id] = dict(counters)
+
+        self.reconciliations += 1
+        logger.info(f"🧮 錦標賽統計已校正: {tournament_id}, {counters['total_trades']} 筆交易")
+        return counters
+
+    def _reconcile_due(self, tournament_id: str, counters: Dict[str, float]) -> bool:
+        if time.time() - counters.get('reconciled_at', 0) < self.reconcile_interval:
+            return False
+        if self.redis:
+            # 跨 worker 每個校正週期只由一個 worker 執行
+            return bool(self.redis.set(self._reconcile_key(tournament_id), 1, ex=self.reconcile_interval, nx=True))
+        return True
+
+    # ========================================
+    # 查詢
+    # ========================================
+
+    def get(self, tournament_id: str) -> Optional[Dict]:
+        """獲取錦標賽統計（計數器 + 即時排行榜，無需掃描交易表）"""
+        now = time.time()
+        memo = self._memo.get(tournament_id)
+        if memo and memo[0] > now:
+            self.memo_hits += 1
+            return memo[1]
+
+        self.reads += 1
+        counters = self._read_counters(tournament_id)
+        if counters is None:
+            counters = self.reconcile(tournament_id)
+            if counters is None:
+                return None
+        elif self._reconcile_due(tournament_id, counters):
+            try:
+                counters = self.reconcile(tournament_id) or counters
+            except Exception as e:
+                logger.error(f"錦標賽統計校正失敗 {tournament_id}: {e}")
+
+        summary = self.leaderboard.summary(tournament_id)
+        stats = {
+            'tournament_id': tournament_id,
+            'total_participants': summary['total_participants'],
+            'total_trades': int(counters.get('total_trades', 0)),
+            'total_volume': round(counters.get('total_volume', 0.0), 2),
+            'avg_portfolio_value': summary['avg_portfolio_value'],
+            'top_performer': summary['top_performer'],
+            'last_updated': datetime.now(timezone.utc).isoformat()
+        }
+        self._memo[tournament_id] = (now + self.memo_ttl, stats)
+        return stats
+
+    def metrics(self) -> Dict:
+        """獲取統計服務指標"""
+        return {
+            'reads': self.reads,
+            'memo_hits': self.memo_hits,
+            'reconciliations': self.reconciliations
+        }
@@ -0,0 +1,209 @@
+"""
+錦標賽狀態本地快取
+交易熱路徑上的錦標賽狀態檢查不需任何網路 I/O
+
+設計重點:
+1. 行程內保存錦標賽狀態與交易時間窗（starts_at / ends_at）
+2. 背景執行緒定期重新載入進行中 / 即將開始的錦標賽
+3. 狀態變更時透過 Redis pub/sub 通知所有 worker 立即重新載入該錦標賽
+   （寫入 tournaments 的程式呼叫 publish_status_change，目前為 update_tournaments.py）
+4. 即使狀態尚未更新，超過 ends_at 後也會立即停止交易
+5. 狀態變更通知以 get_message 輪詢（redis_cache.listen_pubsub），頻道閒置時不會逾時斷線
+6. 未經 publish_status_change 的修改（SQL 主控台、數據庫排程等）最多延遲 refresh_interval（預設 60 秒）生效
+"""
+
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from redis_cache import listen_pubsub
+
+logger = logging.getLogger(__name__)
+
+STATUS_CHANNEL = 'tournament_status_updates'
+
+def _parse_timestamp(value) -> Optional[datetime]:
+    """解析數據庫時間戳（無時區視為 UTC）"""
+    if not value:
+        return None
+    if isinstance(value, datetime):
+        parsed = value
+    else:
+        parsed = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+@dataclass(frozen=True)
+class TournamentWindow:
+    """錦標賽狀態與交易時間窗"""
+    status: str
+    starts_at: Optional[datetime] = None
+    ends_at: Optional[datetime] = None
+
+    def is_active(self, now: datetime) -> bool:
+        if self.status != 'active':
+            return False
+        if self.starts_at and now < self.starts_at:
+            return False
+        if self.ends_at and now > self.ends_at:
+            return False
+        return True
+
+# 查無此錦標賽（避免重複查詢，下次全量刷新時清除）
+MISSING_TOURNAMENT = TournamentWindow(status='missing')
+
+class TournamentStatusCache:
+    """錦標賽狀態本地快取"""
+
+    def __init__(self, supabase_client, redis_client=None, refresh_interval: float = 60.0):
+        self.supabase = supabase_client
+        self.redis = redis_client
+        self.refresh_interval = refresh_interval  # 全量刷新間隔（秒）
+
+        self._windows: Dict[str, TournamentWindow] = {}
+        self._lock = threading.Lock()
+        self._started = False
+        self._stop = threading.Event()
+
+        # 統計指標
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.last_refresh_at: Optional[float] = None
+
+    # ========================================
+    # 熱路徑
+    # ========================================
+
+    def is_active(self, tournament_id: str) -> bool:
+        """錦標賽是否進行中（已載入時僅讀取本地狀態）"""
+        window = self._windows.get(tournament_id)
+        if window is None:
+            # 首次出現的錦標賽（刷新後才建立）載入一次
+            self.misses += 1
+            window = self.load(tournament_id)
+        else:
+            self.hits += 1
+        return window.is_active(datetime.now(timezone.utc))
+
+    def active_ids(self, at: Optional[datetime] = None) -> List[str]:
+        """指定時間（預設現在）進行中的錦標賽"""
+        at = at or datetime.now(timezone.utc)
+        return [tournament_id for tournament_id, window in list(self._windows.items()) if window.is_active(at)]
+
+    def get(self, tournament_id: str) -> Optional[TournamentWindow]:
+        window = self._windows.get(tournament_id)
+        return None if window is MISSING_TOURNAMENT else window
+
+    # ========================================
+    # 載入與刷新
+    # ========================================
+
+    @staticmethod
+    def _window_from_row(row: Dict) -> TournamentWindow:
+        return TournamentWindow(
+            status=row.get('status') or 'upcoming',
+            starts_at=_parse_timestamp(row.get('starts_at')),
+            ends_at=_parse_timestamp(row.get('ends_at'))
+        )
+
+    def load(self, tournament_id: str) -> TournamentWindow:
+        """從數據庫載入單一錦標賽狀態"""
+        try:
+            result = self.supabase.table('tournaments').select('id, status, starts_at, ends_at').eq('id', tournament_id).execute()
+            window = self._window_from_row(result.data[0]) if result.data else MISSING_TOURNAMENT
+        except Exception as e:
+            # 查詢失敗不快取，下次重試
+            logger.error(f"驗證錦標賽狀態失敗: {e}")
+            return MISSING_TOURNAMENT
+
+        with self._lock:
+            self._windows[tournament_id] = window
+        return window
+
+    def refresh(self):
+        """全量重新載入進行中與即將開始的錦標賽"""
+        result = self.supabase.table('tournaments').select('id, status, starts_at, ends_at').in_('status', ['upcoming', 'active']).execute()
+        windows = {row['id']: self._window_from_row(row) for row in result.data}
+
+        with self._lock:
+            self._windows = windows
+        self.last_refresh_at = time.time()
+        logger.info(f"🔄 錦標賽狀態快取已刷新: {len(windows)} 場")
+
+    def invalidate(self, tournament_id: str):
+        """狀態變更時重新載入該錦標賽"""
+        self.invalidations += 1
+        self.load(tournament_id)
+
+    # ========================================
+    # 背景刷新與推送失效
+    # ========================================
+
+    def start(self):
+        """啟動定期刷新與 pub/sub 監聽（每個行程一次）"""
+        if self._started:
+            return
+        self._started = True
+
+        try:
+            self.refresh()
+        except Exception as e:
+            logger.error(f"錦標賽狀態快取初始載入失敗: {e}")
+
+        threading.Thread(target=self._refresh_loop, name='tournament-status-refresh', daemon=True).start()
+        if self.redis:
+            threading.Thread(target=self._listen_loop, name='tournament-status-listener', daemon=True).start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _refresh_loop(self):
+        while not self._stop.wait(self.refresh_interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error(f"錦標賽狀態快取刷新失敗: {e}")
+
+    def _listen_loop(self):
+        while not self._stop.is_set():
+            pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+            try:
+                pubsub.subscribe(STATUS_CHANNEL)
+                # 頻道閒置不視為錯誤，避免重新連線期間遺失狀態變更通知
+                for message in listen_pubsub(pubsub, self._stop):
+                    data = message.get('data')
+                    tournament_id = data.decode('utf-8') if isinstance(data, bytes) else str(data)
+                    logger.info(f"📣 錦標賽狀態變更: {tournament_id}")
+                    self.invalidate(tournament_id)
+            except Exception as e:
+                logger.error(f"錦標賽狀態訂閱中斷，5 秒後重新連線: {e}")
+                self._stop.wait(5)
+            finally:
+                try:
+                    pubsub.close()
+                except Exception:
+                    pass
+
+    def metrics(self) -> Dict:
+        """獲取快取統計"""
+        return {
+            'tournaments': len(self._windows),
+            'hits': self.hits,
+            'misses': self.misses,
+            'invalidations': self.invalidations,
+            'last_refresh_at': datetime.fromtimestamp(self.last_refresh_at, timezone.utc).isoformat() if self.last_refresh_at else None
+        }
+
+def publish_status_change(redis_client, tournament_id: str):
+    """通知所有 worker 錦標賽狀態已變更（新增錦標賽或更新 tournaments.status 後呼叫）"""
+    if not redis_client:
+        return
+    try:
+        redis_client.publish(STATUS_CHANNEL, tournament_id)
+    except Exception as e:
+        logger.error(f"錦標賽狀態變更通知失敗: {e}")
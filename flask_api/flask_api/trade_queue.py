@@ -0,0 +1,135 @@
+"""
+帳戶序列化交易佇列
+每個 (tournament_id, user_id) 一條序列佇列，共用同一個執行緒池
+
+設計重點:
+1. 同一帳戶的交易依提交順序逐筆執行，行程內不再互相搶交易鎖
+2. 不同帳戶的佇列在執行緒池中平行處理
+3. 每條佇列同一時間最多佔用一個執行緒，連續處理一批後讓出，避免單一帳戶霸佔
+4. 提交後立即回傳 Future，並統計佇列深度、等待時間與執行時間
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import Executor, Future
+from typing import Callable, Dict, Hashable
+
+logger = logging.getLogger(__name__)
+
+class AccountTradeQueue:
+    """依帳戶序列化的交易佇列"""
+
+    def __init__(self, executor: Executor, max_batch: int = 16):
+        self.executor = executor
+        self.max_batch = max_batch  # 每次佔用執行緒最多連續處理的筆數
+
+        self._lock = threading.Lock()
+        self._queues: Dict[Hashable, deque] = {}  # 只保留有待處理交易的帳戶
+
+        # 統計指標
+        self._submitted = 0
+        self._completed = 0
+        self._failed = 0
+        self._total_wait_ms = 0.0
+        self._max_wait_ms = 0.0
+        self._total_exec_ms = 0.0
+        self._max_depth = 0
+
+    def submit(self, key: Hashable, fn: Callable, *args, **kwargs) -> Future:
+        """提交交易至帳戶佇列，回傳 Future"""
+        future = Future()
+        item = (future, fn, args, kwargs, time.time())
+
+        with self._lock:
+            self._submitted += 1
+            queue = self._queues.get(key)
+            start_worker = queue is None
+            if start_worker:
+                queue = deque()
+                self._queues[key] = queue
+            queue.append(item)
+            self._max_depth = max(self._max_depth, len(queue))
+
+        if start_worker:
+            self._schedule(key)
+        return future
+
+    def _schedule(self, key: Hashable):
+        try:
+            self.executor.submit(self._drain, key)
+        except Exception as e:
+            # 執行緒池已關閉，讓所有等待中的交易失敗
+            logger.error(f"交易佇列排程失敗 {key}: {e}")
+            with self._lock:
+                queue = self._queues.pop(key, deque())
+            for future, *_ in queue:
+                if future.set_running_or_notify_cancel():
+                    future.set_exception(e)
+
+    def _drain(self, key: Hashable):
+        """依序執行帳戶佇列中的交易"""
+        for _ in range(self.max_batch):
+            with self._lock:
+                queue = self._queues.get(key)
+                if not queue:
+                    self._queues.pop(key, None)
+                    return
+                future, fn, args, kwargs, enqueued_at = queue.popleft()
+
+            if not future.set_running_or_notify_cancel():
+                continue
+
+            started_at = time.time()
+            wait_ms = (started_at - enqueued_at) * 1000
+            try:
+                result = fn(*args, **kwargs)
+            except BaseException as e:
+                future.set_exception(e)
+                failed = True
+            else:
+                future.set_result(result)
+                failed = False
+
+            self._record(wait_ms, (time.time() - started_at) * 1000, failed)
+
+        # 處理完一批後讓出執行緒，其餘交易重新排程
+        with self._lock:
+            queue = self._queues.get(key)
+            if not queue:
+                self._queues.pop(key, None)
+                return
+        self._schedule(key)
+
+    def _record(self, wait_ms: float, exec_ms: float, failed: bool):
+        with self._lock:
+            if failed:
+                self._failed += 1
+            else:
+                self._completed += 1
+            self._total_wait_ms += wait_ms
+            self._max_wait_ms = max(self._max_wait_ms, wait_ms)
+            self._total_exec_ms += exec_ms
+
+    def depth(self, key: Hashable) -> int:
+        """帳戶佇列中尚未開始的交易數"""
+        with self._lock:
+            queue = self._queues.get(key)
+            return len(queue) if queue else 0
+
+    def metrics(self) -> Dict:
+        """獲取佇列統計"""
+        with self._lock:
+            finished = self._completed + self._failed
+            return {
+                'active_accounts': len(self._queues),
+                'queued_trades': sum(len(queue) for queue in self._queues.values()),
+                'max_queue_depth': self._max_depth,
+                'submitted': self._submitted,
+                'completed': self._completed,
+                'failed': self._failed,
+                'avg_wait_ms': self._total_wait_ms / finished if finished else 0.0,
+                'max_wait_ms': self._max_wait_ms,
+                'avg_execution_ms': self._total_exec_ms / finished if finished else 0.0
+            }
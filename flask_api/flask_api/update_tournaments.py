@@ -3,7 +3,10 @@
 更新tournaments表中的created_by_name字段
 """
 
-from supabase import create_client, Client
+from supabase import Client
+from supabase_pool import create_client
+from redis_cache import create_redis_client
+from tournament_status import publish_status_change
 
 # Supabase配置
 SUPABASE_URL = "https://wujlbjrouqcpnifbakmw.supabase.co"
@@ -62,11 +65,22 @@ def update_tournaments_created_by():
         print(f"❌ 更新tournaments失败: {e}")
         return False
 
+def connect_redis():
+    """连接Redis（用于通知API worker重新载入锦标赛状态，未连接时各worker于60秒内定期刷新）"""
+    try:
+        redis_client = create_redis_client()
+        redis_client.ping()
+        return redis_client
+    except Exception as e:
+        print(f"⚠️ Redis未连接，锦标赛状态将于定期刷新时生效: {e}")
+        return None
+
 def add_sample_user_tournaments():
     """添加示例用户创建的tournaments"""
     try:
         print("\n🏆 添加示例用户tournaments...")
         supabase: Client = create_client(SUPABASE_URL, SUPABASE_SERVICE_KEY)
+        redis_client = connect_redis()
         
         user_id = "d64a0edd-62cc-423a-8ce4-81103b5a9770"
         
@@ -120,6 +134,8 @@ def add_sample_user_tournaments():
                 insert_response = supabase.table("tournaments").insert(tournament_data).execute()
                 if insert_response.data:
                     print(f"   ✅ 添加成功")
+                    # 通知所有worker载入新锦标赛的状态
+                    publish_status_change(redis_client, insert_response.data[0]['id'])
                 else:
                     print(f"   ❌ 添加失败")
             except Exception as insert_error:
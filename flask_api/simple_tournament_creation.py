@@ -6,7 +6,12 @@
 
 import sys
 from datetime import datetime
-from supabase import create_client, Client
+import os
+from supabase import Client
+
+# 共用 flask_api 的 Supabase 連線池客戶端
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'flask_api'))
+from supabase_pool import create_client
 import logging
 
 # 設定日誌  